@@ -0,0 +1,375 @@
+"""
+Benchmarks types2docstring on synthetic modules.
+
+Every scenario generates a set of modules, times the stages of
+rewriting them one by one and the whole of `_main` over all of them.
+The results can be stored as a baseline, later runs fail when they are
+slower (or use more memory) than the baseline allows. The number of
+modules imported at startup is checked with or without a baseline.
+
+Usage: `python -m benchmarks.bench [--save-baseline]`
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from types2docstring._stats import STAGES
+from types2docstring.types2docstring import _main
+from types2docstring.types2docstring import _rewrite_file
+
+# The module imported by `python -m types2docstring`.
+STARTUP_MODULE = 'types2docstring.types2docstring'
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Unlike the timings the number of modules imported at startup does not
+# depend on the machine, so it is checked even without a baseline.
+MAX_STARTUP_MODULES = 60
+SIMPLE_TYPES = ('int', 'str', 'float', 'bool', 'bytes', 'Any')
+GENERIC_TYPES = ('list', 'set', 'frozenset', 'Optional', 'Sequence')
+
+
+class Scenario(NamedTuple):
+    name: str
+    functions: int = 0
+    classes: int = 0
+    methods: int = 0
+    # Nesting depth of the generic types in the annotations.
+    generic_depth: int = 1
+    # Number of arguments per function.
+    arguments: int = 2
+    # Declare the arguments on separate lines.
+    multiline: bool = False
+
+
+SCENARIOS = (
+    Scenario('many_functions', functions=400),
+    Scenario('deep_generics', functions=100, generic_depth=8),
+    Scenario('long_signatures', functions=100, arguments=30, multiline=True),
+    Scenario('classes', classes=40, methods=10),
+)
+
+
+def _annotation(rng: random.Random, depth: int) -> str:
+
+    if depth <= 1:
+        return rng.choice(SIMPLE_TYPES)
+
+    if rng.random() < 0.3:
+        key = rng.choice(SIMPLE_TYPES)
+        return f'dict[{key}, {_annotation(rng, depth - 1)}]'
+    if rng.random() < 0.2:
+        return f'{_annotation(rng, depth - 1)} | None'
+
+    return f'{rng.choice(GENERIC_TYPES)}[{_annotation(rng, depth - 1)}]'
+
+
+def _function(
+    rng: random.Random,
+    name: str,
+    scenario: Scenario,
+    indent: str = '',
+    first_arg: Optional[str] = None,
+) -> str:
+
+    args = [first_arg] if first_arg else []
+    for i in range(scenario.arguments):
+        args.append(f'arg{i}: {_annotation(rng, scenario.generic_depth)}')
+
+    if scenario.multiline:
+        arg_indent = f'{indent}    '
+        args_str = ''.join(f'\n{arg_indent}{arg},' for arg in args)
+        signature = f'{indent}def {name}({args_str}\n{indent})'
+    else:
+        signature = f'{indent}def {name}({", ".join(args)})'
+
+    returns = _annotation(rng, scenario.generic_depth)
+    return f'{signature} -> {returns}:\n{indent}    return None\n\n\n'
+
+
+def generate_module(scenario: Scenario, seed: int = 0) -> str:
+    """
+    Generates the source of a module for the scenario.
+
+    The same scenario and seed always generate the same module.
+    """
+
+    rng = random.Random(seed)
+    parts = ['from typing import *\n\n\n']
+
+    for i in range(scenario.functions):
+        parts.append(_function(rng, f'function{i}', scenario))
+
+    for i in range(scenario.classes):
+        parts.append(f'class Class{i}:\n')
+        for j in range(scenario.methods):
+            parts.append(
+                _function(
+                    rng, f'method{j}', scenario,
+                    indent='    ', first_arg='self',
+                ),
+            )
+
+    return ''.join(parts)
+
+
+def _time_stages(
+    filename: str,
+    docstring_type: str,
+    timings: dict[str, float],
+    low_memory: bool = False,
+) -> None:
+    """
+    Rewrites the file, adding the time spent in every stage to `timings`.
+    """
+
+    result = _rewrite_file(filename, docstring_type, low_memory=low_memory)
+    assert result.stats is not None
+    for stage, seconds in result.stats.times.items():
+        timings[stage] += seconds
+
+
+def _write_modules(directory: str, modules: list[str]) -> list[str]:
+
+    filenames = []
+    for i, module in enumerate(modules):
+        filename = os.path.join(directory, f'module{i}.py')
+        with open(filename, 'w', encoding='UTF-8') as f:
+            f.write(module)
+        filenames.append(filename)
+    return filenames
+
+
+def run_scenario(
+    scenario: Scenario,
+    files: int,
+    jobs: int,
+    docstring_type: str = 'rst',
+) -> dict[str, float]:
+    """
+    Runs the benchmark of the scenario over `files` generated modules.
+
+    Returns the results: the time spent in every stage, the throughput
+    of the stages and of `_main` and the peak memory of a single file
+    (also in the low memory mode).
+    """
+
+    modules = [generate_module(scenario, seed) for seed in range(files)]
+    lines = sum(module.count('\n') for module in modules)
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = _write_modules(directory, modules)
+        for filename in filenames:
+            _time_stages(filename, docstring_type, timings)
+
+        # Tracing the allocations slows everything down, so the memory is
+        # measured separately from the timings.
+        peak_memory = {}
+        for low_memory in (False, True):
+            _write_modules(directory, modules[:1])
+            tracemalloc.start()
+            _time_stages(
+                filenames[0],
+                docstring_type,
+                dict.fromkeys(STAGES, 0.),
+                low_memory,
+            )
+            _, peak_memory[low_memory] = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        _write_modules(directory, modules)
+        t0 = time.perf_counter()
+        _main(['--type', docstring_type, '--jobs', str(jobs), *filenames])
+        main_seconds = time.perf_counter() - t0
+
+    total = sum(timings.values())
+    results = {f'{stage}_s': seconds for stage, seconds in timings.items()}
+    results.update({
+        'files_per_s': files / total,
+        'lines_per_s': lines / total,
+        'main_files_per_s': files / main_seconds,
+        'main_lines_per_s': lines / main_seconds,
+        'peak_memory_mb': peak_memory[False] / 1024 / 1024,
+        'peak_memory_low_memory_mb': peak_memory[True] / 1024 / 1024,
+    })
+    return results
+
+
+def measure_startup(runs: int = 5) -> dict[str, float]:
+    """
+    Measures the time it takes to import types2docstring in a new
+    interpreter (the best of `runs`) and how many modules it imports.
+    """
+
+    code = (
+        'import sys, time\n'
+        'modules = len(sys.modules)\n'
+        'start = time.perf_counter()\n'
+        f'import {STARTUP_MODULE}\n'
+        'print(time.perf_counter() - start, len(sys.modules) - modules)\n'
+    )
+
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output((sys.executable, '-c', code), text=True)
+        seconds, modules = out.split()
+        times.append(float(seconds))
+
+    return {'import_time_s': min(times), 'modules_imported': float(modules)}
+
+
+def check_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    max_regression: float,
+) -> list[str]:
+    """
+    Compares the results with the baseline.
+
+    Returns a message for every throughput that is more then
+    `max_regression` (a fraction) lower than in the baseline,
+    and for every peak memory or import time that is that much higher.
+    """
+
+    regressions = []
+    for name, scenario_results in results.items():
+        for key, value in scenario_results.items():
+            if name not in baseline or key not in baseline[name]:
+                continue
+            expected = baseline[name][key]
+
+            if key.endswith('_per_s'):
+                regressed = value < expected * (1 - max_regression)
+            elif key.startswith('peak_memory') or key == 'import_time_s':
+                regressed = value > expected * (1 + max_regression)
+            else:
+                continue
+
+            if regressed:
+                regressions.append(
+                    f'{name}: {key} is {value:.2f}, '
+                    f'baseline is {expected:.2f}',
+                )
+
+    return regressions
+
+
+def check_startup(results: dict[str, dict[str, float]]) -> list[str]:
+    """
+    Returns a message when the startup imports more than
+    `MAX_STARTUP_MODULES` modules.
+    """
+
+    modules = results.get('startup', {}).get('modules_imported')
+    if modules is None or modules <= MAX_STARTUP_MODULES:
+        return []
+    return [
+        f'startup: modules_imported is {modules:.0f}, '
+        f'the maximum is {MAX_STARTUP_MODULES}',
+    ]
+
+
+def _print_results(name: str, results: dict[str, float]) -> None:
+
+    print(f'{name}:')
+    for key, value in results.items():
+        print(f'    {key:<28}{value:>12.4f}')
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--files',
+        type=int,
+        default=20,
+        help='Number of modules generated per scenario (default: 20)',
+    )
+    parser.add_argument(
+        '--scenario',
+        action='append',
+        choices=['startup', *(scenario.name for scenario in SCENARIOS)],
+        help='Only run the given scenario(s)',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes used when timing _main',
+    )
+    parser.add_argument(
+        '--type',
+        default='rst',
+        help='Type of docstring to generate',
+    )
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Store the results as the new baseline',
+    )
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=0.2,
+        help='Allowed regression compared to the baseline, as a fraction '
+        '(default: 0.2)',
+    )
+    parser.add_argument('--json', action='store_true', help='Print JSON')
+    args = parser.parse_args(argv)
+
+    results = {}
+    if not args.scenario or 'startup' in args.scenario:
+        results['startup'] = measure_startup()
+
+    for scenario in SCENARIOS:
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        results[scenario.name] = run_scenario(
+            scenario, args.files, args.jobs, args.type,
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, scenario_results in results.items():
+            _print_results(name, scenario_results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        return 0
+
+    regressions = check_startup(results)
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions.extend(
+            check_regressions(results, baseline, args.max_regression),
+        )
+    else:
+        print(
+            f'WARNING: there is no baseline at {args.baseline}, only the '
+            f'modules imported at startup are checked (see --save-baseline)',
+            file=sys.stderr,
+        )
+
+    for regression in regressions:
+        print(f'REGRESSION: {regression}', file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -8,7 +8,7 @@ setup(
     url='https://github.com/twanh/types2docstring',
     author='twanh',
     author_email='huiskenstwan@gmail.com',
-    packages=find_packages(exclude=('tests',)),
+    packages=find_packages(exclude=('tests', 'benchmarks')),
     python_requires='>=3.9.2',
     install_requires=[
         'tokenize-rt>=4.2.1',
@@ -16,6 +16,7 @@ setup(
     entry_points={
         'console_scripts': [
             'types2docstring=types2docstring.__main__:run',
+            'types2docstring-client=types2docstring._client:main',
         ],
     },
 )
@@ -0,0 +1,127 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+from py.path import local as Path
+
+from types2docstring import _batch
+from types2docstring import FileRewrite
+from types2docstring import rewrite_files_async
+
+SOURCE = (
+    'def f(x: int) -> int:\n'
+    '   return x\n'
+)
+
+
+def _rewrite_all(filenames, **kwargs):
+
+    async def run():
+        return [
+            result
+            async for result in rewrite_files_async(filenames, **kwargs)
+        ]
+
+    return asyncio.run(run())
+
+
+def _write_files(tmpdir: Path, n: int):
+
+    files = [tmpdir.join(f'test{i}.py') for i in range(n)]
+    for file in files:
+        file.write(SOURCE)
+    return files
+
+
+def test_rewrite_files_async(tmpdir: Path):
+
+    files = _write_files(tmpdir, 5)
+    unchanged = tmpdir.join('unchanged.py')
+    unchanged.write('X = 1\n')
+    filenames = [str(unchanged), *(str(file) for file in files)]
+
+    results = _rewrite_all(filenames, style='google')
+
+    assert {result.filename for result in results} == set(filenames)
+    by_filename = {result.filename: result for result in results}
+    assert by_filename[str(unchanged)] == FileRewrite(
+        str(unchanged), False, [],
+    )
+    for file in files:
+        result = by_filename[str(file)]
+        assert result.changed
+        assert [edit.function for edit in result.edits] == ['f']
+        assert 'x (int): [argument description]' in file.read()
+
+
+def test_rewrite_files_async_check(tmpdir: Path):
+
+    (file,) = _write_files(tmpdir, 1)
+
+    (result,) = _rewrite_all([str(file)], mode='check')
+
+    assert result.changed
+    assert file.read() == SOURCE
+
+
+def test_rewrite_files_async_executor(tmpdir: Path):
+
+    files = _write_files(tmpdir, 4)
+
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        results = _rewrite_all(
+            [str(file) for file in files], executor=executor,
+        )
+
+    assert all(result.changed for result in results)
+    for file in files:
+        assert ':type x: int' in file.read()
+
+
+def test_rewrite_files_async_max_concurrency(tmpdir: Path, monkeypatch):
+
+    lock = threading.Lock()
+    running = []
+    max_running = []
+    rewrite_data = _batch._rewrite_data
+
+    def tracking_rewrite_data(data, style):
+        with lock:
+            running.append(None)
+            max_running.append(len(running))
+        try:
+            return rewrite_data(data, style)
+        finally:
+            with lock:
+                running.pop()
+
+    monkeypatch.setattr(_batch, '_rewrite_data', tracking_rewrite_data)
+    files = _write_files(tmpdir, 10)
+
+    results = _rewrite_all([str(file) for file in files], max_concurrency=2)
+
+    assert len(results) == 10
+    assert max(max_running) <= 2
+
+
+def test_rewrite_files_async_error(tmpdir: Path):
+
+    invalid = tmpdir.join('invalid.py')
+    invalid.write('def f(x: int) -> int\n')
+
+    with pytest.raises(SyntaxError):
+        _rewrite_all([str(invalid)])
+
+
+@pytest.mark.parametrize(
+    'kwargs, message', [
+        ({'style': 'unknown'}, 'Unknown docstring type: unknown'),
+        ({'mode': 'diff'}, 'Unknown mode: diff'),
+        ({'max_concurrency': 0}, 'max_concurrency must be at least 1'),
+    ],
+)
+def test_rewrite_files_async_invalid(kwargs, message):
+    with pytest.raises(ValueError) as excinfo:
+        _rewrite_all([], **kwargs)
+    assert str(excinfo.value) == message
@@ -0,0 +1,66 @@
+import ast
+
+import pytest
+
+from benchmarks.bench import check_regressions
+from benchmarks.bench import check_startup
+from benchmarks.bench import generate_module
+from benchmarks.bench import MAX_STARTUP_MODULES
+from benchmarks.bench import measure_startup
+from benchmarks.bench import run_scenario
+from benchmarks.bench import Scenario
+from benchmarks.bench import SCENARIOS
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_generate_module(scenario):
+    module = generate_module(scenario, seed=1)
+
+    assert module == generate_module(scenario, seed=1)
+    tree = ast.parse(module)
+    functions = [
+        node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)
+    ]
+    expected = scenario.functions + scenario.classes * scenario.methods
+    assert len(functions) == expected
+
+
+def test_run_scenario():
+    scenario = Scenario('small', functions=3, classes=1, methods=2)
+    results = run_scenario(scenario, files=2, jobs=1)
+
+    assert results['files_per_s'] > 0
+    assert results['main_files_per_s'] > 0
+    assert results['peak_memory_mb'] > 0
+    assert results['peak_memory_low_memory_mb'] > 0
+
+
+def test_check_regressions():
+    baseline = {'s': {'files_per_s': 100.0, 'peak_memory_mb': 10.0}}
+
+    ok = {'s': {'files_per_s': 90.0, 'peak_memory_mb': 11.0, 'parse_s': 9.}}
+    assert check_regressions(ok, baseline, 0.2) == []
+
+    slow = {'s': {'files_per_s': 70.0, 'peak_memory_mb': 13.0}}
+    assert check_regressions(slow, baseline, 0.2) == [
+        's: files_per_s is 70.00, baseline is 100.00',
+        's: peak_memory_mb is 13.00, baseline is 10.00',
+    ]
+
+
+def test_measure_startup():
+    results = measure_startup(runs=1)
+
+    assert results['import_time_s'] > 0
+    assert 0 < results['modules_imported'] <= MAX_STARTUP_MODULES
+
+
+def test_check_startup():
+    assert check_startup({'s': {'files_per_s': 1.0}}) == []
+    assert check_startup({'startup': {'modules_imported': 10.0}}) == []
+
+    modules = MAX_STARTUP_MODULES + 1.0
+    assert check_startup({'startup': {'modules_imported': modules}}) == [
+        f'startup: modules_imported is {modules:.0f}, '
+        f'the maximum is {MAX_STARTUP_MODULES}',
+    ]
@@ -0,0 +1,89 @@
+import os
+
+from py.path import local as Path
+
+from types2docstring import _cache
+from types2docstring import types2docstring
+from types2docstring.types2docstring import _main
+
+
+def test_cache_key():
+    key = _cache.cache_key(b'def f(x: int) -> int: ...', 'rst')
+
+    assert key == _cache.cache_key(b'def f(x: int) -> int: ...', 'rst')
+    assert key != _cache.cache_key(b'def f(x: int) -> int: ...', 'google')
+    assert key != _cache.cache_key(b'def f(x: str) -> int: ...', 'rst')
+
+
+def test_mark_unchanged(tmpdir: Path):
+    cache_dir = str(tmpdir)
+    key = _cache.cache_key(b'', 'rst')
+
+    assert _cache.is_unchanged(cache_dir, key) is False
+    _cache.mark_unchanged(cache_dir, key)
+    assert _cache.is_unchanged(cache_dir, key) is True
+
+
+def test_evict_least_recently_used(tmpdir: Path):
+    cache_dir = str(tmpdir)
+    keys = [_cache.cache_key(str(i).encode(), 'rst') for i in range(4)]
+    for i, key in enumerate(keys):
+        _cache.mark_unchanged(cache_dir, key)
+        path = os.path.join(cache_dir, key[:2], key)
+        os.utime(path, (i, i))
+
+    assert _cache.evict(cache_dir, 2) == 2
+
+    assert [_cache.is_unchanged(cache_dir, key) for key in keys] == [
+        False, False, True, True,
+    ]
+    assert _cache.evict(cache_dir, 2) == 0
+
+
+def test_count_entries(tmpdir: Path, monkeypatch):
+    cache_dir = str(tmpdir)
+    assert _cache.count_entries(str(tmpdir.join('missing'))) == 0
+
+    for i in range(4):
+        tmpdir.ensure(f'{i:02x}', dir=True)
+        for j in range(i + 1):
+            tmpdir.join(f'{i:02x}', f'{j}').write('')
+    assert _cache.count_entries(cache_dir) == 10
+
+    # Estimated from the subdirectories listed until the sample is full.
+    monkeypatch.setattr(_cache, 'COUNT_SAMPLE', 2)
+    assert 4 <= _cache.count_entries(cache_dir) <= 16
+
+
+def test_main_cache_evicts_when_full(tmpdir: Path):
+    cache_dir = tmpdir.join('cache')
+    files = []
+    for i in range(3):
+        test_file = tmpdir.join(f'test{i}.py')
+        test_file.write(f'def f{i}(x: int) -> int:\n    return x\n')
+        files.append(str(test_file))
+    argv = ['--cache-dir', str(cache_dir), '--cache-max-entries', '2']
+
+    assert _main([*argv, *files]) == 1
+    assert _cache.count_entries(str(cache_dir)) == 2
+
+
+def test_main_cache_skips_unchanged_files(tmpdir: Path, monkeypatch):
+    cache_dir = tmpdir.join('cache')
+    test_file = tmpdir.join('test.py')
+    test_file.write(
+        'def f(x: int) -> int:\n'
+        '   return x\n',
+    )
+    argv = ['--cache-dir', str(cache_dir), str(test_file)]
+
+    assert _main(argv) == 1
+    content = test_file.read()
+
+    def fix_contents(contents, docstring_type):  # pragma: nocover
+        raise AssertionError('file should not be processed')
+
+    monkeypatch.setattr(types2docstring, '_fix_contents', fix_contents)
+    # The rewritten file is known to need no changes.
+    assert _main(argv) == 0
+    assert test_file.read() == content
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+import pytest
+from py.path import local as Path
+
+from types2docstring import _daemon
+from types2docstring._client import Connection
+from types2docstring._client import main as client_main
+
+SOURCE = (
+    'def f(x: int) -> int:\n'
+    '   return x\n'
+)
+
+
+@pytest.fixture
+def socket_path(tmpdir: Path):
+    socket_path = str(tmpdir.join('t2d.sock'))
+    ret = []
+    thread = threading.Thread(
+        target=lambda: ret.append(_daemon.serve(socket_path)),
+    )
+    thread.start()
+    # The socket exists before the server listens on it.
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            Connection(socket_path).close()
+        except OSError:
+            assert thread.is_alive(), f'the daemon exited with {ret}'
+            assert time.monotonic() < deadline, 'the daemon did not start'
+            time.sleep(0.01)
+            continue
+        break
+
+    yield socket_path
+
+    with Connection(socket_path) as connection:
+        assert connection.request({'command': 'shutdown'})['ok'] is True
+    thread.join()
+    assert ret == [0]
+    assert not os.path.exists(socket_path)
+
+
+def test_daemon_source(socket_path):
+    with Connection(socket_path) as connection:
+        assert connection.request({'command': 'ping'})['ok'] is True
+
+        for _ in range(2):
+            response = connection.request(
+                {'source': SOURCE, 'style': 'google'},
+            )
+            assert response['ok'] is True
+            assert response['changed'] is True
+            assert 'Args:' in response['source']
+            assert response['edits'][0]['function'] == 'f'
+
+
+def test_daemon_errors(socket_path):
+    with Connection(socket_path) as connection:
+        response = connection.request({'source': SOURCE, 'style': 'nope'})
+        assert response == {
+            'ok': False,
+            'changed': False,
+            'error': 'ValueError: Unknown docstring type: nope',
+        }
+        response = connection.request({'command': 'nope'})
+        assert response['ok'] is False
+
+
+def test_daemon_already_running(socket_path, capsys):
+    assert _daemon.serve(socket_path) == 1
+    assert 'already running' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('mode, changed', [('check', False), ('write', True)])
+def test_daemon_path(socket_path, tmpdir: Path, mode, changed):
+    test_file = tmpdir.join('test.py')
+    test_file.write(SOURCE)
+
+    with Connection(socket_path) as connection:
+        response = connection.request({'path': str(test_file), 'mode': mode})
+
+    assert response['changed'] is True
+    assert (test_file.read() != SOURCE) is changed
+
+
+def test_client(socket_path, tmpdir: Path):
+    test_file = tmpdir.join('test.py')
+    test_file.write(SOURCE)
+
+    argv = ['--socket', socket_path, str(test_file)]
+    assert client_main(argv) == 1
+    assert ':type x: int' in test_file.read()
+    assert client_main(argv) == 0
+
+
+def test_client_fallback_without_daemon(tmpdir: Path):
+    test_file = tmpdir.join('test.py')
+    test_file.write(SOURCE)
+
+    argv = ['--socket', str(tmpdir.join('none.sock')), str(test_file)]
+    assert client_main(argv) == 1
+    assert ':type x: int' in test_file.read()
@@ -0,0 +1,113 @@
+import io
+import os
+
+import pytest
+from py.path import local as Path
+
+from types2docstring._discovery import compile_rules
+from types2docstring._discovery import is_ignored
+from types2docstring._discovery import iter_filenames
+from types2docstring._discovery import parse_ignore_pattern
+from types2docstring.types2docstring import _main
+
+
+@pytest.mark.parametrize(
+    'line, path, is_dir, expected', [
+        ('*.py', '/r/a/b.py', False, True),
+        ('build/', '/r/build', True, True),
+        ('build/', '/r/build', False, False),
+        ('/gen', '/r/a/gen', True, False),
+        ('/gen', '/r/gen', True, True),
+        ('a/*.py', '/r/a/b.py', False, True),
+        ('**/gen', '/r/a/gen', True, True),
+        ('*.py', '/other/b.py', False, False),
+        ('*.py', '/rr/b.py', False, False),
+    ],
+)
+def test_is_ignored(line, path, is_dir, expected):
+    pattern = parse_ignore_pattern(line, '/r')
+    assert pattern is not None
+    assert is_ignored(path, is_dir, [compile_rules([pattern])]) is expected
+
+
+def test_is_ignored_negate():
+    rules = [
+        compile_rules([parse_ignore_pattern('*.py', '/r')]),
+        compile_rules([parse_ignore_pattern('!keep.py', '/r')]),
+        compile_rules([
+            parse_ignore_pattern('*.py', '/r/a'),
+            parse_ignore_pattern('!keep.py', '/r/a'),
+        ]),
+    ]
+    assert is_ignored('/r/drop.py', False, rules) is True
+    assert is_ignored('/r/keep.py', False, rules) is False
+    assert is_ignored('/r/a/keep.py', False, rules) is False
+    assert is_ignored('/r/a/b/drop.py', False, rules) is True
+
+
+@pytest.mark.parametrize('line', ['', '   ', '# comment'])
+def test_parse_ignore_pattern_empty(line):
+    assert parse_ignore_pattern(line, '/r') is None
+
+
+@pytest.fixture
+def project(tmpdir: Path):
+    tmpdir.join('.git').ensure(dir=True)
+    tmpdir.join('.gitignore').write('build/\n*_gen.py\n')
+    tmpdir.join('a.py').write('')
+    tmpdir.join('README.md').write('')
+    tmpdir.join('pkg', 'b.py').ensure()
+    tmpdir.join('pkg', 'c_gen.py').ensure()
+    tmpdir.join('pkg', 'sub', 'd.py').ensure()
+    tmpdir.join('pkg', 'sub', '.gitignore').write('d.py\n')
+    tmpdir.join('build', 'e.py').ensure()
+    with tmpdir.as_cwd():
+        yield tmpdir
+
+
+def test_iter_filenames_directory(project):
+    assert list(iter_filenames(['.'])) == [
+        os.path.join('.', 'a.py'),
+        os.path.join('.', 'pkg', 'b.py'),
+    ]
+
+
+def test_iter_filenames_respects_parent_gitignore(project):
+    assert list(iter_filenames(['pkg'])) == [os.path.join('pkg', 'b.py')]
+
+
+def test_iter_filenames_exclude(project):
+    assert list(iter_filenames(['.'], exclude=['pkg/'])) == [
+        os.path.join('.', 'a.py'),
+    ]
+
+
+def test_iter_filenames_glob(project):
+    assert list(iter_filenames(['**/*.py'])) == [
+        'a.py',
+        os.path.join('build', 'e.py'),
+        os.path.join('pkg', 'b.py'),
+        os.path.join('pkg', 'c_gen.py'),
+        os.path.join('pkg', 'sub', 'd.py'),
+    ]
+
+
+def test_iter_filenames_explicit_files(project):
+    assert list(iter_filenames(['README.md', 'build/e.py'])) == [
+        'README.md', 'build/e.py',
+    ]
+
+
+def test_iter_filenames_files_from(project):
+    files_from = io.StringIO('a.py\n\npkg\n')
+    assert list(iter_filenames([], files_from=files_from)) == [
+        'a.py', os.path.join('pkg', 'b.py'),
+    ]
+
+
+def test_main_directory(project):
+    project.join('pkg', 'b.py').write(
+        'def f(x: int) -> int:\n'
+        '   return x\n',
+    )
+    assert _main(['--check', '.']) == 1
@@ -1,8 +1,18 @@
+import importlib.metadata
+import subprocess
+import sys
+from string import Template
+
 import pytest
 
+from types2docstring import _helpers
 from types2docstring._docstrings._google import generate_google_docstring
+from types2docstring._docstrings._google import GOOGLE_TEMPLATE
+from types2docstring._docstrings._numpy import generate_numpy_docstring
 from types2docstring._docstrings._rst import generate_rst_docstring
+from types2docstring._helpers import compile_template
 from types2docstring._helpers import FunctionTypes
+from types2docstring._helpers import render_docstrings
 
 # RST DOCSTRING test
 
@@ -79,3 +89,121 @@ def test_generate_rst_docstring(fn_types, expected):
 )
 def test_generate_google_docstring(fn_types, expected):
     assert generate_google_docstring(fn_types, '') == expected
+
+
+# Helpers
+
+@pytest.mark.parametrize(
+    'template, mapping', [
+        ('', {}),
+        ('$a', {'a': 'x'}),
+        ('${a}b $c\n$$', {'a': 'x', 'c': 'y'}),
+        (GOOGLE_TEMPLATE, {'indent': '\t', 'args': 'a', 'returns': 'r'}),
+    ],
+)
+def test_compile_template(template, mapping):
+    render = compile_template(template)
+    assert render(mapping) == Template(template).substitute(mapping)
+
+
+def test_compile_template_invalid():
+    with pytest.raises(ValueError):
+        compile_template('$ invalid')
+
+
+def test_render_docstrings():
+    functions = [
+        (FunctionTypes([('x', 'int')], 'int'), ''),
+        (FunctionTypes([('self', None)], 'str'), '    '),
+    ]
+    assert render_docstrings('google', functions) == [
+        generate_google_docstring(fn_types, indent)
+        for fn_types, indent in functions
+    ]
+
+
+def _custom_docstring(fn_types, indent=''):
+    return f'{indent}"""custom"""'
+
+
+def test_docstring_types_lazy_import():
+    code = (
+        'import sys\n'
+        'from types2docstring.types2docstring import _main\n'
+        'from types2docstring._helpers import DOCSTRING_TYPES\n'
+        'assert "rst" in DOCSTRING_TYPES\n'
+        'DOCSTRING_TYPES["rst"]\n'
+        'print(sorted(m for m in sys.modules if "_docstrings." in m))\n'
+    )
+    out = subprocess.check_output((sys.executable, '-c', code), text=True)
+    assert out == "['types2docstring._docstrings._rst']\n"
+
+
+def test_docstring_types_entry_points(monkeypatch):
+    entry_point = importlib.metadata.EntryPoint(
+        name='custom',
+        value='tests.docstrings_test:_custom_docstring',
+        group=_helpers.ENTRY_POINT_GROUP,
+    )
+    calls = []
+
+    def entry_points():
+        calls.append(True)
+        return {'custom': entry_point}
+
+    monkeypatch.setattr(_helpers, '_entry_points', entry_points)
+    docstring_types = _helpers.DOCSTRING_TYPES
+    monkeypatch.setattr(
+        docstring_types, '_registered', dict(docstring_types._registered),
+    )
+    monkeypatch.setattr(docstring_types, '_entry_points_loaded', False)
+
+    # Builtin docstring types do not need to look at the entry points.
+    assert docstring_types['google'] is generate_google_docstring
+    assert calls == []
+
+    assert 'custom' in docstring_types
+    assert 'unknown' not in docstring_types
+    assert docstring_types['custom'] is _custom_docstring
+    assert list(docstring_types) == ['custom', 'google', 'numpy', 'rst']
+    assert len(docstring_types) == 4
+    assert calls == [True]
+
+
+def test_shared_cache(monkeypatch):
+    monkeypatch.setattr(_helpers, '_CACHE_INFOS', {})
+    calls = []
+
+    @_helpers.shared_cache('render')
+    def render(arg):
+        calls.append(arg)
+        return arg.upper()
+
+    assert [render('a'), render('b'), render('a')] == ['A', 'B', 'A']
+    assert calls == ['a', 'b']
+    assert _helpers.shared_cache_counts() == {
+        'annotation_cache_hits': 0,
+        'annotation_cache_misses': 0,
+        'render_cache_hits': 1,
+        'render_cache_misses': 2,
+    }
+
+
+@pytest.mark.parametrize(
+    'generate, expected', [
+        (generate_rst_docstring, ':param x: The x.\n'),
+        (generate_google_docstring, 'x (int): The x.\n'),
+        (generate_numpy_docstring, 'x : int\n\tThe x.\n'),
+    ],
+)
+def test_generate_docstring_descriptions(generate, expected):
+    fn_types = FunctionTypes(
+        [('x', 'int'), ('y', 'int')], 'int', {'x': 'The x.'},
+    )
+
+    docstring = generate(fn_types, '')
+
+    assert expected in docstring
+    assert '[argument description]' in docstring or (
+        '[y description]' in docstring
+    )
@@ -0,0 +1,123 @@
+import subprocess
+
+import pytest
+from py.path import local as Path
+
+from types2docstring._git import changed_lines
+from types2docstring._git import overlaps
+from types2docstring._git import parse_diff
+from types2docstring.types2docstring import _main
+
+DIFF = '''\
+diff --git a/a.py b/a.py
+index 1111111..2222222 100644
+--- a/a.py
++++ b/a.py
+@@ -1 +1 @@
+-x
++y
+@@ -5,0 +6,3 @@ def f():
++a
++b
++c
+@@ -10,2 +12,0 @@ def g():
+-d
+-e
+diff --git a/removed.py b/removed.py
+deleted file mode 100644
+--- a/removed.py
++++ /dev/null
+@@ -1 +0,0 @@
+-x
+'''
+
+
+def test_parse_diff():
+    assert parse_diff(DIFF) == {'a.py': [(1, 1), (6, 8), (12, 13)]}
+
+
+@pytest.mark.parametrize(
+    'start, end, expected', [
+        (1, 1, True),
+        (2, 5, False),
+        (4, 6, True),
+        (8, 11, True),
+        (9, 11, False),
+        (14, 20, False),
+    ],
+)
+def test_overlaps(start, end, expected):
+    ranges = [(1, 1), (6, 8), (12, 13)]
+    starts = [1, 6, 12]
+    assert overlaps(start, end, ranges, starts) is expected
+
+
+def _git(*args):
+    subprocess.run(('git', *args), check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmpdir: Path):
+    with tmpdir.as_cwd():
+        _git('init', '-q', '.')
+        _git('config', 'user.name', 'test')
+        _git('config', 'user.email', 'test@example.com')
+        tmpdir.join('a.py').write(
+            'def f(x: int) -> int:\n'
+            '    return x\n'
+            '\n'
+            'def g(x: int) -> int:\n'
+            '    return x\n',
+        )
+        tmpdir.join('b.py').write(
+            'def h(x: int) -> int:\n'
+            '    return x\n',
+        )
+        _git('add', '.')
+        _git('commit', '-q', '-m', 'initial')
+        yield tmpdir
+
+
+def test_changed_lines(repo):
+    repo.join('a.py').write(
+        'def f(x: int) -> int:\n'
+        '    return x\n'
+        '\n'
+        'def g(x: int, y: int) -> int:\n'
+        '    return x\n',
+    )
+    assert changed_lines() == {'a.py': [(4, 4)]}
+    assert changed_lines(staged=True) == {}
+
+    _git('add', 'a.py')
+    assert changed_lines() == {}
+    assert changed_lines(staged=True) == {'a.py': [(4, 4)]}
+    assert changed_lines('HEAD') == {'a.py': [(4, 4)]}
+
+
+def test_main_changed_since(repo):
+    repo.join('a.py').write(
+        'def f(x: int) -> int:\n'
+        '    return x + 1\n'
+        '\n'
+        'def g(x: int, y: int) -> int:\n'
+        '    return x\n',
+    )
+
+    assert _main(['--changed-since', 'HEAD']) == 1
+
+    content = repo.join('a.py').read()
+    assert ':param x:' not in content.split('def g')[0]
+    assert ':param y: [y description]' in content
+    assert ':type' not in repo.join('b.py').read()
+
+
+def test_main_staged_nothing_staged(repo):
+    repo.join('a.py').write('def f(x: str) -> str:\n    return x\n')
+    assert _main(['--staged']) == 0
+
+
+def test_main_changed_since_invalid_ref(repo, capsys):
+    with pytest.raises(SystemExit):
+        _main(['--changed-since', 'does-not-exist'])
+    assert 'git diff failed' in capsys.readouterr().err
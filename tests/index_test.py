@@ -0,0 +1,123 @@
+import io
+import json
+import sys
+
+import pytest
+from py.path import local as Path
+
+from types2docstring import _index
+from types2docstring.types2docstring import _main
+
+DOCUMENTED = (
+    'def f(session: Session, request_id: str, *args: int) -> int:\n'
+    '    """\n'
+    '    :param session: The session.\n'
+    '    :param request_id: [request_id description]\n'
+    '    :param args: The args.\n'
+    '    """\n'
+    '    return 1\n'
+)
+
+
+def test_update(tmpdir: Path):
+    index_path = str(tmpdir.join('index.json'))
+    documented = tmpdir.join('documented.py')
+    documented.write(DOCUMENTED)
+    invalid = tmpdir.join('invalid.py')
+    invalid.write('def f(:\n')
+    latin1 = tmpdir.join('latin1.py')
+    latin1.write_binary(b'def f(\xe9: int) -> int:\n    pass\n')
+
+    filenames = [str(documented), str(invalid), str(latin1)]
+    assert _index.update(index_path, filenames) == 3
+    with open(index_path) as f:
+        index = json.load(f)
+    assert index['files'][str(documented)]['params'] == [
+        ['session', 'Session', 'The session.'],
+        ['args', 'int', 'The args.'],
+    ]
+    assert index['files'][str(invalid)]['params'] == []
+    assert index['files'][str(latin1)]['params'] == []
+
+    # Only the changed files are parsed again.
+    assert _index.update(index_path, filenames) == 0
+    documented.write(DOCUMENTED.replace('The session.', 'A session.'))
+    assert _index.update(index_path, filenames) == 1
+    assert _index.load(index_path)['session', 'Session'] == 'A session.'
+
+    # Files that were removed are removed from the index.
+    documented.remove()
+    assert _index.update(index_path, [str(invalid), str(latin1)]) == 0
+    assert _index.load(index_path) == {}
+
+
+def test_update_other_format(tmpdir: Path):
+    index_file = tmpdir.join('index.json')
+    index_file.write(json.dumps({'format': 0, 'files': {'x.py': {}}}))
+    documented = tmpdir.join('documented.py')
+    documented.write(DOCUMENTED)
+
+    assert _index.update(str(index_file), [str(documented)]) == 1
+    assert 'x.py' not in json.loads(index_file.read())['files']
+
+
+def test_load_most_common(tmpdir: Path):
+    index_path = str(tmpdir.join('index.json'))
+    files = []
+    for i, description in enumerate(('Rare.', 'Common.', 'Common.')):
+        file = tmpdir.join(f'f{i}.py')
+        file.write(DOCUMENTED.replace('The session.', description))
+        files.append(str(file))
+    _index.update(index_path, files)
+
+    assert _index.load(index_path) == {
+        ('session', 'Session'): 'Common.',
+        ('args', 'int'): 'The args.',
+    }
+
+
+def test_load_missing(tmpdir: Path):
+    assert _index.load(str(tmpdir.join('index.json'))) == {}
+
+
+def test_main_index(tmpdir: Path):
+    index_path = tmpdir.join('index.json')
+    tmpdir.join('documented.py').write(DOCUMENTED)
+    undocumented = tmpdir.join('undocumented.py')
+    undocumented.write(
+        'def g(session: Session, request_id: str) -> int:\n'
+        '    return 1\n',
+    )
+
+    assert _main(['--index', str(index_path), str(tmpdir)]) == 1
+
+    assert index_path.check()
+    content = undocumented.read()
+    assert ':param session: The session.\n' in content
+    assert ':param request_id: [request_id description]\n' in content
+
+
+@pytest.mark.parametrize('from_stdin', (False, True))
+def test_main_index_files_from(tmpdir: Path, monkeypatch, from_stdin):
+    index_path = tmpdir.join('index.json')
+    documented = tmpdir.join('documented.py')
+    documented.write(DOCUMENTED)
+    undocumented = tmpdir.join('undocumented.py')
+    undocumented.write(
+        'def g(session: Session) -> int:\n'
+        '    return 1\n',
+    )
+    names = f'{documented}\n{undocumented}\n'
+    if from_stdin:
+        monkeypatch.setattr(sys, 'stdin', io.StringIO(names))
+        files_from = '-'
+    else:
+        files_from = str(tmpdir.join('list.txt'))
+        tmpdir.join('list.txt').write(names)
+
+    argv = ['--index', str(index_path), '--files-from', files_from]
+    assert _main(argv) == 1
+
+    assert str(documented) in json.loads(index_path.read())['files']
+    content = undocumented.read_text('UTF-8')
+    assert ':param session: The session.\n' in content
@@ -0,0 +1,129 @@
+import difflib
+import json
+
+import pytest
+
+from types2docstring import rewrite_source
+from types2docstring._output import json_lines
+from types2docstring._output import lsp_text_edits
+from types2docstring._output import STDIN_NAME
+from types2docstring._output import unified_diff
+from types2docstring.types2docstring import Edit
+
+
+def _difflib_diff(filename, contents, new_contents):
+    return ''.join(
+        difflib.unified_diff(
+            contents.splitlines(keepends=True),
+            new_contents.splitlines(keepends=True),
+            fromfile=filename,
+            tofile=filename,
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    'source', [
+        'def f(x: int) -> int:\n    return x\n',
+        # Hunks that are far apart and hunks that share context lines.
+        'import os\n'
+        'def f(x: int) -> int:\n    return x\n' +
+        'X = 1\n' * 10 +
+        'def g() -> None:\n    pass\n'
+        '\n'
+        'def h() -> None:\n    pass\n',
+    ],
+)
+@pytest.mark.parametrize('style', ('rst', 'google'))
+def test_unified_diff(source, style):
+    result = rewrite_source(source, style)
+
+    assert unified_diff('t.py', source, result.edits) == _difflib_diff(
+        't.py', source, result.src,
+    )
+
+
+def test_unified_diff_sync():
+    source = (
+        'def f(y: int) -> int:\n'
+        '    """\n'
+        '    :param x: The x.\n'
+        '    :type x: int\n'
+        '    """\n'
+    )
+    result = rewrite_source(source, sync=True)
+
+    assert unified_diff('t.py', source, result.edits) == (
+        '--- t.py\n'
+        '+++ t.py\n'
+        '@@ -1,5 +1,5 @@\n'
+        ' def f(y: int) -> int:\n'
+        '     """\n'
+        '-    :param x: The x.\n'
+        '-    :type x: int\n'
+        '+    :param y: [y description]\n'
+        '+    :type y: int\n'
+        '     """\n'
+    )
+
+
+def test_unified_diff_no_newline_at_end():
+    source = 'def f(x: int) -> int:\n    return x'
+    result = rewrite_source(source)
+
+    diff = unified_diff('t.py', source, result.edits)
+
+    # `difflib` leaves the last line without its newline and the marker.
+    expected = _difflib_diff('t.py', source, result.src)
+    assert expected.endswith('     return x')
+    assert diff == f'{expected}\n\\ No newline at end of file\n'
+
+
+def test_unified_diff_no_edits():
+    assert unified_diff('t.py', 'X = 1\n', []) == ''
+
+
+def test_json_lines():
+    edits = [
+        Edit(1, 21, 1, 21, '\n    """Doc."""', 'f'),
+        Edit(5, 0, 6, 0, '', 'g'),
+    ]
+
+    lines = json_lines('t.py', '', edits).splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {
+            'file': 't.py',
+            'line': 1,
+            'column': 21,
+            'end_line': 1,
+            'end_column': 21,
+            'text': '\n    """Doc."""',
+            'function': 'f',
+        },
+        {
+            'file': 't.py',
+            'line': 5,
+            'column': 0,
+            'end_line': 6,
+            'end_column': 0,
+            'text': '',
+            'function': 'g',
+        },
+    ]
+
+
+def test_lsp_text_edits():
+    # The characters of LSP are UTF-16 code units, `𝕩` takes two.
+    source = 'def f(𝕩: int) -> int:\n    return 𝕩\n'
+    result = rewrite_source(source)
+
+    output = json.loads(lsp_text_edits(STDIN_NAME, source, result.edits))
+
+    assert output['uri'] is None
+    [text_edit] = output['edits']
+    assert text_edit['range'] == {
+        'start': {'line': 0, 'character': 22},
+        'end': {'line': 0, 'character': 22},
+    }
+    assert text_edit['newText'] == result.edits[0].text
@@ -0,0 +1,159 @@
+import pytest
+
+from types2docstring._parse import is_placeholder
+from types2docstring._parse import parse_docstring
+from types2docstring._parse import parse_params
+
+
+@pytest.mark.parametrize(
+    'docstring, expected', [
+        ('Summary.', []),
+        (
+            'Summary.\n'
+            '\n'
+            ':param x: The x\n'
+            '    spanning lines.\n'
+            ':type x: int\n'
+            ':param str y: The y.\n'
+            ':param z:\n'
+            ':returns: Something.\n',
+            [
+                ('x', 'int', 'The x spanning lines.'),
+                ('y', 'str', 'The y.'),
+                ('z', None, ''),
+            ],
+        ),
+        (
+            'Summary.\n'
+            '\n'
+            'Args:\n'
+            '    x (int): The x\n'
+            '        spanning lines.\n'
+            '    *args: More.\n'
+            '\n'
+            'Returns:\n'
+            '    int: Something.\n',
+            [
+                ('x', 'int', 'The x spanning lines.'),
+                ('*args', None, 'More.'),
+            ],
+        ),
+        (
+            'Summary.\n'
+            '\n'
+            'Parameters\n'
+            '----------\n'
+            'x : Dict[str, int]\n'
+            '    The x\n'
+            '    spanning lines.\n'
+            'y\n'
+            '    The y.\n'
+            '\n'
+            'Returns\n'
+            '-------\n'
+            'int\n'
+            '    Something.\n',
+            [
+                ('x', 'Dict[str, int]', 'The x spanning lines.'),
+                ('y', None, 'The y.'),
+            ],
+        ),
+        (
+            '[function description]\n'
+            '\n'
+            'Args:\n'
+            '\tx (int): [argument description]\n',
+            [('x', 'int', '[argument description]')],
+        ),
+        # Roles at the start of a line are not fields.
+        (
+            'Summary, see\n'
+            ':func:`g`.\n'
+            '\n'
+            ':param x: The x, see\n'
+            '    :class:`X`.\n'
+            ':type x: int\n',
+            [('x', 'int', 'The x, see :class:`X`.')],
+        ),
+    ],
+)
+def test_parse_params(docstring, expected):
+    params = parse_params(docstring)
+    assert [(p.name, p.type, p.description) for p in params] == expected
+
+
+@pytest.mark.parametrize(
+    'description, expected', [
+        ('[x description]', True),
+        ('[argument description]', True),
+        ('The x.', False),
+        ('[x] is the description', False),
+    ],
+)
+def test_is_placeholder(description, expected):
+    assert is_placeholder(description) is expected
+
+
+def test_parse_docstring_positions():
+    lines = [
+        '    Summary.',
+        '',
+        '    :param x: The x',
+        '        spanning lines.',
+        '    :type x: Dict[str, int]',
+        '    :param str y: The y.',
+        '    :returns: Something.',
+        '    :rtype: int',
+    ]
+    docstring = parse_docstring(lines)
+
+    assert docstring is not None
+    assert docstring.style == 'rst'
+    assert docstring.indent == '    '
+    assert docstring.add_line == 2
+    x, y = docstring.params
+    assert (x.start, x.end, x.type_line) == (2, 4, 4)
+    assert x.retyped('float') == '    :type x: float'
+    assert (y.start, y.end, y.type_line) == (5, 6, 5)
+    assert y.retyped('bytes') == '    :param bytes y: The y.'
+    assert docstring.returns is not None
+    assert docstring.returns.retyped('str') == '    :rtype: str'
+
+
+def test_parse_docstring_no_arguments():
+    lines = [
+        'Summary.',
+        '',
+        'Args:',
+        '\tNo arguments',
+        '',
+        'Returns:',
+        '\tint: Something.',
+    ]
+    docstring = parse_docstring(lines)
+
+    assert docstring is not None
+    assert docstring.style == 'google'
+    assert docstring.params == []
+    assert (docstring.add_line, docstring.add_replaces) == (3, True)
+    assert docstring.indent == '\t'
+    assert docstring.returns is not None
+    assert docstring.returns.type == 'int'
+
+
+def test_parse_docstring_numpy_indent():
+    lines = [
+        'Parameters',
+        '----------',
+        'x : int',
+        '      The x.',
+    ]
+    docstring = parse_docstring(lines)
+
+    assert docstring is not None
+    assert docstring.style == 'numpy'
+    assert docstring.description_indent == '      '
+
+
+def test_parse_docstring_without_style():
+    assert parse_docstring(['Summary.', '', 'More text.']) is None
@@ -0,0 +1,107 @@
+import json
+
+from py.path import local as Path
+
+from types2docstring._stats import FileStats
+from types2docstring._stats import RunStats
+from types2docstring.types2docstring import _main
+
+
+def _file_stats(filename, seconds, **counts):
+    stats = FileStats(filename)
+    stats.times['parse'] = seconds
+    for counter, n in counts.items():
+        stats.count(counter, n)
+    return stats
+
+
+def test_file_stats_time():
+    stats = FileStats('f.py')
+    with stats.time('parse'):
+        pass
+    with stats.time('parse'):
+        pass
+
+    assert list(stats.times) == ['parse']
+    assert stats.total == stats.times['parse']
+
+
+def test_run_stats_slowest_files():
+    stats = RunStats(top=2)
+    for i, seconds in enumerate((0.3, 0.1, 0.5, 0.2)):
+        stats.add(_file_stats(f'{i}.py', seconds, functions_scanned=2))
+
+    assert stats.files == 4
+    assert stats.counts == {'functions_scanned': 8}
+    assert stats.slowest == [(0.5, '2.py'), (0.3, '0.py')]
+    assert 'Slowest files:' in stats.report()
+
+
+def test_run_stats_no_top():
+    stats = RunStats(top=0)
+    stats.add(_file_stats('f.py', 0.1))
+
+    assert stats.slowest == []
+    assert 'Slowest files:' not in stats.report()
+
+
+def test_run_stats_cache_hit_rates():
+    stats = RunStats()
+    stats.add(
+        _file_stats(
+            'f.py', 0.1, render_cache_hits=3, render_cache_misses=1,
+            annotation_cache_misses=2,
+        ),
+    )
+    stats.add(_file_stats('g.py', 0.1, annotation_cache_hits=2))
+
+    assert stats.cache_hit_rates == {'annotation': 0.5, 'render': 0.75}
+    assert stats.to_dict()['cache_hit_rates'] == stats.cache_hit_rates
+    assert 'render                         75.0%' in stats.report()
+
+
+def test_main_stats_json(tmpdir: Path, capsys):
+    documented = tmpdir.join('documented.py')
+    documented.write(
+        'def f(x: int) -> int:\n'
+        '   """docstring"""\n'
+        '   return x\n'
+        'def g(x) -> int:\n'
+        '   return x\n',
+    )
+    undocumented = tmpdir.join('undocumented.py')
+    undocumented.write(
+        'def f(x: int) -> int:\n'
+        '   return x\n',
+    )
+    constants = tmpdir.join('constants.py')
+    constants.write('X = 1\n')
+
+    argv = [
+        '--jobs', '1', '--check', '--stats', '--stats-json', '-',
+        str(documented), str(undocumented), str(constants),
+    ]
+    assert _main(argv) == 1
+
+    out, err = capsys.readouterr()
+    stats = json.loads(out[out.index('{'):])
+    assert stats['files'] == 3
+    # Whether the shared caches hit depends on what was rewritten before
+    # in this process, the single parameter is looked up once.
+    counts = stats['counts']
+    lookups = (
+        counts.pop('render_cache_hits', 0) +
+        counts.pop('render_cache_misses', 0)
+    )
+    assert lookups == 1
+    assert counts == {
+        'files_changed': 1,
+        'files_skipped_prefilter': 1,
+        'functions_rewritten': 1,
+        'functions_scanned': 3,
+        'functions_skipped_documented': 1,
+        'functions_skipped_not_annotated': 1,
+    }
+    assert 'annotations' in stats['stages']
+    assert len(stats['slowest_files']) == 3
+    assert 'Processed 3 files' in err
@@ -0,0 +1,320 @@
+import pytest
+from py.path import local as Path
+
+from types2docstring import rewrite_source
+from types2docstring._helpers import FunctionTypes
+from types2docstring._sync import sync_docstring
+from types2docstring.types2docstring import _main
+
+
+def _stripped(src):
+    return [line.strip() for line in src.splitlines() if line.strip()]
+
+
+@pytest.mark.parametrize('style', ('rst', 'google', 'numpy'))
+def test_sync_generated_docstrings(style):
+    src = (
+        'class A:\n'
+        '    def f(self, x: int, y: str) -> int:\n'
+        '        pass\n'
+        'def g() -> None:\n'
+        '    pass\n'
+    )
+    changed_src = rewrite_source(src, style).src.replace(
+        'def f(self, x: int, y: str) -> int',
+        'def f(self, z: bytes, x: float) -> str',
+    ).replace('def g() -> None', 'def g(a: int) -> None')
+    expected = rewrite_source(
+        src.replace(
+            'def f(self, x: int, y: str) -> int',
+            'def f(self, z: bytes, x: float) -> str',
+        ).replace('def g() -> None', 'def g(a: int) -> None'),
+        style,
+    ).src
+
+    result = rewrite_source(changed_src, style, sync=True)
+
+    assert result.changed
+    assert {edit.function for edit in result.edits} == {'f', 'g'}
+    # The same lines as new docstrings, only the blank lines can differ.
+    assert _stripped(result.src) == _stripped(expected)
+    # Synced docstrings are up to date.
+    assert not rewrite_source(result.src, style, sync=True).changed
+
+
+def test_sync_only_with_sync():
+    src = rewrite_source('def f(x: int) -> int:\n    pass\n').src
+    src = src.replace('(x: int)', '(x: str)')
+
+    assert not rewrite_source(src).changed
+    assert rewrite_source(src, sync=True).changed
+
+
+def test_sync_keeps_descriptions():
+    src = (
+        'def f(x: int, y: int) -> int:\n'
+        '    """\n'
+        '    Adds the numbers.\n'
+        '\n'
+        '    :param y: The second number,\n'
+        '        keep this.\n'
+        '    :type y: str\n'
+        '    :param x: The first number.\n'
+        '    :type x: int\n'
+        '    :param z: Gone.\n'
+        '    :type z: int\n'
+        '    :returns: The sum.\n'
+        '    :rtype: int\n'
+        '    """\n'
+        '    return x + y\n'
+    )
+    expected = (
+        'def f(x: int, y: int) -> int:\n'
+        '    """\n'
+        '    Adds the numbers.\n'
+        '\n'
+        '    :param y: The second number,\n'
+        '        keep this.\n'
+        '    :type y: int\n'
+        '    :param x: The first number.\n'
+        '    :type x: int\n'
+        '    :returns: The sum.\n'
+        '    :rtype: int\n'
+        '    """\n'
+        '    return x + y\n'
+    )
+
+    assert rewrite_source(src, sync=True).src == expected
+
+
+def _lines(docstring):
+    return docstring.split('\n')
+
+
+@pytest.mark.parametrize(
+    'docstring, fn_types, expected', [
+        # Up to date.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (int): The x.\n'
+            '"""',
+            FunctionTypes([('x', 'int')], 'int'),
+            [],
+        ),
+        # Whitespace in the types does not matter.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (Dict[str,int]): The x.\n'
+            '"""',
+            FunctionTypes([('x', 'Dict[str, int]')], 'int'),
+            [],
+        ),
+        # Forward references and shortened references are the same type.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (~Control): The x.\n'
+            '\n'
+            'Returns:\n'
+            '    ConsoleRenderable: The result.\n'
+            '"""',
+            FunctionTypes([('x', "'Control'")], '"ConsoleRenderable"'),
+            [],
+        ),
+        # Retyped without the quotes of the forward reference.
+        (
+            '"""\n'
+            'Returns:\n'
+            '    int: The result.\n'
+            '"""',
+            FunctionTypes([], '"ConsoleRenderable"'),
+            [(2, 3, ['    ConsoleRenderable: The result.'])],
+        ),
+        # Retyped, optional is kept.
+        (
+            '"""\n'
+            'Parameters\n'
+            '----------\n'
+            'x : int, optional\n'
+            '    The x.\n'
+            '"""',
+            FunctionTypes([('x', 'float')], 'int'),
+            [(3, 4, ['x : float, optional'])],
+        ),
+        # Added with the description from the index.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (int): The x.\n'
+            '"""',
+            FunctionTypes(
+                [('x', 'int'), ('y', 'str')], 'int', {'y': 'The y.'},
+            ),
+            [(3, 3, ['    y (str): The y.'])],
+        ),
+        # Added before the first parameter.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (int): The x.\n'
+            '"""',
+            FunctionTypes([('self', None), ('w', 'int'), ('x', 'int')], 'int'),
+            [(2, 2, ['    w (int): [argument description]'])],
+        ),
+        # The last parameter is removed.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (int): The x.\n'
+            '    *args (str): More\n'
+            '        x.\n'
+            '"""',
+            FunctionTypes([('x', 'int')], 'int'),
+            [(3, 5, [])],
+        ),
+        # All parameters are removed.
+        (
+            '"""\n'
+            'Args:\n'
+            '    x (int): The x.\n'
+            '\n'
+            'Returns:\n'
+            '    int: The result.\n'
+            '"""',
+            FunctionTypes([], 'str'),
+            [(2, 3, ['    No arguments']), (5, 6, ['    str: The result.'])],
+        ),
+        # A description is not a type.
+        (
+            '"""\n'
+            'Returns:\n'
+            '    The sum of x: and y.\n'
+            '"""',
+            FunctionTypes([], 'str'),
+            [],
+        ),
+        # Not in any of the styles.
+        (
+            '"""\n'
+            'Adds x and y.\n'
+            '"""',
+            FunctionTypes([('x', 'int')], 'int'),
+            [],
+        ),
+        # The closing quotes are not on a line of their own.
+        (
+            '"""\n'
+            ':param x: The x.\n'
+            ':type x: str"""',
+            FunctionTypes([('x', 'int')], 'int'),
+            [],
+        ),
+    ],
+)
+def test_sync_docstring(docstring, fn_types, expected):
+    assert sync_docstring(_lines(docstring), fn_types) == expected
+
+
+@pytest.mark.parametrize(
+    'docstring, expected', [
+        (
+            '    Parameters\n'
+            '    ----------\n'
+            '    x : int\n'
+            '        The x, see\n'
+            '        :func:`g` for details.\n',
+            '    y : int\n'
+            '        [argument description]\n',
+        ),
+        (
+            '    Args:\n'
+            '        x (int): The x, see\n'
+            '            :func:`g` for details.\n',
+            '        y (int): [argument description]\n',
+        ),
+    ],
+)
+def test_sync_role_at_line_start(docstring, expected):
+    src = (
+        'def f(x: int, y: int) -> None:\n'
+        '    """\n'
+        '    Summary.\n'
+        '\n'
+        f'{docstring}'
+        '    """\n'
+    )
+
+    result = rewrite_source(src, sync=True)
+
+    # Added after x, not in the middle of its description.
+    closing = '    """\n'
+    assert result.src == f'{src[:-len(closing)]}{expected}{closing}'
+
+
+def test_sync_keeps_keyword_args():
+    src = (
+        'def f(x: int, **kwargs: Any) -> None:\n'
+        '    """\n'
+        '    Args:\n'
+        '        x (str): The x.\n'
+        '        verbose (bool): Documented here as well.\n'
+        '        kwargs (Any): The options.\n'
+        '\n'
+        '    Keyword Args:\n'
+        '        timeout (float): The timeout.\n'
+        '        retries (int): The retries.\n'
+        '    """\n'
+    )
+
+    result = rewrite_source(src, sync=True)
+
+    assert result.src == src.replace('x (str)', 'x (int)')
+
+
+@pytest.mark.parametrize(
+    'docstring', [
+        '    Keyword Args:\n'
+        '        timeout (str): The timeout.\n',
+        '    Other Parameters\n'
+        '    ----------------\n'
+        '    timeout : str\n'
+        '        The timeout.\n',
+    ],
+)
+def test_sync_other_sections(docstring):
+    src = (
+        'def f(*, timeout: float) -> None:\n'
+        '    """\n'
+        '    Summary.\n'
+        '\n'
+        f'{docstring}'
+        '    """\n'
+    )
+
+    result = rewrite_source(src, sync=True)
+
+    # Retyped, but not added to the main section again.
+    assert result.src == src.replace('str', 'float')
+
+
+def test_sync_docstring_on_signature_line():
+    src = 'def f(x: int) -> int: """:param x: The x.\n:type x: str\n"""\n'
+    assert not rewrite_source(src, sync=True).changed
+
+
+def test_main_sync(tmpdir: Path):
+    test_file = tmpdir.join('test.py')
+    test_file.write('def f(x: int) -> int:\n    pass\n')
+    assert _main(['--type', 'google', str(test_file)]) == 1
+
+    test_file.write(
+        test_file.read_text('UTF-8').replace('x: int', 'x: str'),
+    )
+    assert _main(['--type', 'google', str(test_file)]) == 0
+    assert _main(['--type', 'google', '--sync', str(test_file)]) == 1
+
+    synced = test_file.read_text('UTF-8')
+    assert 'x (str): [argument description]' in synced
+    assert _main(['--type', 'google', '--sync', str(test_file)]) == 0
@@ -1,60 +1,137 @@
 import ast
+import io
+import json
+import sys
 
 import pytest
 from py.path import local as Path
 from tokenize_rt import src_to_tokens
 
+from types2docstring import rewrite_source
+from types2docstring import RewriteResult
+from types2docstring import types2docstring
+from types2docstring._stats import FileStats
+from types2docstring.types2docstring import _build_token_index
+from types2docstring.types2docstring import _can_splice
+from types2docstring.types2docstring import _find_colon
+from types2docstring.types2docstring import _fix_contents
+from types2docstring.types2docstring import _FunctionCollector
 from types2docstring.types2docstring import _get_args_and_types
+from types2docstring.types2docstring import _Insertion
 from types2docstring.types2docstring import _is_method
+from types2docstring.types2docstring import _is_return_annotated
+from types2docstring.types2docstring import _line_offsets
 from types2docstring.types2docstring import _main
+from types2docstring.types2docstring import _may_need_docstrings
 from types2docstring.types2docstring import _node_fully_annotated
 from types2docstring.types2docstring import _node_to_annotation
+from types2docstring.types2docstring import _read_documents
+from types2docstring.types2docstring import _rewrite_file
+from types2docstring.types2docstring import _simple_insertion
+from types2docstring.types2docstring import _token_insertion
 from types2docstring.types2docstring import FunctionTypes
+from types2docstring.types2docstring import MODE_CHECK
 
-# TODO:
-# - test: `_is_return_annotated`
-# - test the --type argument
 
+def _collect_functions(source):
 
-def _create_nodes(source):
+    collector = _FunctionCollector()
+    collector.visit(ast.parse(source))
 
-    tree = ast.parse(source)
-
-    for node in ast.walk(tree):
-        for child in ast.iter_child_nodes(node):
-            setattr(child, 'parent', node)
-
-    return tree
+    return collector.functions
 
 
 def test_node_to_annotation():
     source = 'def t(x: list[set[int]]) -> list[set[Union[int, str]]]:\n\treturn x'  # noqa: E501
-    # TODO: Simplify these tests
-    tree = ast.parse(source)
+    lines = source.split('\n')
+    fn = ast.parse(source).body[0]
+    assert isinstance(fn, ast.FunctionDef)
+
+    annotation = fn.args.args[0].annotation
+    assert annotation is not None and fn.returns is not None
+    assert _node_to_annotation(annotation, lines) == 'list[set[int]]'
+    assert _node_to_annotation(fn.returns, lines) == (
+        'list[set[Union[int, str]]]'
+    )
+
+
+def test_build_token_index_brackets():
+    source = 'def f(x: dict[str, list[int]] = {}) -> int:\n    return 1\n'
     tokens = src_to_tokens(source)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-
-            # Test for the arguments
-            for arg in node.args.args:
-                if hasattr(arg, 'annotation'):
-                    if isinstance(getattr(arg, 'annotation'), ast.Subscript):
-                        a = _node_to_annotation(
-                            getattr(arg, 'annotation'), tokens,
-                        )
-                        assert a == 'list[set[int]]'
-                else:  # pragma: nocover
-                    assert False
-
-            # Test the return annotation
-            if isinstance(node.returns, ast.Subscript):
-                a = _node_to_annotation(node.returns, tokens)
-                assert a == 'list[set[Union[int, str]]]'
-            else:  # pragma: nocover
-                assert False
-
-
-def test_is_method_no_parent_attr():
+    index = _build_token_index(tokens)
+
+    for start, end in index.brackets.items():
+        assert index.brackets[end] == start
+        pair = tokens[min(start, end)].src + tokens[max(start, end)].src
+        assert pair in ('()', '[]', '{}')
+
+    def_pos = index.positions[(1, 0)]
+    assert tokens[def_pos].src == 'def'
+
+
+@pytest.mark.parametrize(
+    'source, expected', [
+        (
+            'def f(x: dict[str, list[int]] = {}) -> int:\n'
+            '    return 1\n',
+            'dict[str, list[int]]',
+        ),
+        (
+            'def f(\n'
+            '    x: Callable[[int, str], dict[str, int]],\n'
+            ') -> int:\n'
+            '    return 1\n',
+            'Callable[[int, str], dict[str, int]]',
+        ),
+        (
+            'def f(x: tuple[int, ...] | None, y: int) -> int:\n'
+            '    return 1\n',
+            'tuple[int, ...] | None',
+        ),
+        (
+            'def f(x: typing.Any) -> int:\n'
+            '    return 1\n',
+            'typing.Any',
+        ),
+        (
+            "def f(x: 'Foo[int]' = None) -> int:\n"
+            '    return 1\n',
+            "'Foo[int]'",
+        ),
+        (
+            'def f(x: (int)) -> int:\n'
+            '    return 1\n',
+            'int',
+        ),
+        (
+            'def f(x: (List[int]  # comment\n'
+            '          )) -> int:\n'
+            '    return 1\n',
+            'List[int]',
+        ),
+        (
+            'def f(x: Dict[str,\n'
+            '              int]) -> int:\n'
+            '    return 1\n',
+            'Dict[str,\n              int]',
+        ),
+        (
+            'def f(é: Literal["é", "ü"], y: int) -> int:\n'
+            '    return 1\n',
+            'Literal["é", "ü"]',
+        ),
+    ],
+)
+def test_node_to_annotation_kinds(source, expected):
+    fn = ast.parse(source).body[0]
+    assert isinstance(fn, ast.FunctionDef)
+
+    annotation = fn.args.args[0].annotation
+    assert annotation is not None
+    assert _node_to_annotation(annotation, source.split('\n')) == expected
+
+
+def test_is_method_no_scope():
 
     fn = """def f(x: int) -> int:
         return x*x
@@ -62,19 +139,22 @@ def test_is_method_no_parent_attr():
     node = ast.parse(fn)
 
     assert isinstance(node.body[0], ast.FunctionDef)
-    assert _is_method(node.body[0]) is False
+    assert _is_method(node.body[0], None) is False
 
 
-def test_is_method_with_parent_no_method():
+def test_is_method_with_scope_no_method():
 
     fn = """def f(x: int) -> int:
-        return x*x
+        def g(y: int) -> int:
+            return y
+        return g(x)
     """
     node = ast.parse(fn)
-    setattr(node.body[0], 'parent', node)
     assert isinstance(node.body[0], ast.FunctionDef)
-    assert hasattr(node.body[0], 'parent')
-    assert _is_method(node.body[0]) is False
+    assert _is_method(node.body[0], node) is False
+    inner = node.body[0].body[0]
+    assert isinstance(inner, ast.FunctionDef)
+    assert _is_method(inner, node.body[0]) is False
 
 
 def test_is_method():
@@ -86,21 +166,60 @@ def test_is_method():
     @classmethod
     def test2(cls, x:int) -> int:
         return x*x
+
+    @staticmethod
+    def test3(x: int) -> int:
+        return x*x
     """
 
     tree = ast.parse(source)
 
-    for node in ast.walk(tree):
-        for child in ast.iter_child_nodes(node):
-            setattr(child, 'parent', node)
-
     assert isinstance(tree.body[0], ast.ClassDef)
     fns = tree.body[0].body
 
     assert isinstance(fns[0], ast.FunctionDef)
-    assert _is_method(fns[0]) is True
+    assert _is_method(fns[0], tree.body[0]) is True
     assert isinstance(fns[1], ast.FunctionDef)
-    assert _is_method(fns[1]) is True
+    assert _is_method(fns[1], tree.body[0]) is True
+    assert isinstance(fns[2], ast.FunctionDef)
+    assert _is_method(fns[2], tree.body[0]) is False
+
+
+def test_function_collector():
+
+    source = """class C:
+    def m(self) -> int:
+        def inner(self) -> int:
+            return 1
+        return inner(self)
+
+    class D:
+        async def m(self) -> int:
+            return 1
+
+    if TYPE_CHECKING:
+        def n(self) -> int:
+            return 1
+
+    @staticmethod
+    def s(self) -> int:
+        return 1
+
+
+async def f() -> int:
+    return 1
+    """
+
+    functions = _collect_functions(source)
+
+    assert [(fn.node.name, fn.is_method) for fn in functions] == [
+        ('m', True),
+        ('inner', False),
+        ('m', True),
+        ('n', True),
+        ('s', False),
+        ('f', False),
+    ]
 
 
 @pytest.mark.parametrize(
@@ -134,14 +253,43 @@ def test_is_method():
             '   return x',
             True,
         ),
+        (
+            'def t(x: int, /, *args: int, y: int, **kwargs: int) -> int:\n'
+            '   return x\n',
+            True,
+        ),
+        (
+            'def t(x: int, *args, y: int) -> int:\n'
+            '   return x\n',
+            False,
+        ),
+        (
+            'def t(x: int) -> int:\n'
+            '   return (lambda y: y)(x)\n',
+            True,
+        ),
     ],
 )
 def test_node_fully_annotated(source, expected):
 
-    nodes = _create_nodes(source)
-    for node in ast.walk(nodes):
-        if isinstance(node, ast.FunctionDef):
-            assert _node_fully_annotated(node) is expected
+    node, is_method = _collect_functions(source)[0]
+    assert _node_fully_annotated(node, is_method) is expected
+
+
+@pytest.mark.parametrize(
+    'source, expected', [
+        ('def f(): pass', False),
+        ('def f() -> int: pass', True),
+        ('def f() -> None: pass', True),
+        ('def f() -> "Foo": pass', True),
+        ('def f() -> typing.Any: pass', True),
+        ('def f() -> int | None: pass', True),
+        ('def f() -> list[int]: pass', True),
+    ],
+)
+def test_is_return_annotated(source, expected):
+    node, _ = _collect_functions(source)[0]
+    assert _is_return_annotated(node) is expected
 
 
 @pytest.mark.parametrize(
@@ -172,13 +320,18 @@ def test_node_fully_annotated(source, expected):
             '       return  x\n',
             False,
         ),
+        (
+            'class C:\n'
+            '   @staticmethod\n'
+            '   def t(self, x: int) -> int:\n'
+            '       return  x\n',
+            False,
+        ),
     ],
 )
 def test_node_fully_annotated_methods(source, expected):
-    nodes = _create_nodes(source)
-    for node in ast.walk(nodes):
-        if isinstance(node, ast.FunctionDef):
-            assert _node_fully_annotated(node) is expected
+    for node, is_method in _collect_functions(source):
+        assert _node_fully_annotated(node, is_method) is expected
 
 
 @pytest.mark.parametrize(
@@ -211,17 +364,42 @@ def test_node_fully_annotated_methods(source, expected):
             '   return x\n',
             FunctionTypes([('x', 'str | None')], 'str'),
         ),
+        (
+            'def f(x: typing.Any, y: "Foo") -> None:\n'
+            '   pass\n',
+            FunctionTypes([('x', 'typing.Any'), ('y', '"Foo"')], 'None'),
+        ),
+        (
+            'def f(x: int) -> int | None:\n'
+            '   return x\n',
+            FunctionTypes([('x', 'int')], 'int | None'),
+        ),
+        (
+            'def f(x: int) -> typing.Optional[int]:\n'
+            '   return x\n',
+            FunctionTypes([('x', 'int')], 'typing.Optional[int]'),
+        ),
+        (
+            'def f(a: int, /, b: str, *c: int, d: bool, **e: str) -> int:\n'
+            '   def inner(y: float) -> int:\n'
+            '       return 1\n'
+            '   return inner(1.0)\n',
+            FunctionTypes(
+                [
+                    ('a', 'int'), ('b', 'str'), ('c', 'int'),
+                    ('d', 'bool'), ('e', 'str'),
+                ],
+                'int',
+            ),
+        ),
     ],
 )
 def test_get_args_and_types(source, expected):
 
-    node = _create_nodes(source)
-    tokens = src_to_tokens(source)
+    node, is_method = _collect_functions(source)[0]
 
-    for child in ast.walk(node):
-        if isinstance(child, ast.FunctionDef):
-            types = _get_args_and_types(child, tokens)
-            assert types == expected
+    types = _get_args_and_types(node, source.split('\n'), is_method)
+    assert types == expected
 
 
 def test_main(tmpdir: Path):
@@ -249,3 +427,677 @@ def test_main(tmpdir: Path):
         '   return x'
     )
     assert content == expected_content
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_main_jobs(tmpdir: Path, jobs):
+
+    documented = tmpdir.join('documented.py')
+    documented.write(
+        'def f(x: int) -> int:\n'
+        '   """docstring"""\n'
+        '   return x',
+    )
+    files = [tmpdir.join(f'test{i}.py') for i in range(3)]
+    for file in files:
+        file.write(
+            'def f(x: int) -> int:\n'
+            '   return x',
+        )
+
+    filenames = [str(documented)] + [str(file) for file in files]
+    assert _main(['--jobs', jobs, *filenames]) == 1
+
+    for file in files:
+        assert ':type x: int' in file.read_text('UTF-8')
+    assert documented.read_text('UTF-8').count('"""') == 2
+    # Only the already documented file means nothing is changed.
+    assert _main(['--jobs', jobs, str(documented)]) == 0
+
+
+def test_main_jobs_invalid(capsys):
+    with pytest.raises(SystemExit):
+        _main(['--jobs', '0', 'file.py'])
+    assert '--jobs must be at least 1' in capsys.readouterr().err
+
+
+def test_main_async_and_nested_classes(tmpdir: Path):
+
+    test_file = tmpdir.join('test.py')
+    test_file.write(
+        'class C:\n'
+        '    class D:\n'
+        '        async def f(self, x: int) -> int:\n'
+        '            return x\n',
+    )
+
+    assert _main(['--type', 'google', str(test_file)]) == 1
+    assert test_file.read() == (
+        'class C:\n'
+        '    class D:\n'
+        '        async def f(self, x: int) -> int:\n'
+        "            '''[function description]\n\n"
+        '            Args:\n'
+        '            \tx (int): [argument description]\n\n'
+        '            Returns:\n'
+        '            \tint: [return description]\n'
+        "            '''\n\n"
+        '            return x\n'
+    )
+
+
+def test_main_unchanged_file_not_written(tmpdir: Path):
+
+    test_file = tmpdir.join('test.py')
+    test_file.write(
+        'def f(x: int) -> int:\n'
+        '   """docstring"""\n'
+        '   return x',
+    )
+    test_file.setmtime(0)
+
+    assert _main([str(test_file)]) == 0
+    assert test_file.mtime() == 0
+
+
+@pytest.mark.parametrize('flag', ['--check', '--diff', '--json', '--lsp'])
+def test_main_check_and_diff_do_not_write(tmpdir: Path, capsys, flag):
+
+    source = (
+        'def f(x: int) -> int:\n'
+        '   return x\n'
+    )
+    test_file = tmpdir.join('test.py')
+    test_file.write(source)
+
+    assert _main([flag, str(test_file)]) == 1
+    assert test_file.read() == source
+
+    out = capsys.readouterr().out
+    if flag == '--check':
+        assert out == f'Would rewrite {test_file}\n'
+    elif flag == '--diff':
+        assert out.startswith(f'--- {test_file}\n+++ {test_file}\n')
+        assert '+   :type x: int\n' in out
+    elif flag == '--json':
+        edit = json.loads(out)
+        assert (edit['file'], edit['line'], edit['column']) == (
+            str(test_file), 1, 21,
+        )
+        assert ':type x: int' in edit['text']
+    else:
+        result = json.loads(out)
+        assert result['uri'] == f'file://{test_file}'
+        assert result['edits'][0]['range']['start'] == {
+            'line': 0, 'character': 21,
+        }
+
+
+@pytest.mark.parametrize(
+    'data, expected', [
+        (b'X = 1\n', False),
+        (b'def f(x):\n    return x\n', False),
+        (b'f: Callable[[], int] = lambda: 1\n', False),
+        (b'def f(x: int) -> int:\n    return x\n', True),
+    ],
+)
+def test_may_need_docstrings(data, expected):
+    assert _may_need_docstrings(data) is expected
+
+
+def test_main_skips_files_without_candidates(tmpdir: Path):
+
+    test_file = tmpdir.join('test.py')
+    test_file.write(
+        'def f(x) -> int:\n'
+        '   return x\n',
+    )
+
+    assert _main([str(test_file)]) == 0
+
+
+def _apply_edits(src, edits):
+    lines = src.split('\n')
+    for edit in sorted(edits, reverse=True):
+        line = lines[edit.line - 1]
+        lines[edit.line - 1] = (
+            line[:edit.column] + edit.text + line[edit.end_column:]
+        )
+    return '\n'.join(lines)
+
+
+def test_rewrite_source():
+    src = (
+        'def f(x: int) -> int:\n'
+        '    return x\n'
+        '\n'
+        'class C:\n'
+        '    def m(self, s: str = "é") -> str:\n'
+        '        return s\n'
+        '\n'
+        'def g(x) -> int:\n'
+        '    return x\n'
+    )
+
+    result = rewrite_source(src, 'google')
+
+    assert result.changed is True
+    assert [(e.function, e.line, e.column) for e in result.edits] == [
+        ('f', 1, 21), ('m', 5, 37),
+    ]
+    for edit in result.edits:
+        assert (edit.end_line, edit.end_column) == (edit.line, edit.column)
+    assert result.src == _apply_edits(src, result.edits)
+    assert "        '''[function description]" in result.src
+
+
+def test_rewrite_source_unchanged():
+    src = 'def f(x) -> int:\n    return x\n'
+    assert rewrite_source(src) == RewriteResult(src, [])
+    assert rewrite_source(src).changed is False
+
+
+@pytest.mark.parametrize(
+    'src', [
+        # The last function of the file.
+        'def f(x: int) -> int: return x\n',
+        # Before a function with a block.
+        'def f(x: int) -> int: return x\n'
+        'def g(x: int) -> int:\n'
+        '    if x:\n'
+        '        return x\n'
+        '    return 0\n',
+        # Not a simple declaration.
+        'def f(x: int) -> (int): return x  # comment\n',
+        'def f(x: int) -> int: \\\n    return x\n',
+    ],
+)
+def test_rewrite_source_body_on_declaration_line(src):
+    result = rewrite_source(src)
+
+    assert {edit.function for edit in result.edits} <= {'g'}
+    assert 'def f(x: int) -> ' in result.src
+    compile(result.src, 'test.py', 'exec')
+
+
+@pytest.mark.parametrize('newline', ('\r\n', '\r'))
+def test_rewrite_source_newlines(newline):
+    src = (
+        'def f(x: int) -> int:\n'
+        '    """\n'
+        '    :param y: The y.\n'
+        '    :type y: int\n'
+        '    """\n'
+        '    return x\n'
+        'def g(x: int) -> int:\n'
+        '    return x\n'
+    )
+    expected = rewrite_source(src, sync=True)
+
+    result = rewrite_source(src.replace('\n', newline), sync=True)
+
+    assert result.src == expected.src.replace('\n', newline)
+    assert result.edits == [
+        edit._replace(text=edit.text.replace('\n', newline))
+        for edit in expected.edits
+    ]
+
+
+def test_rewrite_source_mixed_newlines():
+    src = 'def f(x: int) -> int:\r\n    return x\n'
+    result = rewrite_source(src)
+
+    assert result.changed
+    assert '\n' not in result.src.replace('\r\n', '')
+    # Unchanged sources are returned as they are.
+    assert rewrite_source(result.src.replace('\r\n', '\n', 1)).src == (
+        result.src.replace('\r\n', '\n', 1)
+    )
+
+
+def test_rewrite_source_unknown_style():
+    with pytest.raises(ValueError):
+        rewrite_source('', 'unknown')
+
+
+@pytest.mark.parametrize(
+    'data, expected', [
+        (b'', []),
+        (b'a', [b'a']),
+        (b'a\0', [b'a']),
+        (b'a\0\0b', [b'a', b'', b'b']),
+        (b'abc\0def\0ghi', [b'abc', b'def', b'ghi']),
+    ],
+)
+def test_read_documents(monkeypatch, data, expected):
+    # Reading 2 bytes at a time makes documents span multiple reads.
+    monkeypatch.setattr(types2docstring, 'STDIN_READ_SIZE', 2)
+    assert list(_read_documents(io.BytesIO(data), b'\0')) == expected
+
+
+def _run_stdin(monkeypatch, argv, data):
+    stdout = io.BytesIO()
+    monkeypatch.setattr(
+        sys, 'stdin', io.TextIOWrapper(io.BytesIO(data)),
+    )
+    monkeypatch.setattr(
+        sys, 'stdout', io.TextIOWrapper(stdout, write_through=True),
+    )
+    ret = _main(argv)
+    return ret, stdout.getvalue()
+
+
+@pytest.mark.parametrize('argv', [['-'], ['--stdin']])
+def test_main_stdin(monkeypatch, argv):
+    ret, out = _run_stdin(
+        monkeypatch, argv, b'def f(x: int) -> int:\n   return x\n',
+    )
+
+    assert ret == 1
+    assert out.startswith(b"def f(x: int) -> int:\n   '''\n")
+
+
+def test_main_stdin_batch(monkeypatch):
+    documents = [
+        b'def f(x: int) -> int:\n   return x\n',
+        b'X = 1\n',
+        b'def g(y: str) -> str:\n   return y\n',
+    ]
+    ret, out = _run_stdin(
+        monkeypatch, ['--stdin', '-z', '--type', 'google'],
+        b'\0'.join(documents) + b'\0',
+    )
+
+    assert ret == 1
+    results = out.split(b'\0')
+    assert len(results) == 4 and results[-1] == b''
+    assert b'x (int): [argument description]' in results[0]
+    assert results[1] == documents[1]
+    assert b'y (str): [argument description]' in results[2]
+
+
+@pytest.mark.parametrize(
+    'data', [
+        b'x = 1\r\n',
+        b'def f(x):\r\n    return x\r',
+        b'def f(x: int) -> int:\r\n    """Documented."""\r\n',
+    ],
+)
+def test_main_stdin_unchanged(monkeypatch, data):
+    assert _run_stdin(monkeypatch, ['-'], data) == (0, data)
+
+
+def test_main_stdin_keeps_newlines(monkeypatch):
+    ret, out = _run_stdin(
+        monkeypatch, ['-'], b'def f(x: int) -> int:\r\n   return x\r\n',
+    )
+
+    assert ret == 1
+    assert out.startswith(b"def f(x: int) -> int:\r\n   '''\r\n")
+    assert b'\n' not in out.replace(b'\r\n', b'')
+
+
+def test_main_stdin_check(monkeypatch):
+    ret, out = _run_stdin(monkeypatch, ['--stdin', '--check'], b'X = 1\n')
+    assert (ret, out) == (0, b'')
+
+
+def test_main_stdin_with_filenames(capsys):
+    with pytest.raises(SystemExit):
+        _main(['--stdin', 'file.py'])
+    assert 'cannot be combined' in capsys.readouterr().err
+
+
+LOW_MEMORY_SOURCE = (
+    'import typing\n\n\n'
+    'class C:\n'
+    '    @staticmethod\n'
+    '    def f(x: int, y: Dict[str,\n'
+    '                        int] = {}) -> (Tuple[int, int]):  # comment\n'
+    '        return x, len(y)\n\n'
+    '    async def g(self, *args: str, **kwargs: int) -> List[str]:\n\n'
+    '        # comment\n'
+    '        return list(args)\n\n\n'
+    'def h(é: int) -> int:\n'
+    '\treturn é\n'
+)
+
+
+@pytest.mark.parametrize('docstring_type', ['rst', 'google', 'numpy'])
+def test_rewrite_file_low_memory(tmpdir: Path, docstring_type):
+
+    regular = tmpdir.join('regular.py')
+    low_memory = tmpdir.join('low_memory.py')
+    for test_file in (regular, low_memory):
+        test_file.write_text(LOW_MEMORY_SOURCE, encoding='UTF-8')
+
+    assert _rewrite_file(str(regular), docstring_type).changed
+    result = _rewrite_file(str(low_memory), docstring_type, low_memory=True)
+
+    assert result.changed
+    assert result.stats is not None
+    assert result.stats.counts['files_low_memory'] == 1
+    assert result.stats.counts['functions_rewritten'] == 3
+    assert low_memory.read_text('UTF-8') == regular.read_text('UTF-8')
+
+
+def test_rewrite_file_low_memory_check(tmpdir: Path):
+
+    test_file = tmpdir.join('test.py')
+    test_file.write_text(LOW_MEMORY_SOURCE, encoding='UTF-8')
+
+    result = _rewrite_file(str(test_file), 'rst', MODE_CHECK, low_memory=True)
+
+    assert result.changed
+    assert test_file.read_text('UTF-8') == LOW_MEMORY_SOURCE
+
+
+def test_rewrite_file_low_memory_skips_single_line_functions(tmpdir: Path):
+
+    source = 'def f(x: int) -> int: return x\n'
+    test_file = tmpdir.join('test.py')
+    test_file.write(source)
+
+    assert not _rewrite_file(str(test_file), 'rst', low_memory=True).changed
+    assert test_file.read() == source
+
+
+@pytest.mark.parametrize('low_memory', (False, True))
+def test_rewrite_file_writes_through_symlink(tmpdir: Path, low_memory):
+    target = tmpdir.mkdir('real').join('a.py')
+    target.write('def f(x: int) -> int:\n    return x\n')
+    link = tmpdir.join('link.py')
+    link.mksymlinkto(target)
+
+    assert _rewrite_file(str(link), 'rst', low_memory=low_memory).changed
+
+    assert link.islink()
+    assert ':type x: int' in target.read_text('UTF-8')
+    assert not [p for p in target.dirpath().listdir() if p != target]
+
+
+@pytest.mark.parametrize('low_memory', (False, True))
+def test_rewrite_file_keeps_hard_links(tmpdir: Path, low_memory):
+    test_file = tmpdir.join('a.py')
+    test_file.write('def f(x: int) -> int:\n    return x\n')
+    other = tmpdir.join('b.py')
+    other.mklinkto(test_file)
+
+    assert _rewrite_file(str(test_file), 'rst', low_memory=low_memory).changed
+
+    assert ':type x: int' in other.read_text('UTF-8')
+
+
+def test_rewrite_file_low_memory_fallback(tmpdir: Path):
+
+    test_file = tmpdir.join('test.py')
+    test_file.write_binary(b'def f(x: int) -> int:\r\n    return x\r\n')
+
+    result = _rewrite_file(str(test_file), 'rst', low_memory=True)
+
+    assert result.changed
+    assert result.stats is not None
+    assert 'files_low_memory' not in result.stats.counts
+
+
+def test_rewrite_file_low_memory_size(tmpdir: Path, monkeypatch):
+
+    monkeypatch.setattr(types2docstring, 'LOW_MEMORY_FILE_SIZE', 10)
+    test_file = tmpdir.join('test.py')
+    test_file.write('def f(x: int) -> int:\n    return x\n')
+
+    result = _rewrite_file(str(test_file), 'rst')
+
+    assert result.stats is not None
+    assert result.stats.counts['files_low_memory'] == 1
+    assert ':type x: int' in test_file.read()
+
+
+def test_line_offsets():
+    assert list(_line_offsets(b'')) == [0]
+    assert list(_line_offsets(b'a\nbc\n\nd')) == [0, 2, 5, 6]
+
+
+@pytest.mark.parametrize(
+    'data, expected', [
+        (b'int:', 3),
+        (b'int) :', 5),
+        (b'int  # a: b\n):', 13),
+        (b'int \\\n:', 6),
+    ],
+)
+def test_find_colon(data, expected):
+    assert _find_colon(data, 3) == expected
+
+
+def test_find_colon_missing():
+    with pytest.raises(ValueError):
+        _find_colon(b'int) # a', 3)
+
+
+@pytest.mark.parametrize(
+    'data, expected', [
+        (b'def f(x: int) -> int:\n    return x\n', True),
+        (b'# -*- coding: utf-8 -*-\ndef f(): pass\n', True),
+        (b'#!/usr/bin/env python\n# coding=latin-1\n', False),
+        (b'# vim: set fileencoding=unknown :\n', False),
+        (b'import os\n# coding: latin-1\n', True),
+        (b'def f(x: int) -> int:\r\n    return x\r\n', False),
+    ],
+)
+def test_can_splice(data, expected):
+    assert _can_splice(data) is expected
+
+
+@pytest.mark.parametrize(
+    'src', [
+        'def f(x: int) -> int:\\\n    return x\n',
+        'def f(x: int) -> int: \\\n    return x\n',
+        'def f(x: int) -> int: x += 1; return x\n',
+        'def f(x: int) -> int:  # comment\n    return x\n',
+        'def f(x: int) -> int:\n    return x\n'
+        'def g(x: int) -> int: return x\n',
+    ],
+)
+def test_rewrite_file_low_memory_same_functions(tmpdir: Path, src):
+    results = []
+    for low_memory in (False, True):
+        test_file = tmpdir.join(f'test_{low_memory}.py')
+        test_file.write(src)
+        _rewrite_file(str(test_file), 'rst', low_memory=low_memory)
+        results.append(test_file.read_text('UTF-8'))
+
+    assert results[0] == results[1]
+    compile(results[0], 'test.py', 'exec')
+
+
+def test_rewrite_file_low_memory_coding_cookie(tmpdir: Path):
+    # The columns of the AST are not offsets in the latin-1 bytes.
+    test_file = tmpdir.join('test.py')
+    test_file.write_binary(
+        b'# -*- coding: latin-1 -*-\n'
+        b'def f(\xe9\xe9: int, y: str) -> int:\n'
+        b'    return 1\n',
+    )
+
+    with pytest.raises(UnicodeDecodeError):
+        _rewrite_file(str(test_file), 'rst', low_memory=True)
+
+
+def test_fix_contents_counts_shared_caches():
+    source = (
+        'def f(x: List[int], y: List[int]) -> List[int]:\n'
+        '    return x + y\n'
+    )
+    stats = FileStats()
+
+    _fix_contents(source, 'google', stats)
+
+    # All three annotations are the same, so at least the last two are
+    # found in the cache.
+    assert stats.counts['annotation_cache_hits'] >= 2
+    assert stats.counts.get('annotation_cache_misses', 0) <= 1
+    # The lines of both arguments and the return line are looked up.
+    render_lookups = (
+        stats.counts.get('render_cache_hits', 0) +
+        stats.counts.get('render_cache_misses', 0)
+    )
+    assert render_lookups == 3
+
+
+@pytest.mark.parametrize(
+    'source, expected', [
+        ('def f(x: int) -> int:\n    return x\n', _Insertion(1, 21, '    ')),
+        (
+            'def f(\n'
+            '    x: int,\n'
+            ') -> Dict[str,\n'
+            '          int] :  \n'
+            '\n'
+            '        # A comment.\n'
+            '        return x\n',
+            _Insertion(4, 16, '        '),
+        ),
+        ('def f(é: int) -> int:\n\treturn é\n', _Insertion(1, 21, '\t')),
+        ('def f() -> (int):\n    pass\n', None),
+        ('def f() -> int:  # A comment.\n    pass\n', None),
+        ('def f() -> int \\\n:\n    pass\n', None),
+        ('def f() -> int: pass\n', None),
+    ],
+)
+def test_simple_insertion(source, expected):
+    node = ast.parse(source).body[0]
+    lines = source.split('\n')
+
+    assert _simple_insertion(node, lines) == expected
+    if expected is not None:
+        tokens = src_to_tokens(source)
+        index = _build_token_index(tokens)
+        assert _token_insertion(node, tokens, index, lines) == expected
+
+
+def test_fix_contents_without_tokens(monkeypatch):
+    def src_to_tokens(src):
+        raise AssertionError('tokenized')
+
+    monkeypatch.setattr(types2docstring, 'src_to_tokens', src_to_tokens)
+    stats = FileStats()
+    source = 'def f(x: int) -> int:\n    return x\n'
+
+    result = _fix_contents(source, 'rst', stats)
+
+    assert result.changed
+    assert 'tokenize' not in stats.times
+    assert 'functions_tokenized' not in stats.counts
+
+
+def test_fix_contents_tokens_fallback():
+    stats = FileStats()
+    source = (
+        'def f(x: int) -> int:  # A comment.\n'
+        '    return x\n'
+        'def g(x: int) -> int:\n'
+        '    return x\n'
+    )
+
+    result = _fix_contents(source, 'google', stats)
+
+    assert [edit.function for edit in result.edits] == ['f', 'g']
+    assert stats.counts['functions_tokenized'] == 1
+    assert result.src.count('x (int): [argument description]') == 2
+
+
+def test_main_unknown_type(capsys):
+    with pytest.raises(SystemExit):
+        _main(['--type', 'unknown', 'file.py'])
+    err = capsys.readouterr().err
+    assert 'unknown docstring type: unknown' in err
+    assert 'google, numpy, rst' in err
+
+
+def test_generate_docstrings_unknown_type():
+    with pytest.raises(ValueError, match='Unknown docstring type'):
+        types2docstring._generate_docstrings('unknown', [])
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_main_continues_after_errors(tmpdir: Path, capsys, jobs):
+    files = []
+    for i in range(10):
+        test_file = tmpdir.join(f'test{i}.py')
+        test_file.write('def f(x: int) -> int:\n    return x\n')
+        files.append(test_file)
+    files[3].write('def f(x: int) -> int:\n    return (\n')
+    files[7].write_binary(b'def f(x: int) -> int:\n    return "\xff"\n')
+
+    assert _main(['--jobs', jobs, str(tmpdir)]) == 1
+
+    err = capsys.readouterr().err
+    assert f'{files[3]}: SyntaxError: ' in err
+    assert f'{files[7]}: UnicodeDecodeError: ' in err
+    assert err.endswith(
+        'Failed to rewrite 2 files:\n'
+        '  SyntaxError: 1\n'
+        '  UnicodeDecodeError: 1\n',
+    )
+    for i, test_file in enumerate(files):
+        if i not in (3, 7):
+            assert "'''" in test_file.read()
+
+
+def test_main_continues_after_errors_with_index(tmpdir: Path, capsys):
+    src = tmpdir.mkdir('src')
+    test_file = src.join('test.py')
+    test_file.write('def f(x: int) -> int:\n    return x\n')
+    src.join('latin1.py').write_binary(b'def f(\xe9: int) -> int:\n    pass\n')
+    # The index cannot be written.
+    index_path = tmpdir.join('missing', 'index.json')
+
+    assert _main(['--index', str(index_path), str(src)]) == 1
+
+    err = capsys.readouterr().err
+    assert f'{index_path}: FileNotFoundError: ' in err
+    assert err.endswith(
+        'Failed to rewrite 2 files:\n'
+        '  FileNotFoundError: 1\n'
+        '  UnicodeDecodeError: 1\n',
+    )
+    assert "'''" in test_file.read_text('UTF-8')
+
+
+def test_main_fail_fast(tmpdir: Path):
+    test_file = tmpdir.join('test.py')
+    test_file.write('def f(x: int) -> int:\n    return (\n')
+
+    with pytest.raises(SyntaxError):
+        _main(['--fail-fast', str(test_file)])
+
+
+def test_main_stdin_batch_errors(monkeypatch, capsys):
+    documents = [
+        b'def f(x: int) -> int:\n   return x\n',
+        b'def f(x: int) -> int:\n   return (\n',
+    ]
+    ret, out = _run_stdin(
+        monkeypatch, ['--stdin', '-z'], b'\0'.join(documents),
+    )
+
+    assert ret == 1
+    results = out.split(b'\0')
+    assert b"'''" in results[0]
+    # The source that cannot be rewritten is written back unchanged.
+    assert results[1] == documents[1]
+    err = capsys.readouterr().err
+    assert '<stdin>: SyntaxError: ' in err
+    assert 'Failed to rewrite 1 file:\n  SyntaxError: 1\n' in err
+
+
+def test_main_stdin_json(monkeypatch):
+    ret, out = _run_stdin(
+        monkeypatch, ['--stdin', '--json'],
+        b'def f(x: int) -> int:\n   return x\n',
+    )
+
+    assert ret == 1
+    edit = json.loads(out)
+    assert (edit['file'], edit['function']) == ('<stdin>', 'f')
@@ -0,0 +1,33 @@
+from typing import Any
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from types2docstring._batch import FileRewrite
+    from types2docstring._batch import rewrite_files_async
+    from types2docstring.types2docstring import Edit
+    from types2docstring.types2docstring import rewrite_source
+    from types2docstring.types2docstring import RewriteResult
+
+__all__ = (
+    'Edit',
+    'FileRewrite',
+    'rewrite_files_async',
+    'rewrite_source',
+    'RewriteResult',
+)
+
+_BATCH_API = ('FileRewrite', 'rewrite_files_async')
+
+
+def __getattr__(name: str) -> Any:
+    # The public API is imported lazily, so the light weight modules
+    # (like the daemon client) can be imported without importing
+    # tokenize-rt and all the docstring types.
+    if name in _BATCH_API:
+        from types2docstring import _batch
+        return getattr(_batch, name)
+    elif name in __all__:
+        from types2docstring import types2docstring
+        return getattr(types2docstring, name)
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,121 @@
+"""
+Asynchronous batch API, for integrations that run in an asyncio event loop.
+
+The files are read and written in the default executor of the loop, so
+the loop is never blocked on file I/O. Rewriting the sources is done in
+the given executor (e.g. a `ProcessPoolExecutor` to use multiple CPUs).
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+from typing import AsyncIterator
+from typing import Iterable
+from typing import NamedTuple
+from typing import Optional
+
+from types2docstring._helpers import DOCSTRING_TYPES
+from types2docstring.types2docstring import _decode_contents
+from types2docstring.types2docstring import _may_need_docstrings
+from types2docstring.types2docstring import _write_atomic
+from types2docstring.types2docstring import Edit
+from types2docstring.types2docstring import MODE_CHECK
+from types2docstring.types2docstring import MODE_WRITE
+from types2docstring.types2docstring import rewrite_source
+from types2docstring.types2docstring import RewriteResult
+
+# Maximum number of files that are being rewritten at the same time.
+DEFAULT_MAX_CONCURRENCY = 32
+
+
+class FileRewrite(NamedTuple):
+    filename: str
+    changed: bool
+    edits: list[Edit]
+
+
+def _read(filename: str) -> bytes:
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+def _rewrite_data(data: bytes, style: str) -> RewriteResult:
+    # Decoding is part of the work done in the executor, so only the
+    # bytes are sent to it.
+    return rewrite_source(_decode_contents(data), style)
+
+
+async def _rewrite_file(
+    filename: str,
+    style: str,
+    mode: str,
+    executor: Optional[concurrent.futures.Executor],
+) -> FileRewrite:
+
+    loop = asyncio.get_running_loop()
+
+    data = await loop.run_in_executor(None, _read, filename)
+    if not _may_need_docstrings(data):
+        return FileRewrite(filename, False, [])
+
+    result = await loop.run_in_executor(executor, _rewrite_data, data, style)
+    if result.changed and mode == MODE_WRITE:
+        await loop.run_in_executor(None, _write_atomic, filename, result.src)
+
+    return FileRewrite(filename, result.changed, result.edits)
+
+
+async def rewrite_files_async(
+    filenames: Iterable[str],
+    style: str = 'rst',
+    *,
+    mode: str = MODE_WRITE,
+    executor: Optional[concurrent.futures.Executor] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> AsyncIterator[FileRewrite]:
+    """
+    Adds docstrings of the given style to the files (only reporting
+    what would change when the `mode` is `'check'`).
+
+    At most `max_concurrency` files are rewritten at the same time, the
+    sources are rewritten in `executor` (the default executor of the
+    loop when it is None). The results are yielded as the files are
+    done, not in the order of `filenames`, which are only consumed as
+    there is room for more files.
+
+    The first error stops the batch, the files that are in progress
+    are cancelled.
+    """
+
+    if style not in DOCSTRING_TYPES:
+        raise ValueError(f'Unknown docstring type: {style}')
+    if mode not in (MODE_WRITE, MODE_CHECK):
+        raise ValueError(f'Unknown mode: {mode}')
+    if max_concurrency < 1:
+        raise ValueError('max_concurrency must be at least 1')
+
+    pending: set[asyncio.Future[FileRewrite]] = set()
+    try:
+        for filename in filenames:
+            if len(pending) >= max_concurrency:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED,
+                )
+                for future in done:
+                    yield future.result()
+
+            pending.add(
+                asyncio.ensure_future(
+                    _rewrite_file(filename, style, mode, executor),
+                ),
+            )
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED,
+            )
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
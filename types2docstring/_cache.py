@@ -0,0 +1,154 @@
+import functools
+import hashlib
+import os
+
+# Bump this when the meaning of a cache entry changes.
+CACHE_FORMAT = '1'
+DEFAULT_MAX_ENTRIES = 50_000
+# Number of entries counted to estimate the size of the cache.
+COUNT_SAMPLE = 1_000
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache',
+    )
+    return os.path.join(cache_home, 'types2docstring')
+
+
+@functools.lru_cache(maxsize=None)
+def _tool_version() -> str:
+    # Importing importlib.metadata is slow, so only do it when the
+    # cache is used.
+    import importlib.metadata
+
+    try:
+        return importlib.metadata.version('types2docstring')
+    except importlib.metadata.PackageNotFoundError:
+        return 'dev'
+
+
+def cache_key(data: bytes, docstring_type: str, sync: bool = False) -> str:
+    """
+    Returns the key for the contents of a file and the docstring type
+    it is rewritten with (and whether its docstrings are synced).
+
+    The version of the tool is part of the key, so a new version never
+    uses the results of an older one.
+    """
+
+    parts = [CACHE_FORMAT, _tool_version(), docstring_type]
+    if sync:
+        parts.append('sync')
+
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode())
+        h.update(b'\0')
+    h.update(data)
+    return h.hexdigest()
+
+
+def _entry_path(cache_dir: str, key: str) -> str:
+    # Entries are spread over subdirectories, so no single directory
+    # gets too big.
+    return os.path.join(cache_dir, key[:2], key)
+
+
+def is_unchanged(cache_dir: str, key: str) -> bool:
+    """
+    Returns whether the contents with `key` are known to need no changes.
+    """
+
+    path = _entry_path(cache_dir, key)
+    try:
+        # The modification time records when the entry was last used,
+        # the least recently used entries are evicted first.
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def mark_unchanged(cache_dir: str, key: str) -> None:
+    """
+    Records that the contents with `key` need no changes.
+
+    The entries are empty files, creating one is atomic, so several
+    processes can safely add the same entry at the same time.
+    """
+
+    path = _entry_path(cache_dir, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'a').close()
+    except OSError:
+        # The cache is only an optimization, so it should never
+        # stop a file from being rewritten.
+        pass
+
+
+def count_entries(cache_dir: str) -> int:
+    """
+    Returns the number of entries in the cache.
+
+    Large caches are not listed in full: the keys are spread evenly over
+    the subdirectories, so the count is estimated from the first ones
+    that hold `COUNT_SAMPLE` entries.
+    """
+
+    try:
+        subdirs = [entry for entry in os.scandir(cache_dir) if entry.is_dir()]
+    except OSError:
+        return 0
+
+    count = 0
+    for i, subdir in enumerate(subdirs, 1):
+        try:
+            count += len(os.listdir(subdir.path))
+        except OSError:
+            # Removed by another process in the mean time.
+            continue
+        if count >= COUNT_SAMPLE:
+            return count * len(subdirs) // i
+
+    return count
+
+
+def evict(cache_dir: str, max_entries: int) -> int:
+    """
+    Removes the least recently used entries until at most `max_entries`
+    are left.
+
+    Returns the number of removed entries.
+    """
+
+    entries: list[tuple[float, str]] = []
+    try:
+        subdirs = list(os.scandir(cache_dir))
+    except OSError:
+        return 0
+
+    for subdir in subdirs:
+        if not subdir.is_dir():
+            continue
+        for entry in os.scandir(subdir.path):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Removed by another process in the mean time.
+                continue
+
+    if len(entries) <= max_entries:
+        return 0
+
+    entries.sort()
+    removed = 0
+    for _, path in entries[:len(entries) - max_entries]:
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        removed += 1
+
+    return removed
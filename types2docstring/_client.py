@@ -0,0 +1,105 @@
+"""
+Thin client for the types2docstring daemon.
+
+Only imports the standard library modules it needs, so it starts fast.
+Falls back to rewriting the files in this process when no daemon is
+running.
+"""
+from __future__ import annotations
+
+import argparse
+import getpass
+import json
+import os
+import socket
+import sys
+import tempfile
+from typing import Any
+from typing import Optional
+from typing import Sequence
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    user = getpass.getuser()
+    return os.path.join(runtime_dir, f'types2docstring-{user}.sock')
+
+
+class Connection:
+    """
+    A connection to the daemon, sending one JSON request per line
+    and reading one JSON response per line.
+    """
+
+    def __init__(self, socket_path: str) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(socket_path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile('rwb')
+
+    def request(self, request: dict[str, Any]) -> dict[str, Any]:
+        self._file.write(json.dumps(request).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('daemon closed the connection')
+        response: dict[str, Any] = json.loads(line)
+        return response
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> Connection:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(
+        description='Rewrite files using a running types2docstring daemon',
+    )
+    parser.add_argument('filenames', nargs='*')
+    parser.add_argument(
+        '--type',
+        default='rst',
+        help='Choose the type of docstring to generate',
+    )
+    parser.add_argument(
+        '--socket',
+        default=default_socket_path(),
+        help='Socket the daemon listens on',
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        connection = Connection(args.socket)
+    except OSError:
+        # No daemon is running, so do the work in this process.
+        from types2docstring.types2docstring import _main
+        return _main(['--type', args.type, *args.filenames])
+
+    ret = 0
+    with connection:
+        for filename in args.filenames:
+            response = connection.request({
+                'path': os.path.abspath(filename),
+                'style': args.type,
+            })
+            if not response['ok']:
+                print(f"{filename}: {response['error']}", file=sys.stderr)
+                ret = 1
+            elif response['changed']:
+                ret = 1
+
+    return ret
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
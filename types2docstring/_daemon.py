@@ -0,0 +1,172 @@
+"""
+Daemon that rewrites files (or sources) for editor integrations.
+
+The daemon listens on a unix socket for JSON requests, one per line:
+
+- `{"path": "/abs/file.py", "style": "rst", "mode": "write"}` rewrites the
+  file (`"mode": "check"` only reports if it would change).
+- `{"source": "def f(x: int) -> int: ...", "style": "rst"}` returns
+  the rewritten source.
+- `{"command": "ping"}` and `{"command": "shutdown"}`.
+
+Every request gets a JSON response on a single line, with `"ok"` and
+`"changed"` and the `"edits"` (and `"source"` for source requests).
+"""
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import os
+import socketserver
+import threading
+from typing import Any
+
+from types2docstring._client import Connection
+from types2docstring._helpers import DOCSTRING_TYPES
+from types2docstring.types2docstring import _decode_contents
+from types2docstring.types2docstring import _may_need_docstrings
+from types2docstring.types2docstring import _write_atomic
+from types2docstring.types2docstring import MODE_CHECK
+from types2docstring.types2docstring import MODE_WRITE
+from types2docstring.types2docstring import rewrite_source
+from types2docstring.types2docstring import RewriteResult
+
+# Number of rewritten sources that are remembered between requests.
+DEFAULT_MAX_RESULTS = 4096
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    server: _Server
+
+    def handle(self) -> None:
+
+        for line in self.rfile:
+            try:
+                response = self.server.respond(json.loads(line))
+            except Exception as e:
+                response = {
+                    'ok': False,
+                    'changed': False,
+                    'error': f'{type(e).__name__}: {e}',
+                }
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> None:
+        super().__init__(socket_path, _Handler)
+        self.max_results = max_results
+        # Results by (hash of the source, style), the least recently
+        # used results are dropped first.
+        self._results: collections.OrderedDict[
+            tuple[str, str], RewriteResult,
+        ] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def rewrite(self, src: str, style: str) -> RewriteResult:
+
+        key = (hashlib.sha256(src.encode()).hexdigest(), style)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        result = rewrite_source(src, style)
+
+        with self._lock:
+            self._results[key] = result
+            if len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+        return result
+
+    def _rewrite_path(self, path: str, style: str, mode: str) -> RewriteResult:
+
+        if mode not in (MODE_WRITE, MODE_CHECK):
+            raise ValueError(f'Unknown mode: {mode}')
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if not _may_need_docstrings(data):
+            return RewriteResult('', [])
+
+        result = self.rewrite(_decode_contents(data), style)
+        if result.changed and mode == MODE_WRITE:
+            _write_atomic(path, result.src)
+
+        return result
+
+    def respond(self, request: dict[str, Any]) -> dict[str, Any]:
+
+        command = request.get('command')
+        if command == 'ping':
+            return {'ok': True, 'changed': False}
+        elif command == 'shutdown':
+            # `shutdown` waits for `serve_forever` to stop, which is
+            # running the handler that called this.
+            threading.Thread(target=self.shutdown).start()
+            return {'ok': True, 'changed': False}
+        elif command is not None:
+            raise ValueError(f'Unknown command: {command}')
+
+        style = request.get('style', 'rst')
+        if style not in DOCSTRING_TYPES:
+            raise ValueError(f'Unknown docstring type: {style}')
+
+        if 'source' in request:
+            result = self.rewrite(request['source'], style)
+        else:
+            result = self._rewrite_path(
+                request['path'], style, request.get('mode', MODE_WRITE),
+            )
+
+        response = {
+            'ok': True,
+            'changed': result.changed,
+            'edits': [edit._asdict() for edit in result.edits],
+        }
+        if 'source' in request:
+            response['source'] = result.src
+        return response
+
+
+def serve(socket_path: str) -> int:
+    """
+    Runs the daemon until it gets a shutdown request.
+    """
+
+    if os.path.exists(socket_path):
+        try:
+            Connection(socket_path).close()
+        except OSError:
+            # Left behind by a daemon that did not exit cleanly.
+            os.unlink(socket_path)
+        else:
+            print(f'ERROR: A daemon is already running on {socket_path}.')
+            return 1
+
+    # Only the current user can connect.
+    old_umask = os.umask(0o177)
+    try:
+        server = _Server(socket_path)
+    finally:
+        os.umask(old_umask)
+
+    try:
+        with server:
+            server.serve_forever()
+    finally:
+        os.unlink(socket_path)
+
+    return 0
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import fnmatch
+import glob
+import os
+import re
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from typing import TextIO
+
+PYTHON_EXTENSIONS = ('.py',)
+GLOB_CHARACTERS = ('*', '?', '[')
+# Directories that are never searched for python files.
+SKIPPED_DIRECTORIES = ('.git', '.hg', '.svn')
+
+
+class IgnorePattern(NamedTuple):
+    # Absolute path of the directory the pattern is defined in.
+    base: str
+    pattern: str
+    negate: bool
+    dir_only: bool
+    # Anchored patterns match the path relative to `base`,
+    # the other patterns match the name of the file or directory.
+    anchored: bool
+
+
+def parse_ignore_pattern(line: str, base: str) -> IgnorePattern | None:
+    """
+    Parses a single line of a `.gitignore` file.
+
+    Returns None for empty lines and comments.
+    """
+
+    line = line.rstrip('\n').rstrip()
+    if not line or line.startswith('#'):
+        return None
+
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+
+    if line.startswith('**/'):
+        line = line[3:]
+    anchored = '/' in line
+    line = line.lstrip('/')
+
+    return IgnorePattern(
+        base=base,
+        pattern=line,
+        negate=negate,
+        dir_only=dir_only,
+        anchored=anchored,
+    )
+
+
+class IgnoreRules(NamedTuple):
+    """
+    The patterns of a `.gitignore` file (or of the excludes), which
+    all have the same base.
+    """
+    # The base with a trailing separator, the paths below it start
+    # with it.
+    prefix: str
+    patterns: list[IgnorePattern]
+    regexes: list[re.Pattern[str]]
+    # Match the name and the relative path when any of the not anchored
+    # and anchored patterns (respectively) match, None without any.
+    name_regex: re.Pattern[str] | None
+    path_regex: re.Pattern[str] | None
+
+
+def _any_regex(patterns: Iterable[str]) -> re.Pattern[str] | None:
+    translated = [fnmatch.translate(pattern) for pattern in patterns]
+    return re.compile('|'.join(translated)) if translated else None
+
+
+def compile_rules(patterns: list[IgnorePattern]) -> IgnoreRules:
+    """
+    Compiles patterns that have the same base.
+    """
+
+    assert len({p.base for p in patterns}) <= 1
+    base = patterns[0].base if patterns else os.sep
+    return IgnoreRules(
+        prefix=os.path.join(base, ''),
+        patterns=patterns,
+        regexes=[re.compile(fnmatch.translate(p.pattern)) for p in patterns],
+        name_regex=_any_regex(p.pattern for p in patterns if not p.anchored),
+        path_regex=_any_regex(p.pattern for p in patterns if p.anchored),
+    )
+
+
+def _read_gitignore(directory: str) -> list[IgnoreRules]:
+
+    filename = os.path.join(directory, '.gitignore')
+    try:
+        with open(filename, encoding='UTF-8') as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+
+    patterns = []
+    for line in lines:
+        pattern = parse_ignore_pattern(line, directory)
+        if pattern is not None:
+            patterns.append(pattern)
+    return [compile_rules(patterns)] if patterns else []
+
+
+def is_ignored(
+    path: str,
+    is_dir: bool,
+    rules: Iterable[IgnoreRules],
+) -> bool:
+    """
+    Returns whether the (absolute) path is ignored by the rules.
+
+    Like in git the last matching pattern decides.
+    """
+
+    name = os.path.basename(path)
+    ignored = False
+    for r in rules:
+        if not path.startswith(r.prefix):
+            continue
+        rel_path = path[len(r.prefix):].replace(os.sep, '/')
+
+        # Most paths match none of the patterns, which is checked at
+        # once before looking for the last pattern that matches.
+        if not (
+            (r.name_regex is not None and r.name_regex.match(name)) or
+            (r.path_regex is not None and r.path_regex.match(rel_path))
+        ):
+            continue
+
+        for p, regex in zip(r.patterns, r.regexes):
+            if p.dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if p.anchored else name):
+                ignored = not p.negate
+
+    return ignored
+
+
+def _parent_gitignores(directory: str) -> list[IgnoreRules]:
+    """
+    Returns the patterns of the `.gitignore` files in the parent
+    directories of `directory` that are part of the same repository.
+    """
+
+    parents: list[str] = []
+    current = directory
+    while not os.path.exists(os.path.join(current, '.git')):
+        parent = os.path.dirname(current)
+        if parent == current:
+            # Not part of a repository.
+            return []
+        parents.append(parent)
+        current = parent
+
+    rules = []
+    for parent in reversed(parents):
+        rules.extend(_read_gitignore(parent))
+    return rules
+
+
+def _walk(
+    directory: str,
+    rules: list[IgnoreRules],
+) -> Iterator[str]:
+
+    rules = rules + _read_gitignore(directory)
+
+    try:
+        entries = sorted(os.scandir(directory), key=lambda e: e.name)
+    except OSError:
+        return
+
+    for entry in entries:
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if is_dir and entry.name in SKIPPED_DIRECTORIES:
+            continue
+        if is_ignored(entry.path, is_dir, rules):
+            continue
+
+        if is_dir:
+            yield from _walk(entry.path, rules)
+        elif entry.name.endswith(PYTHON_EXTENSIONS):
+            yield entry.path
+
+
+def _walk_directory(
+    directory: str,
+    excludes: list[IgnoreRules],
+) -> Iterator[str]:
+
+    abs_directory = os.path.abspath(directory)
+    rules = excludes + _parent_gitignores(abs_directory)
+    for path in _walk(abs_directory, rules):
+        # Report the paths the same way as they were given.
+        yield os.path.join(directory, os.path.relpath(path, abs_directory))
+
+
+def _expand_path(
+    path: str,
+    excludes: list[IgnoreRules],
+) -> Iterator[str]:
+
+    if os.path.isdir(path):
+        yield from _walk_directory(path, excludes)
+    elif not os.path.exists(path) and any(c in path for c in GLOB_CHARACTERS):
+        for match in sorted(glob.iglob(path, recursive=True)):
+            if os.path.isdir(match):
+                yield from _walk_directory(match, excludes)
+            elif (
+                match.endswith(PYTHON_EXTENSIONS) and
+                not is_ignored(os.path.abspath(match), False, excludes)
+            ):
+                yield match
+    elif not is_ignored(os.path.abspath(path), False, excludes):
+        # Files that are given explicitly are always rewritten (unless
+        # excluded), even if they do not have a python extension.
+        yield path
+
+
+def iter_filenames(
+    paths: Iterable[str],
+    exclude: Iterable[str] = (),
+    files_from: TextIO | None = None,
+) -> Iterator[str]:
+    """
+    Lazily yields the files to rewrite.
+
+    Directories are searched recursively for python files, respecting
+    the `.gitignore` files. Patterns that do not exist as a path are
+    expanded as (recursive) globs. `exclude` are extra ignore patterns
+    (in `.gitignore` syntax) and `files_from` is a file with one path
+    on every line.
+    """
+
+    cwd = os.getcwd()
+    patterns = []
+    for line in exclude:
+        pattern = parse_ignore_pattern(line, cwd)
+        if pattern is not None:
+            patterns.append(pattern)
+    excludes = [compile_rules(patterns)] if patterns else []
+
+    for path in paths:
+        yield from _expand_path(path, excludes)
+
+    if files_from is not None:
+        for line in files_from:
+            path = line.rstrip('\r\n')
+            if path:
+                yield from _expand_path(path, excludes)
@@ -1,7 +1,7 @@
-from string import Template
-
+from types2docstring._helpers import compile_template
 from types2docstring._helpers import FunctionTypes
 from types2docstring._helpers import register_docstring
+from types2docstring._helpers import shared_cache
 
 GOOGLE_TEMPLATE = """
 ${indent}\'\'\'[function description]
@@ -13,9 +13,30 @@ ${indent}Returns:
 ${indent}\t$returns
 ${indent}\'\'\'
 """
-GOOGLE_ARG_TYPE_TEMPALTE = '$arg_name ($arg_type): [argument description]'
+GOOGLE_ARG_TYPE_TEMPALTE = '$arg_name ($arg_type): $description'
+GOOGLE_ARG_PLACEHOLDER = '[argument description]'
 GOOGLE_RETURN_TEMPLATE = '$type: [return description]'
 
+_render_google = compile_template(GOOGLE_TEMPLATE)
+_render_arg = compile_template(GOOGLE_ARG_TYPE_TEMPALTE)
+_render_return = compile_template(GOOGLE_RETURN_TEMPLATE)
+
+
+@shared_cache('render')
+def _arg_line(arg_name: str, arg_type: str, description: str) -> str:
+    return _render_arg(
+        {
+            'arg_name': arg_name,
+            'arg_type': arg_type,
+            'description': description,
+        },
+    )
+
+
+@shared_cache('render')
+def _return_line(return_type: str) -> str:
+    return _render_return({'type': return_type})
+
 
 @register_docstring('google')
 def generate_google_docstring(fn_types: FunctionTypes, indent='') -> str:
@@ -23,24 +44,18 @@ def generate_google_docstring(fn_types: FunctionTypes, indent='') -> str:
     args = []
     args_str = 'No arguments'
     # Generate arguments text
-    for arg in fn_types.args:
-        if all(arg):
-            arg_template = Template(GOOGLE_ARG_TYPE_TEMPALTE)
-            args.append(
-                arg_template.substitute(
-                    {'arg_name': arg[0], 'arg_type': arg[1]},
-                ),
+    for arg_name, arg_type in fn_types.args:
+        if arg_name and arg_type:
+            description = fn_types.descriptions.get(
+                arg_name, GOOGLE_ARG_PLACEHOLDER,
             )
+            args.append(_arg_line(arg_name, arg_type, description))
     if len(args) > 0:
         args_str = f'\n{indent}\t'.join(args)
     # Generate return text
-    ret_str = Template(GOOGLE_RETURN_TEMPLATE).substitute(
-        {'type': fn_types.returns},
-    )
+    ret_str = _return_line(fn_types.returns)
     # Generate full docstring
 
-    gt = Template(GOOGLE_TEMPLATE)
-    fin = gt.substitute(
+    return _render_google(
         {'args': args_str, 'returns': ret_str, 'indent': indent},
     )
-    return fin
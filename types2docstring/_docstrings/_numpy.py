@@ -1,7 +1,7 @@
-from string import Template
-
+from types2docstring._helpers import compile_template
 from types2docstring._helpers import FunctionTypes
 from types2docstring._helpers import register_docstring
+from types2docstring._helpers import shared_cache
 
 NUMPY_TEMPLATE = """
 ${indent}\"\"\"[function description]
@@ -19,14 +19,41 @@ ${indent}\"\"\"
 
 NUMPY_ARGS_TEMPLATE = """
 ${indent}$arg_name : $arg_type
-${indent}\t[argument description]
+${indent}\t$description
 """
+NUMPY_ARG_PLACEHOLDER = '[argument description]'
 
 NUMPY_RETURNS_TEMPLATE = """
 ${indent}$type
 ${indent}\t[return description]
 """
 
+_render_numpy = compile_template(NUMPY_TEMPLATE)
+_render_arg = compile_template(NUMPY_ARGS_TEMPLATE)
+_render_return = compile_template(NUMPY_RETURNS_TEMPLATE)
+
+
+@shared_cache('render')
+def _arg_lines(
+    arg_name: str,
+    arg_type: str,
+    description: str,
+    indent: str,
+) -> str:
+    return _render_arg(
+        {
+            'arg_name': arg_name,
+            'arg_type': arg_type,
+            'description': description,
+            'indent': indent,
+        },
+    )
+
+
+@shared_cache('render')
+def _return_lines(return_type: str, indent: str) -> str:
+    return _render_return({'type': return_type, 'indent': indent})
+
 
 @register_docstring('numpy')
 def generate_numpy_docstring(fn_types: FunctionTypes, indent='') -> str:
@@ -34,23 +61,17 @@ def generate_numpy_docstring(fn_types: FunctionTypes, indent='') -> str:
     args = []
     args_str = 'No arguments'
 
-    for arg in fn_types.args:
-        if all(arg):
-            arg_template = Template(NUMPY_ARGS_TEMPLATE)
-            args.append(
-                arg_template.substitute(
-                    {'arg_name': arg[0], 'arg_type': arg[1], 'indent': indent},
-                ),
+    for arg_name, arg_type in fn_types.args:
+        if arg_name and arg_type:
+            description = fn_types.descriptions.get(
+                arg_name, NUMPY_ARG_PLACEHOLDER,
             )
+            args.append(_arg_lines(arg_name, arg_type, description, indent))
     if len(args) > 0:
         args_str = f'\n{indent}\t'.join(args)
 
-    ret_str = Template(NUMPY_RETURNS_TEMPLATE).substitute(
-        {'type': fn_types.returns, 'indent': indent},
-    )
+    ret_str = _return_lines(fn_types.returns, indent)
 
-    gt = Template(NUMPY_TEMPLATE)
-    fin = gt.substitute(
+    return _render_numpy(
         {'args': args_str, 'returns': ret_str, 'indent': indent},
     )
-    return fin
@@ -1,5 +1,19 @@
 from types2docstring._helpers import FunctionTypes
 from types2docstring._helpers import register_docstring
+from types2docstring._helpers import shared_cache
+
+
+@shared_cache('render')
+def _param_lines(
+    arg_name: str,
+    arg_type: str,
+    description: str,
+    indent: str,
+) -> str:
+    return (
+        f'{indent}:param {arg_name}: {description}\n'
+        f'{indent}:type {arg_name}: {arg_type}'
+    )
 
 
 @register_docstring('rst')
@@ -10,14 +24,16 @@ def generate_rst_docstring(fn_types: FunctionTypes, indent='') -> str:
         f'{indent}[function description]', '\n',
     ]
 
-    for arg in fn_types.args:
+    for arg_name, arg_type in fn_types.args:
         # Only self is allowed to have no type annotation.
         # Self is not documented, so it has to be skipped here.
-        if all(arg):
+        if arg_name and arg_type:
+            description = fn_types.descriptions.get(
+                arg_name, f'[{arg_name} description]',
+            )
             docstring.append(
-                f'{indent}:param {arg[0]}: [{arg[0]} description]',
+                _param_lines(arg_name, arg_type, description, indent),
             )
-            docstring.append(f'{indent}:type {arg[0]}: {arg[1]}')
 
     docstring.append('\n')
     docstring.append(f'{indent}:returns: [return description]')
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import bisect
+import re
+import subprocess
+from typing import Optional
+from typing import Sequence
+
+# A range of changed lines, both ends included.
+LINE_RANGE = tuple[int, int]
+
+HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+def parse_diff(diff: str) -> dict[str, list[LINE_RANGE]]:
+    """
+    Returns the changed lines (in the new version) of every file in
+    a diff generated with `--unified=0`.
+    """
+
+    changes: dict[str, list[LINE_RANGE]] = {}
+    ranges: Optional[list[LINE_RANGE]] = None
+
+    for line in diff.splitlines():
+        if line.startswith('+++ '):
+            path = line[4:]
+            if path.startswith('b/'):
+                ranges = changes.setdefault(path[2:], [])
+            else:
+                # The file is removed.
+                ranges = None
+        elif line.startswith('@@') and ranges is not None:
+            match = HUNK_RE.match(line)
+            if match is None:
+                continue
+            start = int(match[1])
+            count = 1 if match[2] is None else int(match[2])
+            if count:
+                ranges.append((start, start + count - 1))
+            else:
+                # Lines were only removed (after `start`), which changes
+                # the lines around it.
+                ranges.append((start, start + 1))
+
+    return changes
+
+
+def changed_lines(
+    ref: Optional[str] = None,
+    staged: bool = False,
+    paths: Sequence[str] = (),
+) -> dict[str, list[LINE_RANGE]]:
+    """
+    Returns the changed lines of every changed file (relative to the
+    current directory) compared to `ref`, or of the staged changes.
+
+    Raises `subprocess.CalledProcessError` when `git diff` fails.
+    """
+
+    cmd = [
+        'git', '-c', 'core.quotePath=false', 'diff',
+        '--unified=0', '--no-color', '--no-ext-diff', '--relative',
+        '--src-prefix=a/', '--dst-prefix=b/', '--diff-filter=ACMR',
+    ]
+    if staged:
+        cmd.append('--cached')
+    if ref is not None:
+        cmd.append(ref)
+    cmd.extend(('--', *paths))
+
+    proc = subprocess.run(
+        cmd, check=True, capture_output=True, encoding='UTF-8',
+    )
+    return parse_diff(proc.stdout)
+
+
+def overlaps(
+    start: int,
+    end: int,
+    ranges: Sequence[LINE_RANGE],
+    starts: Sequence[int],
+) -> bool:
+    """
+    Returns whether the lines `start` to `end` overlap with the sorted
+    (not overlapping) `ranges`. `starts` are the starts of the ranges.
+    """
+
+    # The last range that starts before `end` is the only one that can
+    # overlap, all the ranges before it end before it starts.
+    i = bisect.bisect_right(starts, end) - 1
+    return i >= 0 and ranges[i][1] >= start
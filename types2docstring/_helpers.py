@@ -1,18 +1,119 @@
-import pkgutil
+from __future__ import annotations
+
+import functools
+import importlib
+import sys
+from string import Template
+from typing import Any
 from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
 from typing import NamedTuple
+from typing import TYPE_CHECKING
+from typing import TypeVar
 
-from types2docstring import _docstrings
+if TYPE_CHECKING:
+    from importlib.metadata import EntryPoint
 
 
 class FunctionTypes(NamedTuple):
     args: list[tuple[str, str | None]]
     returns: str
+    # Known descriptions of the arguments by name (see `_index`), the
+    # other arguments get a placeholder.
+    descriptions: Mapping[str, str] = {}
 
 
 DOCSTRING_FUNC = Callable[[FunctionTypes, str], str]
+TEMPLATE_RENDERER = Callable[[Mapping[str, str]], str]
+_FUNC = TypeVar('_FUNC', bound=Callable[..., Any])
+
+# The modules that register the builtin docstring types.
+DOCSTRING_MODULES = {
+    'google': 'types2docstring._docstrings._google',
+    'numpy': 'types2docstring._docstrings._numpy',
+    'rst': 'types2docstring._docstrings._rst',
+}
+# Other packages can add docstring types with an entry point in this group,
+# pointing to the docstring function (or a module that registers it).
+ENTRY_POINT_GROUP = 'types2docstring.docstrings'
+
+# Maximum number of results remembered by each shared cache.
+SHARED_CACHE_SIZE = 4096
+# The kinds of shared caches, the stats count their hits and misses.
+SHARED_CACHE_KINDS = ('annotation', 'render')
+_CACHE_INFOS: dict[str, list[Callable[[], functools._CacheInfo]]] = {}
+
+
+def _entry_points() -> dict[str, EntryPoint]:
+
+    # Importing importlib.metadata is slow, so it is only imported when
+    # a docstring type is not builtin.
+    import importlib.metadata
+
+    if sys.version_info >= (3, 10):
+        group = importlib.metadata.entry_points(group=ENTRY_POINT_GROUP)
+    else:  # pragma: nocover
+        group = importlib.metadata.entry_points().get(ENTRY_POINT_GROUP, ())
+    return {ep.name: ep for ep in group}
+
+
+class _DocstringTypes(Mapping[str, DOCSTRING_FUNC]):
+    """
+    Registry of the docstring types by name.
+
+    The module of a docstring type is only imported when the type is
+    used, so a run only imports the docstring type it needs.
+    """
+
+    def __init__(self) -> None:
+        self._registered: dict[str, DOCSTRING_FUNC] = {}
+        self._entry_points: dict[str, EntryPoint] = {}
+        self._entry_points_loaded = False
+
+    def register(self, name: str, func: DOCSTRING_FUNC) -> None:
+        self._registered[name] = func
+
+    def _third_party(self) -> dict[str, EntryPoint]:
+        # Looking up the entry points scans all installed packages,
+        # so it is only done when a docstring type is not builtin.
+        if not self._entry_points_loaded:
+            self._entry_points = _entry_points()
+            self._entry_points_loaded = True
+        return self._entry_points
+
+    def _load(self, name: str) -> None:
+
+        if name in DOCSTRING_MODULES:
+            importlib.import_module(DOCSTRING_MODULES[name])
+        elif name in self._third_party():
+            loaded = self._third_party()[name].load()
+            # Modules register themselves when they are imported.
+            if name not in self._registered and callable(loaded):
+                self.register(name, loaded)
+
+    def __getitem__(self, name: str) -> DOCSTRING_FUNC:
+        if name not in self._registered:
+            self._load(name)
+        return self._registered[name]
+
+    def __contains__(self, name: object) -> bool:
+        return (
+            name in self._registered or
+            name in DOCSTRING_MODULES or
+            name in self._third_party()
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        names = {*self._registered, *DOCSTRING_MODULES, *self._third_party()}
+        return iter(sorted(names))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
 
-DOCSTRING_TYPES: dict[str, DOCSTRING_FUNC] = {}
+
+DOCSTRING_TYPES = _DocstringTypes()
 
 
 def register_docstring(
@@ -20,25 +121,86 @@ def register_docstring(
 ) -> Callable[[DOCSTRING_FUNC], DOCSTRING_FUNC]:
     def register_docstring_decorator(func: DOCSTRING_FUNC) -> DOCSTRING_FUNC:
         # TODO: Make sure the name is not used yet?
-        DOCSTRING_TYPES[name] = func
+        DOCSTRING_TYPES.register(name, func)
         return func
     return register_docstring_decorator
 
 
-def _import_docstrings() -> None:
+def render_docstrings(
+    name: str,
+    functions: Iterable[tuple[FunctionTypes, str]],
+) -> list[str]:
+    """
+    Renders the docstrings of all the (function types, indent) pairs,
+    e.g. all the functions of a file, with the docstring type `name`.
+    """
+
+    render = DOCSTRING_TYPES[name]
+    return [render(fn_types, indent) for fn_types, indent in functions]
+
+
+def compile_template(template: str) -> TEMPLATE_RENDERER:
+    """
+    Compiles a `string.Template` into a function that renders it.
+
+    The template is split into its text and placeholders once,
+    so rendering only has to join the strings together.
+    """
+
+    # Alternating text and placeholder names, starting and ending with text.
+    parts = ['']
+    pos = 0
+    for match in Template.pattern.finditer(template):
+        parts[-1] += template[pos:match.start()]
+        name = match.group('named') or match.group('braced')
+        if name is not None:
+            parts.extend((name, ''))
+        elif match.group('escaped') is not None:
+            parts[-1] += '$'
+        else:
+            raise ValueError(f'Invalid placeholder in template: {template!r}')
+        pos = match.end()
+    parts[-1] += template[pos:]
+
+    texts = parts[::2]
+    names = parts[1::2]
+
+    def render(mapping: Mapping[str, str]) -> str:
+        result = [texts[0]]
+        for name, text in zip(names, texts[1:]):
+            result.append(mapping[name])
+            result.append(text)
+        return ''.join(result)
+
+    return render
+
+
+def shared_cache(kind: str) -> Callable[[_FUNC], _FUNC]:
     """
-    Imports all docstring (types) in _docstrings directory.
+    Caches the results of the decorated function for all the files that
+    are rewritten by the process (every process of `--jobs` has its own
+    caches), dropping the least recently used results first.
 
-    All the type of docstrings still have to be registered
-    with their correct decorator.
+    `kind` is one of `SHARED_CACHE_KINDS`.
     """
 
-    docstring_path = _docstrings.__path__
-    mod_infos = pkgutil.walk_packages(
-        docstring_path, f'{_docstrings.__name__}.',
-    )
-    for _, name, _ in mod_infos:
-        __import__(name, fromlist=['_trash'])
+    def shared_cache_decorator(func: _FUNC) -> _FUNC:
+        cached = functools.lru_cache(maxsize=SHARED_CACHE_SIZE)(func)
+        _CACHE_INFOS.setdefault(kind, []).append(cached.cache_info)
+        return cached  # type: ignore[return-value]
+    return shared_cache_decorator
+
+
+def shared_cache_counts() -> dict[str, int]:
+    """
+    Returns the total hits and misses of the shared caches of every kind,
+    e.g. `render_cache_hits`.
+    """
 
+    counts = {}
+    for kind in SHARED_CACHE_KINDS:
+        infos = [cache_info() for cache_info in _CACHE_INFOS.get(kind, ())]
+        counts[f'{kind}_cache_hits'] = sum(info.hits for info in infos)
+        counts[f'{kind}_cache_misses'] = sum(info.misses for info in infos)
 
-_import_docstrings()
+    return counts
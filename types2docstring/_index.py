@@ -0,0 +1,185 @@
+"""
+Index of the parameter descriptions in the existing docstrings of a project.
+
+Maps every (parameter name, annotation) to the description it has most
+often, so the generated docstrings can reuse it instead of a placeholder.
+The index is stored as JSON, with the parameters of every file and the
+modification time and size the file had when it was parsed, so updating
+it only parses the files that changed.
+"""
+from __future__ import annotations
+
+import ast
+import collections
+import functools
+import json
+import os
+import tempfile
+from typing import Any
+from typing import Iterable
+
+from types2docstring._parse import is_placeholder
+from types2docstring._parse import parse_params
+from types2docstring.types2docstring import _decode_contents
+from types2docstring.types2docstring import _function_args
+from types2docstring.types2docstring import _node_to_annotation
+
+# Bump this when the meaning of the stored entries changes.
+INDEX_FORMAT = 1
+# (parameter name, annotation)
+DESCRIPTION_KEY = tuple[str, str]
+
+
+def _file_params(filename: str) -> list[list[str]]:
+    """
+    Returns the [name, annotation, description] of every documented
+    parameter in the file, none when the file cannot be read or parsed
+    (the rewrite reports it).
+    """
+
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if b'def' not in data:
+            return []
+
+        contents = _decode_contents(data)
+        tree = ast.parse(contents)
+    except (OSError, UnicodeDecodeError, SyntaxError, ValueError):
+        return []
+    lines = contents.split('\n')
+
+    params = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        docstring = ast.get_docstring(node)
+        if not docstring:
+            continue
+
+        annotations = {
+            arg.arg: _node_to_annotation(arg.annotation, lines)
+            for arg in _function_args(node) if arg.annotation is not None
+        }
+        for param in parse_params(docstring):
+            name = param.name.lstrip('*')
+            # The annotation is what the generated docstrings use, the
+            # type of the docstring is only used without one.
+            annotation = annotations.get(name, param.type)
+            if (
+                annotation and
+                param.description and
+                not is_placeholder(param.description)
+            ):
+                params.append([name, annotation, param.description])
+
+    return params
+
+
+def _read(index_path: str) -> dict[str, Any]:
+
+    try:
+        with open(index_path, encoding='UTF-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+
+    if not isinstance(index, dict) or index.get('format') != INDEX_FORMAT:
+        # Missing, broken or of another version, so it is rebuilt.
+        return {'format': INDEX_FORMAT, 'files': {}}
+    return index
+
+
+def _write(index_path: str, index: dict[str, Any]) -> None:
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(index_path)),
+        prefix=f'.{os.path.basename(index_path)}.',
+        suffix='.tmp',
+    )
+    try:
+        with open(fd, 'w', encoding='UTF-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def update(index_path: str, filenames: Iterable[str]) -> int:
+    """
+    Adds the parameters of the files to the index, only parsing the
+    files that changed since they were indexed. Files that no longer
+    exist are removed from the index.
+
+    Returns the number of parsed files.
+    """
+
+    index = _read(index_path)
+    files: dict[str, Any] = index['files']
+    seen = set()
+    parsed = 0
+
+    for filename in filenames:
+        path = os.path.abspath(filename)
+        seen.add(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+
+        entry = files.get(path)
+        if (
+            entry is not None and
+            entry['mtime'] == st.st_mtime_ns and
+            entry['size'] == st.st_size
+        ):
+            continue
+
+        files[path] = {
+            'mtime': st.st_mtime_ns,
+            'size': st.st_size,
+            'params': _file_params(path),
+        }
+        parsed += 1
+
+    removed = [
+        path for path in files
+        if path not in seen and not os.path.exists(path)
+    ]
+    for path in removed:
+        del files[path]
+
+    if parsed or removed or not os.path.exists(index_path):
+        _write(index_path, index)
+
+    return parsed
+
+
+@functools.lru_cache(maxsize=1)
+def _load(index_path: str, mtime: int) -> dict[DESCRIPTION_KEY, str]:
+
+    counts: dict[DESCRIPTION_KEY, collections.Counter[str]] = {}
+    for entry in _read(index_path)['files'].values():
+        for name, annotation, description in entry['params']:
+            key = (name, annotation)
+            counts.setdefault(key, collections.Counter())[description] += 1
+
+    return {
+        key: counter.most_common(1)[0][0] for key, counter in counts.items()
+    }
+
+
+def load(index_path: str) -> dict[DESCRIPTION_KEY, str]:
+    """
+    Returns the most common description of every (name, annotation).
+
+    The descriptions are loaded once per process (and again when the
+    index changes), so every file that is rewritten can look them up.
+    """
+
+    try:
+        mtime = os.stat(index_path).st_mtime_ns
+    except OSError:
+        return {}
+    return _load(index_path, mtime)
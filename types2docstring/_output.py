@@ -0,0 +1,217 @@
+"""
+Formats the edits of a file for the modes that report the changes instead
+of writing them: a unified diff, JSON lines with one edit per line, and
+LSP `TextEdit`s.
+
+The output is built from the edits and the lines around them, so the new
+contents are never diffed against the old ones.
+"""
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from types2docstring.types2docstring import Edit
+
+# Number of unchanged lines around the changes in a diff.
+DIFF_CONTEXT = 3
+# Follows the last line of a diff when the file does not end with a newline.
+NO_NEWLINE = '\\ No newline at end of file'
+# The name used for the source read from stdin.
+STDIN_NAME = '<stdin>'
+
+FORMATTER = Callable[[str, str, Sequence['Edit']], str]
+
+
+class _Change(NamedTuple):
+    # The old lines in [start, end) are replaced with the new lines.
+    start: int
+    end: int
+    new_lines: list[str]
+
+
+def _changes(lines: Sequence[str], edits: Sequence[Edit]) -> list[_Change]:
+    """
+    Returns the changes of the lines made by the edits.
+
+    The edits never share a line: docstrings are inserted at the end of
+    a declaration and synced docstrings only have whole lines replaced.
+    """
+
+    changes = []
+    previous_end = 0
+    for edit in sorted(edits):
+        start, end = edit.line - 1, edit.end_line
+        assert start >= previous_end, 'edits share a line'
+        previous_end = end
+
+        new = (
+            lines[start][:edit.column] +
+            edit.text +
+            lines[end - 1][edit.end_column:]
+        )
+        old_lines = lines[start:end]
+        new_lines = new.split('\n')
+
+        # Only the lines that differ are shown as changed.
+        i = 0
+        while (
+            i < min(len(old_lines), len(new_lines)) and
+            old_lines[i] == new_lines[i]
+        ):
+            i += 1
+        j = 0
+        while (
+            j < min(len(old_lines), len(new_lines)) - i and
+            old_lines[-1 - j] == new_lines[-1 - j]
+        ):
+            j += 1
+        changes.append(
+            _Change(start + i, end - j, new_lines[i:len(new_lines) - j]),
+        )
+
+    return changes
+
+
+def _format_range(start: int, length: int) -> str:
+    # The same ranges as `difflib.unified_diff`.
+    if length == 1:
+        return f'{start + 1}'
+    if not length:
+        return f'{start},0'
+    return f'{start + 1},{length}'
+
+
+def unified_diff(filename: str, contents: str, edits: Sequence[Edit]) -> str:
+    """
+    Returns the unified diff of the edits to the contents of the file.
+    """
+
+    if not edits:
+        return ''
+
+    lines = contents.split('\n')
+    # The empty string after the last newline is not a line.
+    n = len(lines) - 1 if lines[-1] == '' else len(lines)
+
+    def line(prefix: str, text: str, last: bool) -> str:
+        # Only the last line of a file can miss its newline, which is
+        # marked the way `patch` expects.
+        if last and lines[-1] != '':
+            return f'{prefix}{text}\n{NO_NEWLINE}\n'
+        return f'{prefix}{text}\n'
+
+    # Changes that are close enough to share their context lines are
+    # shown in the same hunk.
+    hunks: list[list[_Change]] = []
+    for change in _changes(lines, edits):
+        if hunks and change.start - hunks[-1][-1].end <= 2 * DIFF_CONTEXT:
+            hunks[-1].append(change)
+        else:
+            hunks.append([change])
+
+    output = [f'--- {filename}\n', f'+++ {filename}\n']
+    # The difference in the number of lines made by the previous hunks.
+    delta = 0
+    for hunk in hunks:
+        start = max(hunk[0].start - DIFF_CONTEXT, 0)
+        end = min(hunk[-1].end + DIFF_CONTEXT, n)
+
+        body = []
+        old_length = new_length = 0
+        position = start
+        for change in hunk:
+            for i in range(position, change.start):
+                body.append(line(' ', lines[i], i == n - 1))
+            for i in range(change.start, change.end):
+                body.append(line('-', lines[i], i == n - 1))
+            for k, new_line in enumerate(change.new_lines):
+                last = change.end == n and k == len(change.new_lines) - 1
+                body.append(line('+', new_line, last))
+            old_length += change.end - change.start
+            new_length += len(change.new_lines)
+            position = change.end
+        for i in range(position, end):
+            body.append(line(' ', lines[i], i == n - 1))
+
+        context = end - start - old_length
+        old_range = _format_range(start, end - start)
+        new_range = _format_range(start + delta, context + new_length)
+        output.append(f'@@ -{old_range} +{new_range} @@\n')
+        output.extend(body)
+        delta += new_length - old_length
+
+    return ''.join(output)
+
+
+def json_lines(filename: str, contents: str, edits: Sequence[Edit]) -> str:
+    """
+    Returns a JSON object for every edit, one per line.
+
+    The lines start at 1 and the columns (in characters) at 0.
+    """
+
+    return ''.join(
+        json.dumps({'file': filename, **edit._asdict()}) + '\n'
+        for edit in edits
+    )
+
+
+def _uri(filename: str) -> Optional[str]:
+    if filename == STDIN_NAME:
+        return None
+    return pathlib.Path(os.path.abspath(filename)).as_uri()
+
+
+def _utf16_character(line: str, column: int) -> int:
+    # The characters of LSP positions are UTF-16 code units.
+    if line.isascii():
+        return column
+    return len(line[:column].encode('UTF-16-LE')) // 2
+
+
+def lsp_text_edits(
+    filename: str,
+    contents: str,
+    edits: Sequence[Edit],
+) -> str:
+    """
+    Returns a JSON line with the `uri` of the file (null for stdin) and
+    its `edits` as LSP `TextEdit`s.
+    """
+
+    lines = contents.split('\n')
+
+    def position(line: int, column: int) -> dict[str, int]:
+        # LSP lines start at 0.
+        return {
+            'line': line - 1,
+            'character': _utf16_character(lines[line - 1], column),
+        }
+
+    text_edits: list[dict[str, Any]] = [
+        {
+            'range': {
+                'start': position(edit.line, edit.column),
+                'end': position(edit.end_line, edit.end_column),
+            },
+            'newText': edit.text,
+        }
+        for edit in edits
+    ]
+    return json.dumps({'uri': _uri(filename), 'edits': text_edits}) + '\n'
+
+
+FORMATTERS: dict[str, FORMATTER] = {
+    'diff': unified_diff,
+    'json': json_lines,
+    'lsp': lsp_text_edits,
+}
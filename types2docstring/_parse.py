@@ -0,0 +1,429 @@
+"""
+Parses existing docstrings in the rst, google and numpy styles into their
+documented parameters and return value, together with the lines they are
+on, so they can be indexed (see `_index`) and updated (see `_sync`).
+
+The parsers only look at the indentation of the lines relative to each
+other, so they work on the raw lines of a docstring in the source as well
+as on cleaned docstrings (see `inspect.cleandoc`).
+"""
+from __future__ import annotations
+
+import re
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+STYLE_RST = 'rst'
+STYLE_GOOGLE = 'google'
+STYLE_NUMPY = 'numpy'
+
+# What the docstring types write when a function has no arguments.
+NO_ARGUMENTS = 'No arguments'
+# Descriptions that were generated and never filled in.
+PLACEHOLDER_RE = re.compile(r'^\[[^\]]*description\]$')
+
+# Only the info fields, lines starting with a role like `:func:` are prose.
+_RST_FIELD_RE = re.compile(
+    r'^(?P<indent>\s*):(?:param|parameter|arg|argument|key|keyword|type|'
+    r'raises?|except|exception|var|ivar|cvar|vartype|returns?|rtype|'
+    r'yields?|ytype|meta)[\s:]',
+)
+_RST_PARAM_RE = re.compile(
+    r'^\s*:param\s+(?:(?P<type>[^:]+?)\s+)?(?P<name>\**\w+)\s*:(?P<rest>.*)$',
+)
+_RST_TYPE_RE = re.compile(
+    r'^\s*:type\s+(?P<name>\**\w+)\s*:\s*(?P<type>.*?)\s*$',
+)
+_RST_RTYPE_RE = re.compile(r'^\s*:rtype\s*:\s*(?P<type>.*?)\s*$')
+
+_GOOGLE_ARGS_SECTIONS = ('Args', 'Arguments', 'Parameters')
+_GOOGLE_OTHER_ARGS_SECTIONS = (
+    'Keyword Args', 'Keyword Arguments', 'Other Parameters',
+)
+_GOOGLE_RETURNS_SECTIONS = ('Returns', 'Return', 'Yields')
+_GOOGLE_SECTION_RE = re.compile(r'^(?P<name>[A-Z]\w*(?: \w+)?):$')
+_GOOGLE_PARAM_RE = re.compile(
+    r'^\s*(?P<name>\**\w+)\s*(?:\((?P<type>.*)\))?\s*:(?P<rest>.*)$',
+)
+_GOOGLE_RETURNS_RE = re.compile(r'^\s*(?P<type>[^\s:][^:]*?)\s*:(?P<rest>.*)$')
+
+_NUMPY_PARAMS_SECTIONS = ('Parameters',)
+_NUMPY_OTHER_PARAMS_SECTIONS = ('Other Parameters',)
+_NUMPY_RETURNS_SECTIONS = ('Returns', 'Yields')
+_NUMPY_PARAM_RE = re.compile(
+    r'^\s*(?P<name>\**\w+)\s*(?::\s*(?P<type>.*?))?\s*$',
+)
+_NUMPY_RETURNS_RE = re.compile(
+    r'^\s*(?:(?P<name>\w+)\s*:\s*)?(?P<type>\S.*?)\s*$',
+)
+_UNDERLINE_RE = re.compile(r'^-{3,}$')
+
+
+class Field(NamedTuple):
+    """
+    A documented parameter, or the return value, of a docstring.
+
+    The line numbers start at 0 (the line with the opening quotes).
+    """
+    # The name as it is written (with the stars of `*args`), empty for
+    # the return value.
+    name: str
+    type: Optional[str]
+    description: str
+    # The lines of the field, the end is excluded.
+    start: int
+    end: int
+    # The line with the type, which is `type_prefix + type + type_suffix`.
+    type_line: Optional[int] = None
+    type_prefix: str = ''
+    type_suffix: str = ''
+
+    def retyped(self, type_: str) -> str:
+        """
+        Returns the line with the type, with `type_` as the type.
+        """
+        return f'{self.type_prefix}{type_}{self.type_suffix}'
+
+
+class Docstring(NamedTuple):
+    style: str
+    params: list[Field]
+    # The parameters of the other sections (like `Keyword Args`), which
+    # may document what is passed in `**kwargs`.
+    other_params: list[Field]
+    returns: Optional[Field]
+    # Where parameters are added when none are documented, the line is
+    # replaced when it is a `No arguments` placeholder, otherwise the
+    # parameters are inserted before it.
+    add_line: Optional[int]
+    add_replaces: bool
+    # The indentation of the parameters (and of their descriptions when
+    # they are on their own lines), as written in the docstring.
+    indent: str
+    description_indent: str
+
+
+def _indent(line: str) -> int:
+    return len(line.expandtabs()) - len(line.expandtabs().lstrip())
+
+
+def _whitespace(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _typed_field(
+    name: str,
+    line: str,
+    i: int,
+    match: re.Match[str],
+    description: str = '',
+) -> Field:
+    """
+    Returns the field for a line that has its type in the `type` group
+    of the `match`.
+    """
+
+    if match['type'] is None or not match['type'].strip():
+        return Field(name, None, description, i, i + 1)
+
+    return Field(
+        name=name,
+        type=match['type'].strip(),
+        description=description,
+        start=i,
+        end=i + 1,
+        type_line=i,
+        type_prefix=line[:match.start('type')],
+        type_suffix=line[match.end('type'):],
+    )
+
+
+def _continue(field: Field, line: str, i: int) -> Field:
+    # Descriptions are joined into a single line.
+    description = f'{field.description} {line.strip()}'.strip()
+    return field._replace(end=i + 1, description=description)
+
+
+def _parse_rst(lines: Sequence[str]) -> Optional[Docstring]:
+
+    params: list[Field] = []
+    types: dict[str, Field] = {}
+    returns: Optional[Field] = None
+    first_field: Optional[int] = None
+    indent = ''
+    # The parameter whose description continues on the next lines.
+    current: Optional[int] = None
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if current is not None:
+            field_indent = _indent(lines[params[current].start])
+            if (
+                stripped and
+                _indent(line) > field_indent and
+                _RST_FIELD_RE.match(line) is None
+            ):
+                params[current] = _continue(params[current], line, i)
+                continue
+            current = None
+
+        field_match = _RST_FIELD_RE.match(line)
+        if field_match is None:
+            continue
+        if first_field is None:
+            first_field = i
+            indent = field_match['indent']
+
+        param_match = _RST_PARAM_RE.match(line)
+        type_match = _RST_TYPE_RE.match(line)
+        rtype_match = _RST_RTYPE_RE.match(line)
+        if param_match:
+            params.append(
+                _typed_field(
+                    param_match['name'], line, i, param_match,
+                    param_match['rest'].strip(),
+                ),
+            )
+            current = len(params) - 1
+        elif type_match:
+            types[type_match['name']] = _typed_field(
+                type_match['name'], line, i, type_match,
+            )
+        elif rtype_match:
+            returns = _typed_field('', line, i, rtype_match)
+
+    if first_field is None:
+        return None
+
+    for j, field in enumerate(params):
+        type_field = types.get(field.name)
+        if field.type is None and type_field is not None:
+            params[j] = field._replace(
+                type=type_field.type,
+                type_line=type_field.type_line,
+                type_prefix=type_field.type_prefix,
+                type_suffix=type_field.type_suffix,
+            )
+
+    return Docstring(
+        style=STYLE_RST,
+        params=params,
+        other_params=[],
+        returns=returns,
+        add_line=first_field,
+        add_replaces=False,
+        indent=indent,
+        description_indent='',
+    )
+
+
+def _parse_google(lines: Sequence[str]) -> Optional[Docstring]:
+
+    params: list[Field] = []
+    other_params: list[Field] = []
+    # The list the entries of the current section are added to.
+    entries = params
+    returns: Optional[Field] = None
+    found = False
+    add_line: Optional[int] = None
+    add_replaces = False
+    indent = ''
+    # The current section and the indentation of its header
+    # and of its entries.
+    section: Optional[str] = None
+    section_indent = 0
+    entry_indent: Optional[int] = None
+    current: Optional[int] = None
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        line_indent = _indent(line)
+        if section is not None and line_indent <= section_indent:
+            section = None
+        if section is None:
+            match = _GOOGLE_SECTION_RE.match(stripped)
+            if match is not None:
+                found = True
+                section = match['name']
+                section_indent = line_indent
+                entry_indent = current = None
+                if section in _GOOGLE_ARGS_SECTIONS and add_line is None:
+                    add_line = i + 1
+                    indent = f'{_whitespace(line)}    '
+            continue
+
+        if section in _GOOGLE_RETURNS_SECTIONS:
+            returns_match = _GOOGLE_RETURNS_RE.match(line)
+            if returns is None and returns_match is not None:
+                returns = _typed_field(
+                    '', line, i, returns_match,
+                    returns_match['rest'].strip(),
+                )
+            continue
+        elif section in _GOOGLE_ARGS_SECTIONS:
+            entries = params
+        elif section in _GOOGLE_OTHER_ARGS_SECTIONS:
+            entries = other_params
+        else:
+            continue
+
+        if entry_indent is None or line_indent <= entry_indent:
+            entry_indent = line_indent
+            current = None
+            if stripped == NO_ARGUMENTS and entries is params:
+                add_line = i
+                add_replaces = True
+                indent = _whitespace(line)
+                continue
+
+            param_match = _GOOGLE_PARAM_RE.match(line)
+            if param_match is None:
+                continue
+            if not params and entries is params:
+                indent = _whitespace(line)
+            entries.append(
+                _typed_field(
+                    param_match['name'], line, i, param_match,
+                    param_match['rest'].strip(),
+                ),
+            )
+            current = len(entries) - 1
+        elif current is not None:
+            entries[current] = _continue(entries[current], line, i)
+
+    if not found:
+        return None
+
+    return Docstring(
+        style=STYLE_GOOGLE,
+        params=params,
+        other_params=other_params,
+        returns=returns,
+        add_line=add_line,
+        add_replaces=add_replaces,
+        indent=indent,
+        description_indent='',
+    )
+
+
+def _parse_numpy(lines: Sequence[str]) -> Optional[Docstring]:
+
+    params: list[Field] = []
+    other_params: list[Field] = []
+    # The list the entries of the current section are added to.
+    entries = params
+    returns: Optional[Field] = None
+    found = False
+    add_line: Optional[int] = None
+    add_replaces = False
+    indent = description_indent = None
+    section: Optional[str] = None
+    section_indent = 0
+    current: Optional[int] = None
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if (
+            stripped and
+            i + 1 < len(lines) and
+            _UNDERLINE_RE.match(lines[i + 1].strip())
+        ):
+            # The header of a section.
+            found = True
+            section = stripped
+            section_indent = _indent(line)
+            current = None
+            if section in _NUMPY_PARAMS_SECTIONS and add_line is None:
+                add_line = i + 2
+                indent = _whitespace(line)
+            continue
+        if not stripped or _UNDERLINE_RE.match(stripped):
+            continue
+
+        line_indent = _indent(line)
+        if section in _NUMPY_RETURNS_SECTIONS:
+            returns_match = _NUMPY_RETURNS_RE.match(line)
+            if (
+                returns is None and
+                returns_match is not None and
+                line_indent <= section_indent
+            ):
+                returns = _typed_field('', line, i, returns_match)
+            continue
+        elif section in _NUMPY_PARAMS_SECTIONS:
+            entries = params
+        elif section in _NUMPY_OTHER_PARAMS_SECTIONS:
+            entries = other_params
+        else:
+            continue
+
+        if line_indent <= section_indent:
+            current = None
+            if stripped == NO_ARGUMENTS and entries is params:
+                add_line = i
+                add_replaces = True
+                continue
+
+            param_match = _NUMPY_PARAM_RE.match(line)
+            if param_match is None:
+                section = None
+                continue
+            entries.append(
+                _typed_field(param_match['name'], line, i, param_match),
+            )
+            current = len(entries) - 1
+        elif current is not None:
+            if description_indent is None and entries is params:
+                description_indent = _whitespace(line)
+            entries[current] = _continue(entries[current], line, i)
+
+    if not found:
+        return None
+
+    indent = indent or ''
+    if description_indent is None:
+        description_indent = f'{indent}    '
+
+    return Docstring(
+        style=STYLE_NUMPY,
+        params=params,
+        other_params=other_params,
+        returns=returns,
+        add_line=add_line,
+        add_replaces=add_replaces,
+        indent=indent,
+        description_indent=description_indent,
+    )
+
+
+def parse_docstring(lines: Sequence[str]) -> Optional[Docstring]:
+    """
+    Parses the lines of a docstring in the first style that matches,
+    returns None when it is not in any of the styles.
+    """
+
+    for parse in (_parse_rst, _parse_google, _parse_numpy):
+        docstring = parse(lines)
+        if docstring is not None:
+            return docstring
+
+    return None
+
+
+def parse_params(docstring: str) -> list[Field]:
+    """
+    Returns the documented parameters of the (cleaned) docstring.
+    """
+
+    parsed = parse_docstring(docstring.split('\n'))
+    if parsed is None:
+        return []
+    return [*parsed.params, *parsed.other_params]
+
+
+def is_placeholder(description: str) -> bool:
+    return PLACEHOLDER_RE.match(description) is not None
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import contextlib
+import heapq
+import time
+from typing import Any
+from typing import Iterator
+
+# The stages of rewriting a file, in the order they happen.
+STAGES = (
+    'read', 'parse', 'collect', 'sync', 'tokenize', 'annotations', 'render',
+    'write',
+)
+DEFAULT_TOP_FILES = 10
+
+
+class FileStats:
+    """
+    The time spent in every stage of rewriting a single file,
+    and counters of what happened to the file and its functions.
+    """
+
+    def __init__(self, filename: str = '') -> None:
+        self.filename = filename
+        self.times: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.times[stage] = self.times.get(stage, 0.0) + elapsed
+
+    def count(self, counter: str, n: int = 1) -> None:
+        self.counts[counter] = self.counts.get(counter, 0) + n
+
+    @property
+    def total(self) -> float:
+        return sum(self.times.values())
+
+
+class RunStats:
+    """
+    Combines the stats of all the files of a run.
+
+    Only the `top` slowest files are remembered.
+    """
+
+    def __init__(self, top: int = DEFAULT_TOP_FILES) -> None:
+        self.top = top
+        self.files = 0
+        self.times: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        # Min-heap of (time, filename), so the fastest file is dropped
+        # first when there are more than `top` files.
+        self._slowest: list[tuple[float, str]] = []
+        self._start = time.perf_counter()
+
+    def add(self, file_stats: FileStats) -> None:
+
+        self.files += 1
+        for stage, seconds in file_stats.times.items():
+            self.times[stage] = self.times.get(stage, 0.0) + seconds
+        for counter, n in file_stats.counts.items():
+            self.counts[counter] = self.counts.get(counter, 0) + n
+
+        item = (file_stats.total, file_stats.filename)
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, item)
+        elif self.top:
+            heapq.heappushpop(self._slowest, item)
+
+    @property
+    def slowest(self) -> list[tuple[float, str]]:
+        return sorted(self._slowest, reverse=True)
+
+    @property
+    def cache_hit_rates(self) -> dict[str, float]:
+        """
+        The fraction of lookups that were hits for every cache with
+        `<name>_cache_hits` and `<name>_cache_misses` counters.
+        """
+
+        rates = {}
+        for counter in sorted(self.counts):
+            if not counter.endswith('_cache_hits'):
+                continue
+            name = counter[:-len('_cache_hits')]
+            hits = self.counts[counter]
+            lookups = hits + self.counts.get(f'{name}_cache_misses', 0)
+            rates[name] = hits / lookups
+
+        return rates
+
+    def to_dict(self) -> dict[str, Any]:
+
+        return {
+            'files': self.files,
+            'wall_time': time.perf_counter() - self._start,
+            'stages': {
+                stage: self.times[stage]
+                for stage in STAGES if stage in self.times
+            },
+            'counts': dict(sorted(self.counts.items())),
+            'cache_hit_rates': self.cache_hit_rates,
+            'slowest_files': [
+                {'filename': filename, 'time': seconds}
+                for seconds, filename in self.slowest
+            ],
+        }
+
+    def report(self) -> str:
+        """
+        Returns a human readable summary of the stats.
+        """
+
+        stats = self.to_dict()
+        lines = [
+            f"Processed {stats['files']} files "
+            f"in {stats['wall_time']:.3f}s",
+            '',
+            'Time per stage (summed over all files and processes):',
+        ]
+        total = sum(stats['stages'].values()) or 1.0
+        for stage, seconds in stats['stages'].items():
+            lines.append(
+                f'    {stage:<12}{seconds:>10.3f}s {seconds / total:>7.1%}',
+            )
+
+        lines.extend(('', 'Counts:'))
+        for counter, n in stats['counts'].items():
+            lines.append(f'    {counter:<28}{n:>8}')
+
+        if stats['cache_hit_rates']:
+            lines.extend(('', 'Cache hit rates:'))
+            for name, rate in stats['cache_hit_rates'].items():
+                lines.append(f'    {name:<28}{rate:>8.1%}')
+
+        if stats['slowest_files']:
+            lines.extend(('', 'Slowest files:'))
+            for file in stats['slowest_files']:
+                lines.append(f"    {file['time']:>8.3f}s  {file['filename']}")
+
+        return '\n'.join(lines)
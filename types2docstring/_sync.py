@@ -0,0 +1,278 @@
+"""
+Updates the parameters and the return type of existing docstrings to the
+signature of their function, for the functions that changed after their
+docstring was written.
+
+Only the lines of the fields that are added, removed or retyped are
+edited, so whatever else was written in the docstring is kept.
+"""
+from __future__ import annotations
+
+import ast
+from typing import Optional
+from typing import Sequence
+
+from types2docstring._docstrings._google import GOOGLE_ARG_PLACEHOLDER
+from types2docstring._docstrings._numpy import NUMPY_ARG_PLACEHOLDER
+from types2docstring._helpers import FunctionTypes
+from types2docstring._parse import Docstring
+from types2docstring._parse import Field
+from types2docstring._parse import NO_ARGUMENTS
+from types2docstring._parse import parse_docstring
+from types2docstring._parse import STYLE_GOOGLE
+from types2docstring._parse import STYLE_NUMPY
+from types2docstring._parse import STYLE_RST
+
+# (start, end, new lines), the lines in [start, end) are replaced.
+REPLACEMENT = tuple[int, int, list[str]]
+
+CLOSING_QUOTES = ('"""', "'''")
+# Kept after the type in the numpy and google styles.
+OPTIONAL_SUFFIX = ', optional'
+
+
+def _normalize(type_: str) -> str:
+    """
+    Returns the annotation as it is written in a docstring: on a single
+    line, and without the quotes of a forward reference.
+    """
+
+    try:
+        node = ast.parse(type_.strip(), mode='eval').body
+    except SyntaxError:
+        pass
+    else:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            type_ = node.value
+    return ' '.join(type_.split())
+
+
+def _comparable(type_: str) -> str:
+    # Whitespace, the quotes of forward references and the `~` of
+    # shortened references to Sphinx do not make types differ.
+    return ''.join(
+        type_.replace('~', '').replace('"', '').replace("'", '').split(),
+    )
+
+
+def _is_type(text: str) -> bool:
+    """
+    Returns whether the text can be a type, rather than a description
+    (a google return value does not have to start with its type).
+    """
+
+    try:
+        ast.parse(text, mode='eval')
+    except SyntaxError:
+        return False
+    return True
+
+
+def _retyped(field: Field, type_: str) -> Optional[str]:
+    """
+    Returns the line with the type of the field changed to `type_`,
+    or None when it already has that type.
+    """
+
+    assert field.type is not None
+    old_type = field.type
+    suffix = ''
+    if old_type.endswith(OPTIONAL_SUFFIX):
+        old_type = old_type[:-len(OPTIONAL_SUFFIX)]
+        suffix = OPTIONAL_SUFFIX
+
+    if _comparable(old_type) == _comparable(type_):
+        return None
+    return field.retyped(f'{_normalize(type_)}{suffix}')
+
+
+def _param_lines(
+    docstring: Docstring,
+    name: str,
+    type_: str,
+    description: str,
+) -> list[str]:
+
+    type_ = _normalize(type_)
+    indent = docstring.indent
+    if docstring.style == STYLE_RST:
+        return [
+            f'{indent}:param {name}: {description}',
+            f'{indent}:type {name}: {type_}',
+        ]
+    elif docstring.style == STYLE_GOOGLE:
+        return [f'{indent}{name} ({type_}): {description}']
+    else:
+        return [
+            f'{indent}{name} : {type_}',
+            f'{docstring.description_indent}{description}',
+        ]
+
+
+def _placeholder(style: str, name: str) -> str:
+    if style == STYLE_GOOGLE:
+        return GOOGLE_ARG_PLACEHOLDER
+    elif style == STYLE_NUMPY:
+        return NUMPY_ARG_PLACEHOLDER
+    else:
+        return f'[{name} description]'
+
+
+def _block_end(field: Field) -> int:
+    # The type of a rst parameter is on a line of its own.
+    if field.type_line is not None:
+        return max(field.end, field.type_line + 1)
+    return field.end
+
+
+def _replacements(
+    n: int,
+    deleted: set[int],
+    replaced: dict[int, str],
+    inserted: dict[int, list[str]],
+) -> list[REPLACEMENT]:
+    """
+    Combines the changes of single lines into the replacements of
+    ranges of consecutive lines.
+    """
+
+    replacements: list[REPLACEMENT] = []
+    for i in range(n + 1):
+        changed = i in deleted or i in replaced
+        if i not in inserted and not changed:
+            continue
+
+        if replacements and replacements[-1][1] == i:
+            start, _, new_lines = replacements.pop()
+        else:
+            start, new_lines = i, []
+        new_lines.extend(inserted.get(i, ()))
+        if i in replaced and i not in deleted:
+            new_lines.append(replaced[i])
+        replacements.append((start, i + 1 if changed else i, new_lines))
+
+    return replacements
+
+
+def sync_docstring(
+    lines: Sequence[str],
+    fn_types: FunctionTypes,
+    has_kwargs: bool = False,
+) -> list[REPLACEMENT]:
+    """
+    Returns the replacements of the lines of a docstring (from the line
+    of the opening quotes to the line of the closing quotes) that make
+    its parameters and its return type match `fn_types`.
+
+    Only the parameters of the main section (like `Args`) are added and
+    removed, the parameters of the other sections (like `Keyword Args`)
+    are only retyped. Nothing is removed when the function takes
+    `**kwargs` (`has_kwargs`), which the parameters may document.
+
+    Only docstrings with the closing quotes on a line of their own are
+    updated, and the first line is never changed, so the quotes are
+    always kept.
+    """
+
+    if len(lines) < 3 or lines[-1].strip() not in CLOSING_QUOTES:
+        return []
+    # The lines between the quotes, so the line numbers are off by one.
+    docstring = parse_docstring(lines[1:-1])
+    if docstring is None:
+        return []
+
+    deleted: set[int] = set()
+    replaced: dict[int, str] = {}
+    inserted: dict[int, list[str]] = {}
+
+    types = dict(fn_types.args)
+    params = {field.name.lstrip('*'): field for field in docstring.params}
+    fields = {
+        field.name.lstrip('*'): field for field in docstring.other_params
+    }
+    fields.update(params)
+
+    # Retyped parameters.
+    for name, field in fields.items():
+        type_ = types.get(name)
+        if field.type_line is not None and type_ is not None:
+            line = _retyped(field, type_)
+            if line is not None:
+                replaced[field.type_line + 1] = line
+
+    # Removed parameters.
+    kept: list[Field] = []
+    for k, field in enumerate(docstring.params):
+        if field.name.lstrip('*') in types:
+            kept.append(field)
+            continue
+        if has_kwargs:
+            # It may document what is passed in `**kwargs`.
+            continue
+
+        # The lines between the parameter and the next (or the previous
+        # for the last one) are removed as well.
+        if k + 1 < len(docstring.params):
+            start, end = field.start, docstring.params[k + 1].start
+        elif k > 0:
+            start = _block_end(docstring.params[k - 1])
+            end = _block_end(field)
+        else:
+            start, end = field.start, _block_end(field)
+        deleted.update(range(start + 1, end + 1))
+        if field.type_line is not None:
+            deleted.add(field.type_line + 1)
+
+    # Added parameters, after the documented parameter that comes before
+    # them in the signature (or before the first documented parameter).
+    added = False
+    previous: Optional[Field] = None
+    for name, type_ in fn_types.args:
+        if not type_:
+            # `self` and `cls` are not documented.
+            continue
+        if name in params:
+            previous = params[name]
+            continue
+        elif name in fields:
+            # Documented in another section.
+            continue
+
+        if previous is not None:
+            i = _block_end(previous)
+        elif kept:
+            i = kept[0].start
+        elif docstring.add_line is not None:
+            i = docstring.add_line
+            if docstring.add_replaces:
+                deleted.add(i + 1)
+        else:
+            # There is no place for the parameters.
+            break
+
+        description = fn_types.descriptions.get(
+            name, _placeholder(docstring.style, name),
+        )
+        inserted.setdefault(i + 1, []).extend(
+            _param_lines(docstring, name, type_, description),
+        )
+        added = True
+
+    if docstring.params and not kept and not added:
+        if docstring.style != STYLE_RST:
+            # Like the generated docstrings of functions without arguments.
+            first = docstring.params[0].start + 1
+            inserted[first] = [f'{docstring.indent}{NO_ARGUMENTS}']
+
+    returns = docstring.returns
+    if (
+        returns is not None and
+        returns.type is not None and
+        returns.type_line is not None and
+        _is_type(returns.type)
+    ):
+        line = _retyped(returns, fn_types.returns)
+        if line is not None:
+            replaced[returns.type_line + 1] = line
+
+    return _replacements(len(lines), deleted, replaced, inserted)
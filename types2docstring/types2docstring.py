@@ -1,84 +1,344 @@
 from __future__ import annotations
 
 import argparse
+import array
 import ast
+import codecs
+import collections
+import contextlib
+import functools
+import io
+import itertools
+import os
+import re
+import sys
+from typing import BinaryIO
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
+from typing import NamedTuple
 from typing import Optional
 from typing import Sequence
+from typing import TYPE_CHECKING
 from typing import Union
 
 from tokenize_rt import Offset
-from tokenize_rt import reversed_enumerate
 from tokenize_rt import src_to_tokens
 from tokenize_rt import Token
-from tokenize_rt import tokens_to_src
 
+from types2docstring import _discovery
 from types2docstring._helpers import DOCSTRING_TYPES
 from types2docstring._helpers import FunctionTypes
+from types2docstring._helpers import render_docstrings
+from types2docstring._helpers import shared_cache
+from types2docstring._helpers import shared_cache_counts
+from types2docstring._stats import DEFAULT_TOP_FILES
+from types2docstring._stats import FileStats
+from types2docstring._stats import RunStats
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from types2docstring import _git
 
 CLASS_METHOD_VARIABLES = ('self', 'cls')
+FUNCTION_NODE = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+# Descriptions of the arguments by (name, annotation), see `_index`.
+DESCRIPTIONS = Mapping[tuple[str, str], str]
+# What to do with files that would be rewritten.
+MODE_WRITE = 'write'
+MODE_CHECK = 'check'
+MODE_DIFF = 'diff'
+MODE_JSON = 'json'
+MODE_LSP = 'lsp'
+# The modes that print the changes, see `_output.FORMATTERS`.
+OUTPUT_MODES = (MODE_DIFF, MODE_JSON, MODE_LSP)
 
+# Maximum number of bytes read from stdin at once.
+STDIN_READ_SIZE = 64 * 1024
+# Number of files that are sent to a process at once.
+CHUNK_SIZE = 8
+# Files of at least this many bytes are always rewritten in the low memory
+# mode (see `_fix_file_low_memory`).
+LOW_MEMORY_FILE_SIZE = 32 * 1024 * 1024
 
-def _node_to_annotation(
-    node: Union[ast.Subscript, ast.BinOp],
-    tokens: list[Token],
-) -> str:
+NEWLINE_RE = re.compile(r'\r\n?|\n')
+# The coding cookie of PEP 263.
+CODING_RE = re.compile(rb'^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)')
+
+OPENING_BRACKETS = ('(', '[', '{')
+CLOSING_BRACKETS = (')', ']', '}')
+
+
+class _FileError(NamedTuple):
+    # The name of the exception, e.g. `SyntaxError`.
+    kind: str
+    message: str
+
+
+class _FileResult(NamedTuple):
+    filename: str
+    changed: bool
+    # Text to report for the file, e.g. the diff in `MODE_DIFF`
+    # (see `_output`).
+    output: str = ''
+    stats: Optional[FileStats] = None
+    # Why the file could not be rewritten (see `_rewrite_isolated`).
+    error: Optional[_FileError] = None
+
+
+class Edit(NamedTuple):
+    """
+    The insertion of a docstring into the source, or the update of the
+    lines of an existing docstring (see `sync_docstring`).
+
+    Lines start at 1 and columns (in characters) at 0, the range is
+    empty for inserted docstrings, and covers the replaced lines (up to
+    column 0 of the line after them) for updated docstrings.
+    """
+    line: int
+    column: int
+    end_line: int
+    end_column: int
+    text: str
+    # Name of the function the docstring is for.
+    function: str
+
+
+class RewriteResult(NamedTuple):
+    src: str
+    edits: list[Edit]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.edits)
+
+
+class _Span(NamedTuple):
+    # Lines start at 1, the columns are byte offsets in the line
+    # (like the positions of the AST nodes).
+    line: int
+    column: int
+    end_line: int
+    end_column: int
+
+
+class _Signature(NamedTuple):
+    """
+    What is needed to add a docstring to a function without its AST.
+    """
+    # The spans of the annotations of the arguments (None for `self`
+    # and `cls` of methods).
+    args: list[tuple[str, Optional[_Span]]]
+    returns: _Span
+    # Position of the first statement of the body.
+    body_line: int
+    body_column: int
+
+
+class _TokenIndex(NamedTuple):
+    # Maps the offset of every (non empty) token to its position in the
+    # token list, so nodes can be found without scanning all the tokens.
+    positions: dict[Offset, int]
+    # Maps the position of every opening bracket to the position of its
+    # matching closing bracket (and the other way around).
+    brackets: dict[int, int]
+
+
+def _build_token_index(tokens: list[Token]) -> _TokenIndex:
 
-    node_offset = Offset(node.lineno, node.col_offset)
-    annotation = ''
+    positions: dict[Offset, int] = {}
+    brackets: dict[int, int] = {}
+    stack: list[int] = []
 
     for i, token in enumerate(tokens):
-        if token.offset == node_offset:
-            depth = 0
-            j = i
-            # depth indicates wether we are in a type annotation.
-            # When reaching ',' and depth == 0, it means that
-            # the end of the type annotation is reached.
-            # The `)`indicates that the end of the parameters declaration
-            # is reached.
-            # `:` is for return types and means that the end of the
-            # function declaration is reached.
-            # `=` means that there is a default argument, so after the
-            # equal there is no type annotation.
-            while depth or tokens[j].src not in ',):=':
-                if tokens[j].src in '[':
-                    depth += 1
-                elif tokens[j].src in ']':
-                    depth -= 1
-                annotation += tokens[j].src
-                j += 1
-
-    # The annotation sometimes may include trailing whitespace
-    # it is easier to remove it here then change how the
-    # annotation is parsed.
-    return annotation.strip()
-
-
-def _is_method(node: ast.FunctionDef) -> bool:
-
-    if hasattr(node, 'parent'):
-        parent = getattr(node, 'parent')
-        if isinstance(parent, ast.ClassDef):
+        if not token.src:
+            continue
+
+        positions.setdefault(token.offset, i)
+
+        if token.name != 'OP':
+            continue
+        if token.src in OPENING_BRACKETS:
+            stack.append(i)
+        elif token.src in CLOSING_BRACKETS and stack:
+            start = stack.pop()
+            brackets[start] = i
+            brackets[i] = start
+
+    return _TokenIndex(positions=positions, brackets=brackets)
+
+
+def _find_outside_brackets(
+    i: int,
+    tokens: list[Token],
+    index: _TokenIndex,
+    stop: tuple[str, ...],
+) -> int:
+    """
+    Returns the position of the first token (starting at `i`) that is
+    in `stop` and is not nested inside of brackets.
+
+    Bracketed spans are skipped in one step using the index.
+    """
+
+    while tokens[i].src not in stop:
+        if tokens[i].name == 'OP' and tokens[i].src in OPENING_BRACKETS:
+            i = index.brackets[i]
+        i += 1
+
+    return i
+
+
+def _node_span(node: ast.expr) -> _Span:
+
+    assert node.end_lineno is not None and node.end_col_offset is not None
+    return _Span(
+        node.lineno, node.col_offset, node.end_lineno, node.end_col_offset,
+    )
+
+
+def _char_column(line: str, column: int) -> int:
+    """
+    Returns the character offset of the byte offset `column` (like the
+    columns of the AST and the tokens) in the line.
+    """
+
+    if line.isascii():
+        return column
+    return len(line.encode()[:column].decode())
+
+
+def _segment(lines: Sequence[str], span: _Span) -> str:
+    """
+    Returns the source of the span, in time linear in its length.
+    """
+
+    first = lines[span.line - 1]
+    start = _char_column(first, span.column)
+    if span.line == span.end_line:
+        return first[start:_char_column(first, span.end_column)]
+
+    last = lines[span.end_line - 1]
+    return '\n'.join((
+        first[start:],
+        *lines[span.line:span.end_line - 1],
+        last[:_char_column(last, span.end_column)],
+    ))
+
+
+def _node_to_annotation(node: ast.expr, lines: Sequence[str]) -> str:
+    """
+    Returns the source of the annotation `node`, any kind of expression
+    is supported (e.g. `Foo`, `typing.Any`, `'Foo'`, `None` or `X | Y`).
+
+    `lines` are the lines of the source, without their line endings.
+    """
+
+    if isinstance(node, ast.Name):
+        return node.id
+
+    return _intern_annotation(_segment(lines, _node_span(node)))
+
+
+@shared_cache('annotation')
+def _intern_annotation(annotation: str) -> str:
+    # The same annotations are used all over a code base, caching them
+    # means every one of them is stored only once.
+    return annotation
+
+
+def _is_decorated_with(node: FUNCTION_NODE, name: str) -> bool:
+
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name) and decorator.id == name:
+            return True
+        if isinstance(decorator, ast.Attribute) and decorator.attr == name:
             return True
 
     return False
 
 
-def _is_return_annotated(node: ast.FunctionDef) -> bool:
-    return (
-        isinstance(node.returns, ast.Name) or
-        isinstance(node.returns, ast.Subscript)
-    )
+def _is_method(node: FUNCTION_NODE, scope: Optional[ast.AST]) -> bool:
+    """
+    Returns whether the function, defined in `scope` (the enclosing
+    class or function), gets `self` or `cls` as first argument.
+    """
+
+    if not isinstance(scope, ast.ClassDef):
+        return False
+
+    # `self` and `cls` are normal arguments for static methods.
+    return not _is_decorated_with(node, 'staticmethod')
+
+
+class _Function(NamedTuple):
+    node: FUNCTION_NODE
+    is_method: bool
+
+
+class _FunctionCollector(ast.NodeVisitor):
+    """
+    Collects all the functions of a tree in a single pass,
+    keeping track of the class or function they are defined in.
+    """
+
+    def __init__(self) -> None:
+        self.functions: list[_Function] = []
+        self._scopes: list[ast.AST] = []
+
+    def _visit_scope(self, node: ast.AST) -> None:
+        self._scopes.append(node)
+        self.generic_visit(node)
+        self._scopes.pop()
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._visit_scope(node)
+
+    def visit_FunctionDef(self, node: FUNCTION_NODE) -> None:
+        scope = self._scopes[-1] if self._scopes else None
+        self.functions.append(_Function(node, _is_method(node, scope)))
+        self._visit_scope(node)
 
+    visit_AsyncFunctionDef = visit_FunctionDef
 
-def _node_fully_annotated(node: ast.FunctionDef) -> bool:
+
+def _is_return_annotated(node: FUNCTION_NODE) -> bool:
+    return node.returns is not None
+
+
+def _function_args(node: FUNCTION_NODE) -> list[ast.arg]:
+    """
+    Returns the arguments of the function, in the order they are declared.
+
+    Only the signature is read, so the arguments of nested functions
+    and lambdas are not included.
+    """
+
+    args = node.args
+    fn_args = [*args.posonlyargs, *args.args]
+    if args.vararg is not None:
+        fn_args.append(args.vararg)
+    fn_args.extend(args.kwonlyargs)
+    if args.kwarg is not None:
+        fn_args.append(args.kwarg)
+
+    return fn_args
+
+
+def _node_fully_annotated(
+    node: FUNCTION_NODE,
+    is_method: bool = False,
+) -> bool:
 
     if not _is_return_annotated(node):
         return False
 
-    for child in ast.walk(node):
-        if isinstance(child, ast.arg) and child.annotation is None:
+    for arg in _function_args(node):
+        if arg.annotation is None:
             # Allows self and cls to be untyped for methods
-            if _is_method(node) and child.arg in CLASS_METHOD_VARIABLES:
+            if is_method and arg.arg in CLASS_METHOD_VARIABLES:
                 continue
 
             return False
@@ -87,141 +347,1331 @@ def _node_fully_annotated(node: ast.FunctionDef) -> bool:
 
 
 def _get_args_and_types(
-    node: ast.FunctionDef,
-    tokens: list[Token],
+    node: FUNCTION_NODE,
+    lines: Sequence[str],
+    is_method: bool = False,
 ) -> FunctionTypes:
 
-    assert _is_return_annotated(node)
+    assert node.returns is not None
 
     arg_annotations: list[tuple[str, str | None]] = []
-    for child in ast.walk(node):
-
-        if isinstance(child, ast.arg):
-            if _is_method(node) and child.arg in CLASS_METHOD_VARIABLES:
-                # `self` and `cls` are not typed..
-                arg_annotations.append((child.arg, None))
-            elif (
-                isinstance(child.annotation, ast.Subscript) or
-                isinstance(child.annotation, ast.BinOp)
-            ):
-                arg_annotations.append(
-                    (
-                        child.arg,
-                        _node_to_annotation(
-                            child.annotation,
-                            tokens,
-                        ),
-                    ),
-                )
-            else:
-                assert child.annotation is not None, (
-                    'annotation cannot be None'
-                )
-                assert hasattr(child.annotation, 'id'), 'annotation needs id'
-                arg_annotations.append(
-                    (child.arg, getattr(child.annotation, 'id')),
-                )
+    for child in _function_args(node):
 
-    return_type = ''
-    if isinstance(node.returns, ast.Subscript):
-        return_type = _node_to_annotation(node.returns, tokens)
-    else:
-        assert node.returns is not None and hasattr(node.returns, 'id')
-        return_type = getattr(node.returns, 'id')
+        if is_method and child.arg in CLASS_METHOD_VARIABLES:
+            # `self` and `cls` are not typed..
+            arg_annotations.append((child.arg, None))
+        else:
+            assert child.annotation is not None, (
+                'annotation cannot be None'
+            )
+            arg_annotations.append(
+                (child.arg, _node_to_annotation(child.annotation, lines)),
+            )
 
     return FunctionTypes(
         args=arg_annotations,
-        returns=return_type,
+        returns=_node_to_annotation(node.returns, lines),
     )
 
 
-def _generate_docstring(
-    docstring_type: str,
+@contextlib.contextmanager
+def _count_shared_caches(stats: FileStats) -> Iterator[None]:
+    """
+    Counts the hits and misses of the shared caches in the block.
+    """
+
+    before = shared_cache_counts()
+    yield
+    for counter, n in shared_cache_counts().items():
+        if n > before[counter]:
+            stats.count(counter, n - before[counter])
+
+
+def _describe(
     fn_types: FunctionTypes,
-    indent='',
-) -> str:
+    descriptions: DESCRIPTIONS,
+) -> FunctionTypes:
+
+    described = {
+        name: descriptions[name, type_]
+        for name, type_ in fn_types.args
+        if type_ is not None and (name, type_) in descriptions
+    }
+    if not described:
+        return fn_types
+    return fn_types._replace(descriptions=described)
+
+
+def _generate_docstrings(
+    docstring_type: str,
+    functions: list[tuple[FunctionTypes, str]],
+    descriptions: Optional[DESCRIPTIONS] = None,
+) -> list[str]:
 
-    # TODO: Raise an error
     if docstring_type not in DOCSTRING_TYPES:
-        print(f'ERROR: Could not find docstring type: {docstring_type}.')
-        exit(1)
+        raise ValueError(f'Unknown docstring type: {docstring_type}')
+
+    if descriptions:
+        functions = [
+            (_describe(fn_types, descriptions), indent)
+            for fn_types, indent in functions
+        ]
+
+    return render_docstrings(docstring_type, functions)
+
+
+def _may_need_docstrings(data: bytes) -> bool:
+    """
+    Cheap check on the raw bytes of a file to reject files that
+    cannot contain a function that needs a docstring.
+
+    Only functions with an annotated return type get a docstring,
+    so both `def` and `->` have to be present.
+    """
+
+    return b'def' in data and b'->' in data
+
+
+def _decode_contents(data: bytes) -> str:
+    # Decode the same way as opening the file in text mode would.
+    return io.StringIO(data.decode('UTF-8'), newline=None).read()
+
+
+@contextlib.contextmanager
+def _replace_atomic(filename: str) -> Iterator[int]:
+    """
+    Yields the file descriptor of a temporary file next to `filename`,
+    which is moved in place of it when the block succeeds, so the file
+    is never half written.
+
+    A symlink is followed, so its target is replaced rather than the link.
+    A file with hard links is written in place instead, replacing it
+    would leave the other links with the old contents.
+    """
+    import shutil
+    import tempfile
+
+    filename = os.path.realpath(filename)
+    if os.stat(filename).st_nlink > 1:
+        yield os.open(filename, os.O_WRONLY | os.O_TRUNC)
+        return
+
+    dirname = os.path.dirname(filename)
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=dirname,
+        prefix=f'.{os.path.basename(filename)}.',
+        suffix='.tmp',
+    )
+    try:
+        yield fd
+        shutil.copymode(filename, tmp_filename)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+
+
+def _write_atomic(filename: str, contents: str) -> None:
+
+    with _replace_atomic(filename) as fd:
+        with open(fd, 'w', encoding='UTF-8') as f:
+            f.write(contents)
+
+
+def _find_candidates(
+    tree: ast.AST,
+    stats: Optional[FileStats] = None,
+    documented: Optional[list[_Function]] = None,
+) -> list[_Function]:
+    """
+    Returns the functions of the tree that should get a docstring.
+
+    The fully annotated functions that already have a docstring are
+    added to `documented`, when it is given.
+    """
+
+    collector = _FunctionCollector()
+    collector.visit(tree)
+
+    candidates = []
+    n_documented = not_annotated = 0
+    for fn in collector.functions:
+        if not _node_fully_annotated(fn.node, fn.is_method):
+            not_annotated += 1
+        elif ast.get_docstring(fn.node) is not None:
+            n_documented += 1
+            if documented is not None:
+                documented.append(fn)
+        else:
+            candidates.append(fn)
+
+    if stats is not None:
+        stats.count('functions_scanned', len(collector.functions))
+        stats.count('functions_skipped_not_annotated', not_annotated)
+        stats.count('functions_skipped_documented', n_documented)
+
+    return candidates
+
+
+class _Insertion(NamedTuple):
+    # Where the docstring is inserted, right after the `:` that ends the
+    # declaration (the line starts at 1, the column is in characters).
+    line: int
+    column: int
+    # The indentation of the body.
+    indent: str
+
+
+def _simple_insertion(
+    node: FUNCTION_NODE,
+    lines: Sequence[str],
+) -> Optional[_Insertion]:
+    """
+    Returns where the docstring of the function is inserted, using only
+    the positions of the nodes, when the return annotation is directly
+    followed by the `:` and the end of the line.
+
+    Returns None when there is anything else (e.g. brackets around the
+    annotation, a comment, a line continuation or a form feed), then the
+    tokens are needed to find the `:`.
+    """
+
+    returns = node.returns
+    assert returns is not None and returns.end_lineno is not None
+    assert returns.end_col_offset is not None
+
+    line = lines[returns.end_lineno - 1]
+    end = _char_column(line, returns.end_col_offset)
+    if line[end:].strip() != ':' or '\f' in line:
+        return None
+
+    body = node.body[0]
+    body_line = lines[body.lineno - 1]
+    indent = body_line[:_char_column(body_line, body.col_offset)]
+    if '\f' in indent:
+        return None
+
+    return _Insertion(
+        line=returns.end_lineno,
+        column=line.index(':', end) + 1,
+        indent=indent,
+    )
+
+
+def _token_insertion(
+    node: FUNCTION_NODE,
+    tokens: list[Token],
+    index: _TokenIndex,
+    lines: Sequence[str],
+) -> Optional[_Insertion]:
+    """
+    Returns where the docstring of the function is inserted, for any
+    declaration.
+
+    Returns None when the body is on the same (logical) line as the
+    declaration, there is no room for a docstring without moving it.
+    """
+
+    # The end of the function declaration is the first `:`
+    # that is not inside of the parameters (or any other brackets).
+    offset = Offset(node.lineno, node.col_offset)
+    j = _find_outside_brackets(index.positions[offset], tokens, index, (':',))
+
+    k = j + 1
+    while tokens[k].name in ('UNIMPORTANT_WS', 'COMMENT'):
+        k += 1
+    if tokens[k].name != 'NEWLINE':
+        return None
+
+    # The body is a block, so the next INDENT token gives the
+    # indentation level of the function.
+    while not tokens[k].name == 'INDENT':
+        k += 1
+
+    line = tokens[j].line
+    # The offsets of the tokens are in bytes, but the edits use
+    # characters.
+    column = _char_column(lines[line - 1], tokens[j].utf8_byte_offset + 1)
+    return _Insertion(line=line, column=column, indent=tokens[k].src)
+
+
+def _find_insertions(
+    contents: str,
+    lines: Sequence[str],
+    candidates: Sequence[_Function],
+    stats: FileStats,
+) -> list[Optional[_Insertion]]:
+    """
+    Returns where the docstrings of the candidates are inserted, None
+    for the functions that have their body on the line of the
+    declaration.
+
+    The file is only tokenized when a declaration is not simple enough
+    to do without (see `_simple_insertion`).
+    """
+
+    with stats.time('collect'):
+        simple = [_simple_insertion(node, lines) for node, _ in candidates]
+    if None not in simple:
+        return simple
+
+    with stats.time('tokenize'):
+        tokens = src_to_tokens(contents)
+        index = _build_token_index(tokens)
+
+        insertions: list[Optional[_Insertion]] = []
+        for (node, _), insertion in zip(candidates, simple):
+            if insertion is None:
+                insertion = _token_insertion(node, tokens, index, lines)
+            insertions.append(insertion)
+    stats.count('functions_tokenized', simple.count(None))
+
+    return insertions
+
+
+def _docstring_edits(
+    candidates: Sequence[_Function],
+    insertions: Sequence[_Insertion],
+    docstrings: list[str],
+) -> list[Edit]:
+
+    return [
+        Edit(
+            line=insertion.line,
+            column=insertion.column,
+            end_line=insertion.line,
+            end_column=insertion.column,
+            text=docstring,
+            function=node.name,
+        )
+        for (node, _), insertion, docstring in zip(
+            candidates, insertions, docstrings,
+        )
+    ]
+
+
+def _sync_edits(
+    lines: Sequence[str],
+    documented: Sequence[_Function],
+    stats: FileStats,
+) -> list[Edit]:
+    """
+    Returns the edits that update the parameters and return types of
+    the docstrings of the `documented` functions to their signatures.
+    """
+
+    # Only imported when it is used, so the docstring types stay lazy.
+    from types2docstring._sync import sync_docstring
+
+    edits = []
+
+    for node, is_method in documented:
+        docstring = node.body[0]
+        assert node.returns is not None
+        if docstring.lineno <= getattr(node.returns, 'end_lineno', 0):
+            # The docstring is on the line of the signature.
+            continue
+        assert docstring.end_lineno is not None
+
+        fn_types = _get_args_and_types(node, lines, is_method)
+        # Line numbers of the replacements start at the opening quotes.
+        first = docstring.lineno
+        replacements = sync_docstring(
+            lines[first - 1:docstring.end_lineno],
+            fn_types,
+            has_kwargs=node.args.kwarg is not None,
+        )
+        for start, end, new_lines in replacements:
+            edits.append(
+                Edit(
+                    line=first + start,
+                    column=0,
+                    end_line=first + end,
+                    end_column=0,
+                    text=''.join(f'{line}\n' for line in new_lines),
+                    function=node.name,
+                ),
+            )
+        if replacements:
+            stats.count('functions_synced')
+
+    return edits
+
+
+def _apply_edits(lines: Sequence[str], edits: Sequence[Edit]) -> str:
+    """
+    Returns the source with the (not overlapping) edits applied.
+    """
+
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+    contents = '\n'.join(lines)
+
+    parts = []
+    position = 0
+    for edit in sorted(edits):
+        start = offsets[edit.line - 1] + edit.column
+        parts.append(contents[position:start])
+        parts.append(edit.text)
+        position = offsets[edit.end_line - 1] + edit.end_column
+    parts.append(contents[position:])
+
+    return ''.join(parts)
+
+
+def _only_changed(
+    candidates: list[_Function],
+    changed_lines: Sequence[_git.LINE_RANGE],
+) -> list[_Function]:
+    """
+    Returns the candidates whose signature overlaps the changed lines.
+    """
+    from types2docstring import _git
+
+    starts = [start for start, _ in changed_lines]
+    return [
+        fn for fn in candidates
+        if _git.overlaps(
+            fn.node.lineno,
+            # Candidates always have a return annotation, which is the
+            # end of the signature.
+            getattr(fn.node.returns, 'end_lineno', fn.node.lineno),
+            changed_lines,
+            starts,
+        )
+    ]
+
+
+def _select_candidates(
+    tree: ast.AST,
+    stats: FileStats,
+    changed_lines: Optional[Sequence[_git.LINE_RANGE]] = None,
+    documented: Optional[list[_Function]] = None,
+) -> list[_Function]:
+
+    candidates = _find_candidates(tree, stats, documented)
+    if changed_lines is not None:
+        changed = _only_changed(candidates, changed_lines)
+        stats.count(
+            'functions_skipped_unchanged',
+            len(candidates) - len(changed),
+        )
+        candidates = changed
+        if documented:
+            # Only the docstrings of the changed signatures are synced.
+            documented[:] = _only_changed(documented, changed_lines)
+
+    return candidates
+
+
+def _fix_contents(
+    contents: str,
+    docstring_type: str,
+    stats: Optional[FileStats] = None,
+    changed_lines: Optional[Sequence[_git.LINE_RANGE]] = None,
+    descriptions: Optional[DESCRIPTIONS] = None,
+    sync: bool = False,
+) -> RewriteResult:
+
+    if stats is None:
+        stats = FileStats()
+
+    with stats.time('parse'):
+        tree = ast.parse(contents)
+    documented: Optional[list[_Function]] = [] if sync else None
+    with stats.time('collect'):
+        candidates = _select_candidates(
+            tree, stats, changed_lines, documented,
+        )
+
+    if not candidates and not documented:
+        return RewriteResult(contents, [])
+
+    # The annotations are sliced out of the lines by the positions
+    # of their nodes.
+    lines = contents.split('\n')
+    edits: list[Edit] = []
+
+    if documented:
+        with _count_shared_caches(stats), stats.time('sync'):
+            edits.extend(_sync_edits(lines, documented, stats))
+
+    if candidates:
+        found = _find_insertions(contents, lines, candidates, stats)
+        candidates = [fn for fn, ins in zip(candidates, found) if ins]
+        insertions = [ins for ins in found if ins is not None]
+
+        with _count_shared_caches(stats):
+            with stats.time('annotations'):
+                functions = [
+                    (_get_args_and_types(node, lines, is_method), ins.indent)
+                    for (node, is_method), ins in zip(candidates, insertions)
+                ]
+            with stats.time('render'):
+                docstrings = _generate_docstrings(
+                    docstring_type, functions, descriptions,
+                )
+        stats.count('functions_rewritten', len(docstrings))
 
-    docstring = DOCSTRING_TYPES[docstring_type](fn_types, indent)
+        edits.extend(_docstring_edits(candidates, insertions, docstrings))
 
-    return docstring
+    if not edits:
+        return RewriteResult(contents, [])
 
+    with stats.time('write'):
+        new_contents = _apply_edits(lines, edits)
 
-def _rewrite_file(filename: str, docstring_type: str) -> int:
+    return RewriteResult(new_contents, sorted(edits))
 
-    with open(filename, encoding='UTF-8') as file:
-        contents = file.read()
 
-    tree = ast.parse(contents)
-    tokens = src_to_tokens(contents)
+def rewrite_source(
+    src: str,
+    style: str = 'rst',
+    sync: bool = False,
+) -> RewriteResult:
+    """
+    Adds docstrings of the given style to all the fully annotated
+    functions in `src` that do not have a docstring yet.
 
-    found: dict[Offset, FunctionTypes] = {}
+    With `sync` the parameters and return types of the existing
+    docstrings are also updated to the signatures of their functions.
 
-    for node in ast.walk(tree):
+    Returns the new source and the edits that were made to it.
+    Nothing is read from or written to disk, so this can be called
+    from long running processes (and from multiple threads).
 
-        for child in ast.iter_child_nodes(node):
-            setattr(child, 'parent', node)
+    The new source and the edits use the first newline of `src` (LF,
+    CRLF or CR), the other newlines of a changed source are converted
+    to it.
+    """
 
-        if (
-            isinstance(node, ast.FunctionDef) and
-            _node_fully_annotated(node) and
-            ast.get_docstring(node) is None
+    if style not in DOCSTRING_TYPES:
+        raise ValueError(f'Unknown docstring type: {style}')
+
+    if '\r' not in src:
+        return _fix_contents(src, style, sync=sync)
+
+    # The lines are split on `\n` only.
+    match = NEWLINE_RE.search(src)
+    assert match is not None
+    newline = match[0]
+    result = _fix_contents(NEWLINE_RE.sub('\n', src), style, sync=sync)
+    if not result.changed:
+        return RewriteResult(src, [])
+    return RewriteResult(
+        result.src.replace('\n', newline),
+        [
+            edit._replace(text=edit.text.replace('\n', newline))
+            for edit in result.edits
+        ],
+    )
+
+
+def _signature(fn: _Function) -> _Signature:
+
+    node, is_method = fn
+    args: list[tuple[str, Optional[_Span]]] = []
+    for arg in _function_args(node):
+        if is_method and arg.arg in CLASS_METHOD_VARIABLES:
+            args.append((arg.arg, None))
+        else:
+            assert arg.annotation is not None
+            args.append((arg.arg, _node_span(arg.annotation)))
+
+    assert node.returns is not None
+    return _Signature(
+        args=args,
+        returns=_node_span(node.returns),
+        body_line=node.body[0].lineno,
+        body_column=node.body[0].col_offset,
+    )
+
+
+def _low_memory_signatures(
+    data: bytes,
+    stats: FileStats,
+    changed_lines: Optional[Sequence[_git.LINE_RANGE]] = None,
+) -> list[_Signature]:
+
+    with stats.time('parse'):
+        tree = ast.parse(data)
+    with stats.time('collect'):
+        candidates = _select_candidates(tree, stats, changed_lines)
+        # Only the signatures are returned, so the tree is released
+        # before the file is rewritten.
+        return [_signature(fn) for fn in candidates]
+
+
+def _line_offsets(data: bytes) -> array.array[int]:
+    """
+    Returns the offset of the start of every line.
+    """
+
+    offsets = array.array('Q', [0])
+    i = data.find(b'\n')
+    while i != -1:
+        offsets.append(i + 1)
+        i = data.find(b'\n', i + 1)
+
+    return offsets
+
+
+def _find_colon(data: bytes, i: int) -> int:
+    """
+    Returns the offset of the `:` that ends a function declaration,
+    starting at the end of its return annotation.
+
+    Only closing brackets, whitespace, line continuations and comments
+    can be in between.
+    """
+
+    while data[i:i + 1] != b':':
+        if i >= len(data):
+            raise ValueError('the end of the function declaration is missing')
+        if data[i:i + 1] == b'#':
+            i = data.index(b'\n', i)
+        i += 1
+
+    return i
+
+
+def _block_follows(data: bytes, colon: int) -> bool:
+    """
+    Returns whether the `:` at the end of a declaration ends its line,
+    only followed by whitespace or a comment.
+    """
+
+    end = data.find(b'\n', colon)
+    if end == -1:
+        end = len(data)
+    rest = data[colon + 1:end].strip(b' \t\f')
+    return not rest or rest.startswith(b'#')
+
+
+def _is_utf8(data: bytes) -> bool:
+    """
+    Returns whether the source is decoded as UTF-8, which is the case
+    unless a coding cookie in its first two lines says otherwise.
+    """
+
+    for line in data.split(b'\n', 2)[:2]:
+        match = CODING_RE.match(line)
+        if match is not None:
+            try:
+                return codecs.lookup(match[1].decode()).name == 'utf-8'
+            except LookupError:
+                return False
+        if not line.lstrip().startswith(b'#'):
+            # The cookie can only be in the second line after a comment.
+            break
+
+    return True
+
+
+def _can_splice(data: bytes) -> bool:
+    # The offsets of the AST are only offsets in the raw data when
+    # decoding it does not change anything before them.
+    return (
+        not data.startswith(codecs.BOM_UTF8) and
+        b'\r' not in data and
+        _is_utf8(data)
+    )
+
+
+def _fix_file_low_memory(
+    filename: str,
+    data: bytes,
+    docstring_type: str,
+    mode: str = MODE_WRITE,
+    stats: Optional[FileStats] = None,
+    changed_lines: Optional[Sequence[_git.LINE_RANGE]] = None,
+    descriptions: Optional[DESCRIPTIONS] = None,
+) -> bool:
+    """
+    Rewrites the file like `_fix_contents` (unless the `mode` is
+    `MODE_CHECK`), for files that are too big to keep the AST, the tokens
+    and multiple copies of the contents in memory at the same time.
+
+    The AST is released once the signatures are collected, no tokens
+    are created and the docstrings are spliced into `data` by offset,
+    streaming the result to a temporary file.
+
+    Returns whether the file needs changes.
+    """
+
+    if stats is None:
+        stats = FileStats(filename)
+
+    signatures = _low_memory_signatures(data, stats, changed_lines)
+    if not signatures:
+        return False
+
+    with _count_shared_caches(stats), stats.time('annotations'):
+        offsets = _line_offsets(data)
+
+        def source(span: _Span) -> str:
+            start = offsets[span.line - 1] + span.column
+            end = offsets[span.end_line - 1] + span.end_column
+            return _intern_annotation(data[start:end].decode())
+
+        colons: list[int] = []
+        functions: list[tuple[FunctionTypes, str]] = []
+        for sig in signatures:
+            returns = sig.returns
+            colon = _find_colon(
+                data, offsets[returns.end_line - 1] + returns.end_column,
+            )
+            if not _block_follows(data, colon):
+                # The body is on the same (logical) line as the
+                # declaration, there is no room for a docstring without
+                # moving it (like in `_token_insertion`).
+                continue
+            body_start = offsets[sig.body_line - 1]
+
+            fn_types = FunctionTypes(
+                args=[
+                    (name, None if span is None else source(span))
+                    for name, span in sig.args
+                ],
+                returns=source(sig.returns),
+            )
+            indent = data[body_start:body_start + sig.body_column].decode()
+            colons.append(colon)
+            functions.append((fn_types, indent))
+
+    if not functions:
+        return False
+
+    with _count_shared_caches(stats), stats.time('render'):
+        docstrings = _generate_docstrings(
+            docstring_type, functions, descriptions,
+        )
+    stats.count('functions_rewritten', len(docstrings))
+
+    if mode == MODE_WRITE:
+        with stats.time('write'):
+            with _replace_atomic(filename) as fd, open(fd, 'wb') as f:
+                view = memoryview(data)
+                start = 0
+                for colon, docstring in zip(colons, docstrings):
+                    f.write(view[start:colon + 1])
+                    f.write(docstring.encode())
+                    start = colon + 1
+                f.write(view[start:])
+
+    return True
+
+
+def _rewrite_file(
+    filename: str,
+    docstring_type: str,
+    mode: str = MODE_WRITE,
+    cache_dir: Optional[str] = None,
+    changes: Optional[Mapping[str, list[_git.LINE_RANGE]]] = None,
+    low_memory: bool = False,
+    index: Optional[str] = None,
+    sync: bool = False,
+) -> _FileResult:
+    """
+    Rewrites the file, or only reports what would change
+    depending on the `mode`.
+
+    When `changes` (the changed lines by filename) is given, only the
+    functions with a changed signature get a docstring.
+
+    The descriptions of the arguments are taken from the `index` file
+    (see `_index`) when it is given.
+
+    With `sync` the existing docstrings are updated to the signatures
+    of their functions as well.
+
+    With `low_memory` (and for files of at least `LOW_MEMORY_FILE_SIZE`
+    bytes) the file is rewritten with `_fix_file_low_memory`, unless the
+    edits are reported (see `_output`) or the docstrings are synced.
+    """
+
+    stats = FileStats(filename)
+
+    changed_lines = None
+    if changes is not None:
+        changed_lines = changes.get(filename, [])
+        # Whether the file needs changes depends on the changed lines,
+        # so the result cannot be cached.
+        cache_dir = None
+
+    with stats.time('read'):
+        with open(filename, 'rb') as file:
+            data = file.read()
+
+    if not _may_need_docstrings(data):
+        stats.count('files_skipped_prefilter')
+        return _FileResult(filename, changed=False, stats=stats)
+
+    key = None
+    if cache_dir is not None:
+        from types2docstring import _cache
+        key = _cache.cache_key(data, docstring_type, sync)
+        if _cache.is_unchanged(cache_dir, key):
+            stats.count('files_skipped_cached')
+            return _FileResult(filename, changed=False, stats=stats)
+
+    descriptions = None
+    if index is not None:
+        # `_index` uses this module, so it can only be imported here.
+        from types2docstring import _index
+        descriptions = _index.load(index)
+
+    if (
+        (low_memory or len(data) >= LOW_MEMORY_FILE_SIZE) and
+        mode in (MODE_WRITE, MODE_CHECK) and
+        not sync and
+        _can_splice(data)
+    ):
+        stats.count('files_low_memory')
+        if not _fix_file_low_memory(
+            filename,
+            data,
+            docstring_type,
+            mode,
+            stats,
+            changed_lines,
+            descriptions,
         ):
-            ft = _get_args_and_types(node, tokens)
-            found[Offset(node.lineno, node.col_offset)] = ft
-
-    for i, token in reversed_enumerate(tokens):
-        if token.src and token.offset in found:
-            depth = 0
-            j = i
-            while depth or tokens[j].src != ':':
-                if tokens[j].src in '({[':
-                    depth += 1
-                elif tokens[j].src in ')]}':
-                    depth -= 1
-                j += 1
-
-            # Assuming that we are at the end of the function
-            # declaration (see code above), the next INDENT token
-            # should give the indentation level of the function
-            k = j
-            while not tokens[k].name == 'INDENT':
-                k += 1
-
-            indent = tokens[k].src
-            docstring = _generate_docstring(
-                docstring_type,
-                found[token.offset],
-                indent=indent,
+            if cache_dir is not None and key is not None:
+                _cache.mark_unchanged(cache_dir, key)
+                stats.count('cache_entries_added')
+            return _FileResult(filename, changed=False, stats=stats)
+
+        # The new contents are not kept in memory, so unlike below they
+        # are not added to the cache.
+        stats.count('files_changed')
+        return _FileResult(filename, changed=True, stats=stats)
+
+    with stats.time('read'):
+        contents = _decode_contents(data)
+    result = _fix_contents(
+        contents, docstring_type, stats, changed_lines, descriptions, sync,
+    )
+
+    if not result.changed:
+        if cache_dir is not None and key is not None:
+            _cache.mark_unchanged(cache_dir, key)
+            stats.count('cache_entries_added')
+        # Not writing the file keeps its mtime, so build caches
+        # that depend on it stay valid.
+        return _FileResult(filename, changed=False, stats=stats)
+
+    stats.count('files_changed')
+    output = ''
+    with stats.time('write'):
+        if mode == MODE_WRITE:
+            _write_atomic(filename, result.src)
+            if cache_dir is not None:
+                # The rewritten file does not need any changes anymore.
+                new_key = _cache.cache_key(
+                    result.src.encode('UTF-8'), docstring_type, sync,
+                )
+                _cache.mark_unchanged(cache_dir, new_key)
+                stats.count('cache_entries_added')
+        elif mode in OUTPUT_MODES:
+            from types2docstring import _output
+            # The output is made from the edits, the new contents are
+            # not needed.
+            output = _output.FORMATTERS[mode](filename, contents, result.edits)
+
+    return _FileResult(filename, changed=True, output=output, stats=stats)
+
+
+def _read_documents(stream: BinaryIO, separator: bytes) -> Iterator[bytes]:
+    """
+    Yields the documents separated by `separator` as soon as they are
+    read completely, so a pipeline does not have to finish first.
+    """
+
+    # The parts of the current document read so far.
+    pending: list[bytes] = []
+    # `read1` returns what is available instead of waiting for a full
+    # block, so a document is handled as soon as its separator arrives.
+    read = getattr(stream, 'read1', stream.read)
+    while True:
+        chunk = read(STDIN_READ_SIZE)
+        if not chunk:
+            break
+
+        first, *rest = chunk.split(separator)
+        pending.append(first)
+        if rest:
+            yield b''.join(pending)
+            *documents, last = rest
+            yield from documents
+            pending = [last]
+
+    # A separator after the last document is optional.
+    if any(pending):
+        yield b''.join(pending)
+
+
+def _rewrite_stdin(
+    docstring_type: str,
+    mode: str,
+    batch: bool,
+    stdin: BinaryIO,
+    stdout: BinaryIO,
+    sync: bool = False,
+    fail_fast: bool = False,
+) -> int:
+    """
+    Rewrites the source read from stdin and writes it to stdout.
+
+    In `batch` mode stdin contains multiple sources, separated by
+    NUL bytes, the results are written separated the same way.
+
+    A source that cannot be rewritten is reported on stderr and written
+    back unchanged, unless `fail_fast` is given. Sources that need no
+    changes are written back byte for byte, and the newlines of the
+    others are kept (see `rewrite_source`).
+    """
+
+    from types2docstring import _output
+
+    if batch:
+        documents = _read_documents(stdin, b'\0')
+    else:
+        documents = iter((stdin.read(),))
+
+    ret = 0
+    errors: collections.Counter[str] = collections.Counter()
+    for data in documents:
+        try:
+            contents = data.decode('UTF-8')
+            result = rewrite_source(contents, docstring_type, sync=sync)
+        except Exception as e:
+            if fail_fast:
+                raise
+            print(
+                f'{_output.STDIN_NAME}: {type(e).__name__}: {e}',
+                file=sys.stderr,
             )
-            tokens[j] = tokens[j]._replace(src=f':{docstring}')
+            errors[type(e).__name__] += 1
+            ret = 1
+            # A filter should never lose the source.
+            output = data if mode == MODE_WRITE else b''
+        else:
+            ret |= result.changed
+            if mode == MODE_WRITE:
+                output = result.src.encode('UTF-8') if result.changed else data
+            elif mode in OUTPUT_MODES:
+                output = _output.FORMATTERS[mode](
+                    _output.STDIN_NAME, contents, result.edits,
+                ).encode('UTF-8')
+            else:
+                output = b''
+
+        stdout.write(output)
+        if batch:
+            stdout.write(b'\0')
+        stdout.flush()
+
+    if batch and errors:
+        print(_error_summary(errors), file=sys.stderr)
+
+    return ret
+
+
+def _rewrite_isolated(
+    rewrite: Callable[[str], _FileResult],
+    filename: str,
+) -> _FileResult:
+    """
+    Rewrites the file, returning the error instead of raising it when
+    the file cannot be rewritten, so the other files still are.
+    """
+
+    try:
+        return rewrite(filename)
+    except Exception as e:
+        stats = FileStats(filename)
+        stats.count('files_failed')
+        return _FileResult(
+            filename,
+            changed=False,
+            stats=stats,
+            error=_FileError(type(e).__name__, str(e)),
+        )
+
 
-    new_contents = tokens_to_src(tokens)
-    with open(filename, 'w') as f:
-        f.write(new_contents)
+def _update_index(index_path: str, filenames: Iterable[str]) -> _FileResult:
+    from types2docstring import _index
+    _index.update(index_path, filenames)
+    return _FileResult(index_path, changed=False)
 
-    return new_contents != contents
+
+def _error_summary(errors: collections.Counter[str]) -> str:
+
+    n = sum(errors.values())
+    lines = [f'Failed to rewrite {n} file{"s" if n != 1 else ""}:']
+    for kind, count in errors.most_common():
+        lines.append(f'  {kind}: {count}')
+    return '\n'.join(lines)
+
+
+def _rewrite_chunk(
+    rewrite: Callable[[str], _FileResult],
+    filenames: list[str],
+) -> list[_FileResult]:
+    return [rewrite(filename) for filename in filenames]
+
+
+def _rewrite_files(
+    filenames: Iterable[str],
+    rewrite: Callable[[str], _FileResult],
+    jobs: int,
+) -> Iterator[_FileResult]:
+    """
+    Rewrites all the files, spread over `jobs` processes.
+
+    The results are yielded in the same order as `filenames`.
+    `filenames` is consumed lazily, so the first files are rewritten
+    while the rest of the files are still being discovered.
+    A single file (or a single job) is rewritten in this process,
+    because starting the pool would take longer then the rewrite.
+    """
+
+    filenames = iter(filenames)
+    # Sending the files in chunks keeps the overhead of the pool low
+    # when there are many (small) files.
+    first_chunk = list(itertools.islice(filenames, CHUNK_SIZE))
+
+    if jobs == 1 or len(first_chunk) <= 1:
+        for filename in itertools.chain(first_chunk, filenames):
+            yield rewrite(filename)
+        return
+
+    # Only imported when it is used, because importing it is slow.
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = itertools.chain(
+        (first_chunk,),
+        iter(lambda: list(itertools.islice(filenames, CHUNK_SIZE)), []),
+    )
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending: collections.deque[Future[list[_FileResult]]]
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_rewrite_chunk, rewrite, chunk))
+            # Only keep a few chunks per process queued, so the results
+            # of the first files can be reported early.
+            if len(pending) > jobs * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
 
 
 def _main(argv: Optional[Sequence[str]] = None) -> int:
+    from types2docstring import _cache
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('filenames', nargs='*')
-    # TODO: Add more detail to which types are available
+    parser.add_argument(
+        'filenames',
+        nargs='*',
+        help='Files and directories to rewrite, directories are searched '
+        'recursively for python files (respecting .gitignore). '
+        'Paths that do not exist are expanded as glob patterns',
+    )
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        metavar='PATTERN',
+        help='Skip files and directories matching the pattern '
+        '(in .gitignore syntax), can be given multiple times',
+    )
+    parser.add_argument(
+        '--files-from',
+        type=argparse.FileType('r'),
+        metavar='FILE',
+        help='Read the files to rewrite from FILE, one per line '
+        '(- for stdin)',
+    )
     parser.add_argument(
         '--type',
         default='rst',
-        help='Choose the type of docstring to generate',
+        help='Choose the type of docstring to generate (the builtin types '
+        'are rst, google and numpy, packages can add more)',
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes used to rewrite the files '
+        '(default: number of CPUs)',
+    )
+    output_mode = parser.add_mutually_exclusive_group()
+    output_mode.add_argument(
+        '--check',
+        action='store_const',
+        dest='mode',
+        const=MODE_CHECK,
+        help='Only report which files would be rewritten',
+    )
+    output_mode.add_argument(
+        '--diff',
+        action='store_const',
+        dest='mode',
+        const=MODE_DIFF,
+        help='Print a diff of the changes instead of rewriting the files',
+    )
+    output_mode.add_argument(
+        '--json',
+        action='store_const',
+        dest='mode',
+        const=MODE_JSON,
+        help='Print the edits instead of rewriting the files, as JSON '
+        'lines with the file, position, text and function of every edit',
+    )
+    output_mode.add_argument(
+        '--lsp',
+        action='store_const',
+        dest='mode',
+        const=MODE_LSP,
+        help='Print the edits instead of rewriting the files, as a JSON '
+        'line with the uri and the LSP TextEdits of every file',
+    )
+    parser.set_defaults(mode=MODE_WRITE)
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Remember which files need no changes, so they are skipped '
+        f'in the next run (stored in {_cache.default_cache_dir()})',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='Directory to store the cache in (implies --cache)',
+    )
+    parser.add_argument(
+        '--cache-max-entries',
+        type=int,
+        default=_cache.DEFAULT_MAX_ENTRIES,
+        help='Maximum number of files remembered in the cache '
+        f'(default: {_cache.DEFAULT_MAX_ENTRIES})',
+    )
+    parser.add_argument(
+        '--fail-fast',
+        action='store_true',
+        help='Stop at the first file that cannot be rewritten, instead of '
+        'reporting it and rewriting the other files',
+    )
+    parser.add_argument(
+        '--stats', '--profile',
+        action='store_true',
+        help='Print the time spent in every stage, the slowest files and '
+        'counts of the (skipped) functions to stderr',
+    )
+    parser.add_argument(
+        '--stats-json',
+        metavar='FILE',
+        help='Write the stats as JSON to FILE (- for stdout)',
+    )
+    parser.add_argument(
+        '--stats-top',
+        type=int,
+        default=DEFAULT_TOP_FILES,
+        metavar='N',
+        help='Number of slowest files to report in the stats '
+        f'(default: {DEFAULT_TOP_FILES})',
+    )
+    parser.add_argument(
+        '--index',
+        metavar='FILE',
+        help='Fill in the descriptions of the arguments from the existing '
+        'docstrings of the project, indexed in FILE (which is updated '
+        'with the given paths first)',
+    )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Also update the parameters and return types of existing '
+        'docstrings (in the rst, google and numpy styles) to the '
+        'signatures of their functions',
+    )
+    parser.add_argument(
+        '--low-memory',
+        action='store_true',
+        help='Rewrite the files without keeping the syntax tree and the '
+        'tokens in memory, files of at least '
+        f'{LOW_MEMORY_FILE_SIZE // 1024 // 1024} MiB always are',
+    )
+    parser.add_argument(
+        '--changed-since',
+        metavar='REF',
+        help='Only rewrite the functions with a signature that changed '
+        'since the git REF (in the given paths, or the current directory)',
+    )
+    parser.add_argument(
+        '--staged',
+        action='store_true',
+        help='Only rewrite the functions with a signature that has staged '
+        'changes (compared to REF when combined with --changed-since)',
+    )
+    parser.add_argument(
+        '--stdin',
+        action='store_true',
+        help='Read the source from stdin and write the result to stdout '
+        '(the same as passing - as the only filename)',
+    )
+    parser.add_argument(
+        '--batch', '-z',
+        action='store_true',
+        help='With --stdin: read multiple sources separated by NUL bytes '
+        'and write the results separated by NUL bytes',
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run as a daemon that rewrites files on request, '
+        'see types2docstring-client',
+    )
+    parser.add_argument(
+        '--socket',
+        help='Unix socket the daemon listens on '
+        '(default: types2docstring-$USER.sock in $XDG_RUNTIME_DIR)',
     )
     args = parser.parse_args(argv)
 
+    if args.daemon:
+        from types2docstring import _daemon
+        from types2docstring._client import default_socket_path
+        return _daemon.serve(args.socket or default_socket_path())
+
+    if args.type not in DOCSTRING_TYPES:
+        parser.error(
+            f'unknown docstring type: {args.type} '
+            f'(choose from {", ".join(DOCSTRING_TYPES)})',
+        )
+
+    if args.filenames == ['-']:
+        args.stdin = True
+    elif args.stdin and args.filenames:
+        parser.error('--stdin cannot be combined with filenames')
+
+    if args.stdin:
+        return _rewrite_stdin(
+            args.type,
+            args.mode,
+            args.batch,
+            sys.stdin.buffer,
+            sys.stdout.buffer,
+            args.sync,
+            args.fail_fast,
+        )
+
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+
+    cache_dir = args.cache_dir
+    if cache_dir is None and args.cache:
+        cache_dir = _cache.default_cache_dir()
+
+    changes = None
+    if args.changed_since is not None or args.staged:
+        import subprocess
+
+        from types2docstring import _git
+        try:
+            changes = _git.changed_lines(
+                args.changed_since, args.staged, args.filenames,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            parser.error(f'git diff failed: {getattr(e, "stderr", e)}')
+
+    rewrite = functools.partial(
+        _rewrite_file,
+        docstring_type=args.type,
+        mode=args.mode,
+        cache_dir=cache_dir,
+        changes=changes,
+        low_memory=args.low_memory,
+        index=args.index,
+        sync=args.sync,
+    )
+    if not args.fail_fast:
+        rewrite = functools.partial(_rewrite_isolated, rewrite)
+
     ret = 0
+    stats = RunStats(top=args.stats_top)
+    errors: collections.Counter[str] = collections.Counter()
+
+    filenames: Iterable[str]
+    if changes is not None:
+        # The changed files replace the paths, which were used to
+        # limit the diff.
+        filenames = _discovery.iter_filenames(
+            (name for name in changes if name.endswith('.py')),
+            exclude=args.exclude,
+        )
+    else:
+        filenames = _discovery.iter_filenames(
+            args.filenames,
+            exclude=args.exclude,
+            files_from=args.files_from,
+        )
+
+    # The index is updated from the same files before any of them is
+    # rewritten, its failure is reported like the failure of a file.
+    index_results: list[_FileResult] = []
+    if args.index is not None:
+        # The files can only be listed once (from stdin with
+        # --files-from -).
+        filenames = list(filenames)
+        update: Callable[[str], _FileResult] = functools.partial(
+            _update_index, filenames=filenames,
+        )
+        if not args.fail_fast:
+            update = functools.partial(_rewrite_isolated, update)
+        index_results.append(update(args.index))
+
+    for result in itertools.chain(
+        index_results, _rewrite_files(filenames, rewrite, args.jobs),
+    ):
+        if result.error is not None:
+            print(
+                f'{result.filename}: '
+                f'{result.error.kind}: {result.error.message}',
+                file=sys.stderr,
+            )
+            errors[result.error.kind] += 1
+            ret = 1
+        elif result.changed and args.mode == MODE_CHECK:
+            print(f'Would rewrite {result.filename}')
+        elif result.output:
+            print(result.output, end='')
+        ret |= result.changed
+        if result.stats is not None:
+            stats.add(result.stats)
+
+    # Evicting scans the whole cache, so it is only done when this run
+    # added entries and the cache is likely too big.
+    if (
+        cache_dir is not None and
+        stats.counts.get('cache_entries_added') and
+        _cache.count_entries(cache_dir) > args.cache_max_entries
+    ):
+        _cache.evict(cache_dir, args.cache_max_entries)
+
+    if errors:
+        print(_error_summary(errors), file=sys.stderr)
 
-    for filename in args.filenames:
-        ret |= _rewrite_file(filename, args.type)
+    if args.stats:
+        print(stats.report(), file=sys.stderr)
+    if args.stats_json:
+        import json
+        stats_json = json.dumps(stats.to_dict(), indent=2)
+        if args.stats_json == '-':
+            print(stats_json)
+        else:
+            with open(args.stats_json, 'w', encoding='UTF-8') as f:
+                f.write(stats_json)
 
     return ret